@@ -40,6 +40,8 @@ setuptools.setup(name='vision_datasets',
                  extras_require={
                      'torch': ['torch>=1.6.0'],
                      'plot': ['matplotlib'],
+                     'turbojpeg': ['PyTurboJPEG'],
+                     'opencv': ['opencv-python-headless'],
                  },
                  entry_points={
                      'console_scripts': ['vision_download=vision_datasets.commands.download_dataset:main',
@@ -48,5 +50,7 @@ setuptools.setup(name='vision_datasets',
                                          'vision_convert_od_to_ic=vision_datasets.commands.converter_od_to_ic:main',
                                          'vision_convert_to_aml_coco=vision_datasets.commands.converter_to_aml_coco:main',
                                          'vision_list_supported_operations=vision_datasets.commands.list_operations_by_data_type:main',
-                                         'vision_convert_to_line_oriented_format=vision_datasets.commands.converter_to_line_oriented_format:main']
+                                         'vision_convert_to_line_oriented_format=vision_datasets.commands.converter_to_line_oriented_format:main',
+                                         'vision_pack=vision_datasets.commands.pack_dataset:main',
+                                         'vision_benchmark_decoders=vision_datasets.commands.benchmark_decoders:main']
                  })
@@ -1,7 +1,13 @@
+import contextlib
+import hashlib
+import http.server
 import itertools
 import json
 import pathlib
+import re
 import tempfile
+import threading
+import time
 
 from vision_datasets.common import CocoManifestAdaptorFactory, DatasetTypes
 TYPES_WITH_CATEGORIES = [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_OBJECT_DETECTION]
@@ -581,3 +587,77 @@ def two_tasks_test_cases(coco_database):
 
 
 coco_database[DatasetTypes.MULTITASK] = two_tasks_test_cases(coco_database)
+
+
+class _FileRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = self.path.split('?')[0].lstrip('/')
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+            self.server.n_requests += 1
+            self.server.n_active += 1
+            self.server.max_active = max(self.server.max_active, self.server.n_active)
+        try:
+            time.sleep(self.server.delay)
+            content = self.server.files.get(path)
+            if content is None:
+                self.send_error(404)
+                return
+            byte_range = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+            if byte_range:
+                start, end = byte_range.groups()
+                start, end = (max(0, len(content) - int(end)), len(content) - 1) if not start else (int(start), min(int(end or len(content) - 1), len(content) - 1))
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+                content = content[start:end + 1]
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            with self.server.lock:
+                self.server.n_bytes_sent += len(content)
+        finally:
+            with self.server.lock:
+                self.server.n_active -= 1
+
+    def do_HEAD(self):
+        content = self.server.files.get(self.path.split('?')[0].lstrip('/'))
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('ETag', f'"{hashlib.md5(content).hexdigest()}"')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def local_http_server(files: dict, delay: float = 0):
+    """
+    Serve files ({path: bytes}) over http with keep-alive, range requests and HEAD requests with ETag, at the yielded server's url. The server records the client connections,
+    number of GET requests, bytes sent and the max number of concurrent requests.
+    """
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _FileRequestHandler)
+    server.daemon_threads = True
+    server.files = files
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.n_requests = 0
+    server.n_bytes_sent = 0
+    server.n_active = 0
+    server.max_active = 0
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
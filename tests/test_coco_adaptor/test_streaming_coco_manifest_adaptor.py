@@ -0,0 +1,58 @@
+import json
+import pathlib
+import tempfile
+
+import pytest
+
+from vision_datasets.common import CocoManifestAdaptorFactory, DatasetTypes
+from ..resources.util import coco_database, schema_database
+
+SINGLE_TASK_CASES = [(task, coco_dict, None) for task, coco_dicts in coco_database.items() if task not in (DatasetTypes.MULTITASK, DatasetTypes.KEY_VALUE_PAIR) for coco_dict in coco_dicts] \
+    + [(DatasetTypes.KEY_VALUE_PAIR, coco_dict, schema) for coco_dict, schema in zip(coco_database[DatasetTypes.KEY_VALUE_PAIR], schema_database[DatasetTypes.KEY_VALUE_PAIR])]
+
+
+def _create_manifests(task, coco_dict, schema=None):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        coco_path = pathlib.Path(temp_dir) / 'coco.json'
+        coco_path.write_text(json.dumps(coco_dict, indent=2))
+        adaptor = CocoManifestAdaptorFactory.create(task, schema) if schema else CocoManifestAdaptorFactory.create(task)
+        return adaptor.create_dataset_manifest(str(coco_path)), adaptor.create_dataset_manifest(str(coco_path), streaming=True)
+
+
+class TestStreamingCocoManifestAdaptor:
+    @pytest.mark.parametrize("task, coco_dict, schema", SINGLE_TASK_CASES)
+    def test_same_as_loading_whole_file(self, task, coco_dict, schema):
+        coco_dict = {**coco_dict, 'dataset_field': {'a': [1, 2]}}
+        manifest, streamed_manifest = _create_manifests(task, coco_dict, schema)
+        assert streamed_manifest == manifest
+        assert streamed_manifest.additional_info == manifest.additional_info
+        assert streamed_manifest.additional_info['dataset_field'] == {'a': [1, 2]}
+
+    @pytest.mark.parametrize("task, coco_dict, schema", SINGLE_TASK_CASES)
+    def test_annotations_before_other_sections(self, task, coco_dict, schema):
+        reordered = {'annotations': coco_dict['annotations'], **{k: v for k, v in coco_dict.items() if k != 'annotations'}}
+        manifest, streamed_manifest = _create_manifests(task, reordered, schema)
+        assert streamed_manifest == manifest
+
+    def test_bbox_format_before_annotations(self):
+        coco_dict = {'bbox_format': 'ltwh', **coco_database[DatasetTypes.IMAGE_OBJECT_DETECTION][0]}
+        manifest, streamed_manifest = _create_manifests(DatasetTypes.IMAGE_OBJECT_DETECTION, coco_dict)
+        assert streamed_manifest == manifest
+
+    def test_bbox_format_after_streamed_annotations_raises(self):
+        coco_dict = coco_database[DatasetTypes.IMAGE_OBJECT_DETECTION][0]
+        coco_dict = {'images': coco_dict['images'], 'categories': coco_dict['categories'], 'annotations': coco_dict['annotations'], 'bbox_format': 'ltwh'}
+        with pytest.raises(ValueError):
+            _create_manifests(DatasetTypes.IMAGE_OBJECT_DETECTION, coco_dict)
+
+    @pytest.mark.parametrize("coco_dicts", coco_database[DatasetTypes.MULTITASK][:5])
+    def test_multitask(self, coco_dicts):
+        tasks, coco_dicts = coco_dicts
+        task_names = [f'{i}_{task}' for i, task in enumerate(tasks)]
+        adaptor = CocoManifestAdaptorFactory.create(DatasetTypes.MULTITASK, dict(zip(task_names, tasks)))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            coco_files = {}
+            for name, coco_dict in zip(task_names, coco_dicts):
+                coco_files[name] = pathlib.Path(temp_dir) / f'{name}.json'
+                coco_files[name].write_text(json.dumps(coco_dict))
+            assert adaptor.create_dataset_manifest(coco_files, streaming=True) == adaptor.create_dataset_manifest(coco_files)
@@ -1,8 +1,10 @@
 import copy
+import io
 import json
 import pathlib
 import tempfile
 import unittest
+import zipfile
 
 import numpy as np
 from PIL import Image
@@ -11,6 +13,7 @@ from vision_datasets.common import CocoManifestAdaptorFactory, DatasetManifest,
 from vision_datasets.image_classification import ImageClassificationLabelManifest
 from vision_datasets.multi_task.coco_manifest_adaptor import MultiTaskCocoManifestAdaptor
 
+from .resources.util import local_http_server
 from .test_dataset_manifest import TestCases, _coco_dict_to_manifest
 
 
@@ -33,6 +36,40 @@ class TestCreateCocoDatasetManifest(unittest.TestCase):
             self.assertEqual(manifest.images[0].img_path, image['zip_file'] + '@' + image['file_name'])
             self.assertEqual(manifest.images[0].labels[0].label_path, annotation['zip_file'] + '@' + annotation['label'])
 
+    def test_file_url_created_right_with_zip_prefix(self):
+        coco_dict = {"images": [{"id": 1, "file_name": "image/test_1.jpg", "zip_file": "train_images.zip"}], "annotations": [], "categories": [{"id": 1, "name": "tiger"}]}
+        zip_stream = io.BytesIO()
+        with zipfile.ZipFile(zip_stream, 'w') as zf:
+            zf.writestr('image/test_1.jpg', b'image_contents')
+
+        with local_http_server({'c/dir/coco.json': json.dumps(coco_dict).encode('utf-8'), 'c/dir/train_images.zip': zip_stream.getvalue()}) as server:
+            manifest = CocoManifestAdaptorFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS).create_dataset_manifest('coco.json', f'{server.url}/c/dir?sig=x')
+
+            self.assertEqual(manifest.images[0].img_path, f'{server.url}/c/dir/train_images.zip@image/test_1.jpg?sig=x')
+            file_reader = FileReader()
+            with file_reader.open(manifest.images[0].img_path) as f:
+                self.assertEqual(f.read(), b'image_contents')
+            file_reader.close()
+
+    def test_file_url_with_special_characters_in_zip(self):
+        file_names = ['image/a?b.jpg', 'image/c#d.jpg', 'image/100%.jpg', 'image/e f.jpg', 'image/图.jpg']
+        coco_dict = {"images": [{"id": i + 1, "file_name": x, "zip_file": "train_images.zip"} for i, x in enumerate(file_names)], "annotations": [],
+                     "categories": [{"id": 1, "name": "tiger"}]}
+        zip_stream = io.BytesIO()
+        with zipfile.ZipFile(zip_stream, 'w') as zf:
+            for x in file_names:
+                zf.writestr(x, x.encode('utf-8'))
+
+        with local_http_server({'c/dir/coco.json': json.dumps(coco_dict).encode('utf-8'), 'c/dir/train_images.zip': zip_stream.getvalue()}) as server:
+            manifest = CocoManifestAdaptorFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS).create_dataset_manifest('coco.json', f'{server.url}/c/dir?sig=x')
+
+            file_reader = FileReader()
+            for image, file_name in zip(manifest.images, file_names):
+                self.assertTrue(image.img_path.endswith('?sig=x'))
+                with file_reader.open(image.img_path) as f:
+                    self.assertEqual(f.read(), file_name.encode('utf-8'))
+            file_reader.close()
+
     def test_od_respect_iscrowd(self):
         od_manifest = {
             "images": [{"id": 1, "file_name": "image/test_1.jpg", "zip_file": "train_images.zip"}],
@@ -1,6 +1,7 @@
 import unittest
 
 from tests.test_fixtures import DetectionTestFixtures
+from vision_datasets.common import ColumnarDatasetManifest
 from vision_datasets.common.constants import DatasetTypes
 from vision_datasets.image_object_detection import (
     DetectionAsKeyValuePairDataset,
@@ -59,6 +60,16 @@ class TestDetectionAsKeyValuePairDataset(unittest.TestCase):
                 },
             )
 
+    def test_columnar_detection_to_kvp(self):
+        sample_detection_dataset, tempdir = DetectionTestFixtures.create_an_od_dataset()
+        with tempdir:
+            expected = DetectionAsKeyValuePairDataset(sample_detection_dataset)
+            sample_detection_dataset.dataset_manifest = ColumnarDatasetManifest.from_dataset_manifest(sample_detection_dataset.dataset_manifest)
+            kvp_dataset = DetectionAsKeyValuePairDataset(sample_detection_dataset)
+
+            self.assertEqual(kvp_dataset.dataset_manifest, expected.dataset_manifest)
+            self.assertTrue(all(not x.labels for x in kvp_dataset.dataset_manifest.images))
+
     def test_single_class_description(self):
         sample_detection_dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(
             n_categories=1
@@ -1,11 +1,19 @@
+import base64
+import hashlib
+import http.server
 import io
 import json
 import os
 import pathlib
+import tempfile
+import threading
 import unittest
 from unittest.mock import ANY, MagicMock
 
-from vision_datasets.common import DatasetDownloader, DatasetRegistry, DatasetTypes
+from azure.core.exceptions import AzureError
+
+from vision_datasets.common import DatasetDownloader, DatasetRegistry, DatasetTypes, Usages
+from vision_datasets.common.data_reader.dataset_downloader import AzureDownloader
 
 
 class TestDatasetDownloader(unittest.TestCase):
@@ -74,9 +82,10 @@ class TestDatasetDownloader(unittest.TestCase):
             'train': {'index_path': 'dir/42.txt', 'files_for_local_usage': []}}]
         dataset_info = self._make_reg(datasets).get_dataset_info('dataset_name')
         downloader = self._make_downloader(dataset_info)
-        with unittest.mock.patch('requests.get') as mock_get:
+        with unittest.mock.patch('requests.Session.get') as mock_get:
             mock_get.return_value.__enter__.return_value.raw = io.BytesIO(b'42')
             mock_get.return_value.__enter__.return_value.status_code = 200
+            mock_get.return_value.__enter__.return_value.headers = {}
             downloader.download()
             mock_get.assert_called_once_with('http://example.com/somewhere/dir/42.txt?sastoken=something', allow_redirects=True, stream=True, timeout=ANY)
 
@@ -89,5 +98,154 @@ class TestDatasetDownloader(unittest.TestCase):
         return DatasetRegistry(json.dumps(datasets))
 
 
+class _RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves server.files by path, supporting single range requests, with Content-MD5 of the whole file."""
+
+    def do_GET(self):
+        path = self.path.split('?')[0].lstrip('/')
+        self.server.requests.append((path, self.headers.get('Range')))
+        content = self.server.files.get(path)
+        if content is None:
+            self.send_error(404)
+            return
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header[len('bytes='):].split('-')[0])
+            if start >= len(content):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        else:
+            self.send_response(200)
+        body = content[start:]
+        self.send_header('Content-Length', str(len(body)))
+        md5 = self.server.md5_override.get(path) or base64.b64encode(hashlib.md5(content).digest()).decode('ascii')
+        self.send_header('x-ms-blob-content-md5', md5)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDatasetDownloaderWithLocalServer(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _RangeRequestHandler)
+        self.server.files = {f'root/{i}.txt': os.urandom(1000 + i) for i in range(20)}
+        self.server.requests = []
+        self.server.md5_override = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        dataset = {'name': 'dataset_name', 'type': DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS.name, 'root_folder': 'root', 'version': 1,
+                   'train': {'index_path': '0.txt', 'files_for_local_usage': [f'{i}.txt' for i in range(1, 20)]}}
+        self.dataset_info = DatasetRegistry(json.dumps([dataset])).get_dataset_info('dataset_name')
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/?sastoken=something'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_download_concurrently(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            DatasetDownloader(self.base_url, self.dataset_info, max_concurrency=4).download(tempdir, [Usages.TRAIN])
+            for path, content in self.server.files.items():
+                self.assertEqual((pathlib.Path(tempdir) / path).read_bytes(), content)
+            self.assertEqual(len(self.server.requests), 20)
+            self.assertFalse(list(pathlib.Path(tempdir).glob('**/*.part')))
+
+    def test_resume_partial_download(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            (pathlib.Path(tempdir) / 'root').mkdir()
+            (pathlib.Path(tempdir) / 'root' / '3.txt.part').write_bytes(self.server.files['root/3.txt'][:300])
+            DatasetDownloader(self.base_url, self.dataset_info).download(tempdir, [Usages.TRAIN])
+            self.assertEqual((pathlib.Path(tempdir) / 'root' / '3.txt').read_bytes(), self.server.files['root/3.txt'])
+            self.assertIn(('root/3.txt', 'bytes=300-'), self.server.requests)
+
+    def test_restart_invalid_partial_download(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            (pathlib.Path(tempdir) / 'root').mkdir()
+            (pathlib.Path(tempdir) / 'root' / '3.txt.part').write_bytes(b'x' * 300)
+            DatasetDownloader(self.base_url, self.dataset_info).download(tempdir, [Usages.TRAIN])
+            self.assertEqual((pathlib.Path(tempdir) / 'root' / '3.txt').read_bytes(), self.server.files['root/3.txt'])
+            self.assertEqual([x[1] for x in self.server.requests if x[0] == 'root/3.txt'], ['bytes=300-', None])
+
+    def test_checksum_mismatch(self):
+        self.server.md5_override['root/5.txt'] = base64.b64encode(hashlib.md5(b'something else').digest()).decode('ascii')
+        with tempfile.TemporaryDirectory() as tempdir:
+            with self.assertRaises(ValueError):
+                DatasetDownloader(self.base_url, self.dataset_info, max_concurrency=2).download(tempdir, [Usages.TRAIN])
+            self.assertFalse((pathlib.Path(tempdir) / 'root' / '5.txt').exists())
+            self.assertEqual(len([x for x in self.server.requests if x[0] == 'root/5.txt']), 3)
+
+
+class _FakeBlobDownload:
+    """Download of content[offset:], written in reversed chunks as parallel downloads can, failing after n_chunks_before_failure chunks if set"""
+
+    CHUNK_SIZE = 100
+
+    def __init__(self, content, offset, progress_hook, n_chunks_before_failure):
+        self._content = content[offset:]
+        self._progress_hook = progress_hook
+        self._n_chunks_before_failure = n_chunks_before_failure
+
+    def readinto(self, stream):
+        start = stream.tell()
+        chunk_starts = list(range(0, len(self._content), self.CHUNK_SIZE))
+        # the first chunk is written first, the others out of order
+        for i, chunk_start in enumerate(chunk_starts[:1] + chunk_starts[:0:-1]):
+            if i == self._n_chunks_before_failure:
+                raise AzureError('connection reset')
+            stream.seek(start + chunk_start)
+            stream.write(self._content[chunk_start:chunk_start + self.CHUNK_SIZE])
+            self._progress_hook(min((i + 1) * self.CHUNK_SIZE, len(self._content)), len(self._content))
+        return len(self._content)
+
+
+class TestAzureDownloader(unittest.TestCase):
+    def setUp(self):
+        self.content = os.urandom(1050)
+        self.md5 = hashlib.md5(self.content).digest()
+        self.offsets = []
+        self.n_chunks_before_failure = []
+        container_client = MagicMock()
+        container_client.get_blob_client.return_value.get_blob_properties.side_effect = lambda: MagicMock(size=len(self.content), content_settings=MagicMock(content_md5=self.md5))
+        container_client.download_blob.side_effect = self._download_blob
+        patcher = unittest.mock.patch('azure.storage.blob.ContainerClient.from_container_url', return_value=container_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.downloader = AzureDownloader('https://account.blob.core.windows.net/container?sig=something')
+
+    def _download_blob(self, file_path, offset=0, progress_hook=None, **kwargs):
+        self.offsets.append(offset)
+        return _FakeBlobDownload(self.content, offset, progress_hook, self.n_chunks_before_failure.pop(0) if self.n_chunks_before_failure else None)
+
+    def test_download_to_part_file_first(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            progress = MagicMock()
+            self.downloader.download('dir/1.bin', tempdir, progress=progress)
+            self.assertEqual((pathlib.Path(tempdir) / 'dir' / '1.bin').read_bytes(), self.content)
+            self.assertFalse((pathlib.Path(tempdir) / 'dir' / '1.bin.part').exists())
+            progress.add.assert_called_once_with(1050, 0)
+            self.assertEqual(sum(x.args[0] for x in progress.update.call_args_list), 1050)
+
+    def test_resume_after_failure_from_contiguous_part(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            # fails after the first chunk and the last 2 ones are written, the first retry after the first chunk only
+            self.n_chunks_before_failure = [3, 1]
+            self.downloader.download('1.bin', tempdir)
+            self.assertEqual((pathlib.Path(tempdir) / '1.bin').read_bytes(), self.content)
+            self.assertEqual(self.offsets, [0, 100, 200])
+
+    def test_checksum_mismatch(self):
+        self.md5 = hashlib.md5(b'something else').digest()
+        with tempfile.TemporaryDirectory() as tempdir:
+            with self.assertRaises(ValueError):
+                self.downloader.download('1.bin', tempdir)
+            self.assertFalse((pathlib.Path(tempdir) / '1.bin').exists())
+            self.assertFalse((pathlib.Path(tempdir) / '1.bin.part').exists())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,19 @@
 import copy
+import itertools
 import json
 import pathlib
+import pickle
+import random
 import tempfile
 import unittest
 from collections import Counter
 
-from vision_datasets.common import CategoryManifest, CocoDictGeneratorFactory, CocoManifestAdaptorFactory, DatasetFilter, DatasetManifest, DatasetTypes, ImageDataManifest, ImageNoAnnotationFilter, \
-    ManifestMerger, ManifestMergeStrategyFactory, ManifestSampler, RemoveCategories, RemoveCategoriesConfig, SampleByFewShotConfig, SampleByNumSamplesConfig, \
-    SampleStrategyFactory, SampleStrategyType, SpawnConfig, SpawnFactory, SplitConfig, SplitFactory
+import numpy as np
+
+from vision_datasets.common import AliasTableSampler, BalancedInstanceWeightsGenerator, CategoryManifest, CocoDictGeneratorFactory, CocoManifestAdaptorFactory, DatasetFilter, \
+    DatasetManifest, DatasetManifestView, DatasetTypes, ImageDataManifest, ImageNoAnnotationFilter, ManifestMerger, ManifestMergeStrategyFactory, ManifestSampler, RemoveCategories, \
+    RemoveCategoriesConfig, SampleByFewShotConfig, SampleByNumSamples, SampleByNumSamplesConfig, SampleFewShot, SampleStrategyFactory, SampleStrategyType, SpawnConfig, SpawnFactory, \
+    SplitConfig, SplitFactory, DatasetInfo, VisionDataset, WeightsGenerationConfig
 from vision_datasets.common.data_manifest.utils import generate_multitask_dataset_manifest
 from vision_datasets.image_classification.manifest import ImageClassificationLabelManifest
 from vision_datasets.image_object_detection.manifest import ImageObjectDetectionLabelManifest
@@ -388,6 +394,62 @@ class TestSampleManifestByNumSamples(unittest.TestCase):
         for n in _get_instance_count_per_class(sampled).values():
             self.assertGreaterEqual(n, 50)
 
+    def test_weighted_sample(self):
+        num_classes = 4
+        images = [ImageDataManifest(i, f'./{i}.jpg', 10, 10, [ImageClassificationLabelManifest(i % num_classes)]) for i in range(1000)]
+        manifest = DatasetManifest(images, _generate_categories(num_classes), DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        # class 0 is never sampled, class 3 three times as likely as class 1
+        weights = np.array([i % num_classes for i in range(1000)], dtype=np.float64)
+
+        for with_replacement, fast in itertools.product([True, False], [False, True]):
+            config = SampleByNumSamplesConfig(0, with_replacement, 600, weights, fast)
+            sampled = ManifestSampler(SampleStrategyFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SampleStrategyType.NumSamples, config)).run(manifest)
+            self.assertEqual(len(sampled.images), 600)
+            counts = _get_instance_count_per_class(sampled)
+            self.assertNotIn(0, counts)
+            self.assertGreater(counts[3], counts[2])
+            self.assertGreater(counts[2], counts[1])
+            if not with_replacement:
+                self.assertEqual(len({x.id for x in sampled.images}), 600)
+
+            resampled = ManifestSampler(SampleStrategyFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SampleStrategyType.NumSamples, config)).run(manifest)
+            self.assertEqual([x.id for x in sampled.images], [x.id for x in resampled.images])
+
+        for fast in [False, True]:
+            config = SampleByNumSamplesConfig(0, False, 800, weights, fast)
+            with self.assertRaises(ValueError):
+                ManifestSampler(SampleStrategyFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SampleStrategyType.NumSamples, config)).run(manifest)
+
+    def test_weighted_sample_same_as_choice_by_default(self):
+        images = [ImageDataManifest(i, f'./{i}.jpg', 10, 10, [ImageClassificationLabelManifest(0)]) for i in range(1000)]
+        manifest = DatasetManifest(images, _generate_categories(1), DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        weights = np.random.default_rng(1).random(1000).tolist()
+        for with_replacement in [True, False]:
+            sampled = SampleByNumSamples(SampleByNumSamplesConfig(3, with_replacement, 100, weights)).sample_indices(manifest)
+            expected = np.random.default_rng(3).choice(1000, size=100, replace=with_replacement, p=[w / sum(weights) for w in weights])
+            np.testing.assert_array_equal(sampled, expected)
+
+
+class TestAliasTableSampler(unittest.TestCase):
+    def test_distribution(self):
+        weights = [0, 1, 2, 0.5, 6.5]
+        sampler = AliasTableSampler(weights)
+        drawn = sampler.sample(np.random.default_rng(0), 100000)
+        frequencies = np.bincount(drawn, minlength=len(weights)) / len(drawn)
+        np.testing.assert_allclose(frequencies, np.array(weights) / sum(weights), atol=0.01)
+        self.assertEqual(frequencies[0], 0)
+
+        np.testing.assert_array_equal(drawn, sampler.sample(np.random.default_rng(0), 100000))
+
+    def test_uniform(self):
+        sampler = AliasTableSampler(np.ones(7))
+        np.testing.assert_array_equal(sampler.prob, np.ones(7))
+
+    def test_invalid_weights(self):
+        for weights in [[], [0, 0], [1, -1], [1, np.nan], [[1, 2]]]:
+            with self.assertRaises(ValueError):
+                AliasTableSampler(weights)
+
 
 class TestGreedyFewShotsSampling(unittest.TestCase):
     def test_multiclass_sample(self):
@@ -429,6 +491,33 @@ class TestGreedyFewShotsSampling(unittest.TestCase):
         for n in _get_instance_count_per_class(sampled).values():
             self.assertGreaterEqual(n, 10)
 
+    def test_multitask_classes_concatenated(self):
+        images = [ImageDataManifest(f'{i}', f'./{i}.jpg', 10, 10, {'a': [ImageClassificationLabelManifest(i % 3)], 'b': [ImageClassificationLabelManifest(i % 2)] if i % 4 else []})
+                  for i in range(40)]
+        dataset_manifest = DatasetManifest(images, {'a': _generate_categories(3), 'b': _generate_categories(2)},
+                                           {'a': DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, 'b': DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS})
+
+        sampled = SampleFewShot(SampleByFewShotConfig(0, 4)).sample(dataset_manifest)
+        for task, n_classes in [('a', 3), ('b', 2)]:
+            counts = Counter(label.category_id for image in sampled.images for label in image.labels.get(task, []))
+            self.assertEqual(set(counts), set(range(n_classes)))
+            self.assertTrue(all(n >= 4 for n in counts.values()))
+
+    def test_chunks_and_missing_classes(self):
+        num_classes = 10
+        images = [ImageDataManifest(i, f'./{i}.jpg', 10, 10, [ImageObjectDetectionLabelManifest([(i + j) % num_classes, 0, 0, 5, 5]) for j in range(i % 3)]) for i in range(500)]
+        dataset_manifest = DatasetManifest(images, _generate_categories(num_classes), DatasetTypes.IMAGE_OBJECT_DETECTION)
+
+        sampler = SampleFewShot(SampleByFewShotConfig(1, 20))
+        sampled = sampler.sample(dataset_manifest)
+        sampler.FIRST_CHUNK_SIZE = 3
+        self.assertEqual([x.id for x in sampler.sample(dataset_manifest).images], [x.id for x in sampled.images])
+        self.assertTrue(all(n >= 20 for n in _get_instance_count_per_class(sampled).values()))
+        self.assertTrue(all(not x.is_negative() for x in sampled.images))
+
+        with self.assertRaisesRegex(RuntimeError, 'some classes'):
+            SampleFewShot(SampleByFewShotConfig(1, 200)).sample(dataset_manifest)
+
     # def test_multitask(self):
     #     num_classes = 10
     #     images = [ImageDataManifest(f'{i}', f'./{i}.jpg', 10, 10, {
@@ -619,6 +708,90 @@ class TestSampleByCategories(unittest.TestCase):
         assert [x.label_data for x in new_manifest.images[3].labels] == [0, 1]
 
 
+class TestDatasetManifestView(unittest.TestCase):
+    @staticmethod
+    def _create_manifest(n_images=20, n_classes=4):
+        images = [ImageDataManifest(i, f'./{i}.jpg', 10, 10, [ImageClassificationLabelManifest(i % n_classes)]) for i in range(n_images)]
+        return DatasetManifest(images, _generate_categories(n_classes), DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+
+    def test_operations_return_views_of_source(self):
+        manifest = self._create_manifest()
+        first, second = SplitFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SplitConfig(0.5)).run(manifest)
+        sampled = ManifestSampler(SampleStrategyFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SampleStrategyType.NumSamples, SampleByNumSamplesConfig(0, False, 5))).run(first)
+        filtered = DatasetFilter(ImageNoAnnotationFilter()).run(sampled)
+
+        for view in [first, second, sampled, filtered]:
+            assert isinstance(view, DatasetManifestView)
+            # views of views select from the source directly
+            assert view.images._images is manifest.images
+        assert sorted(x.id for x in first.images + second.images) == list(range(20))
+        assert [x.id for x in filtered.images] == [x.id for x in sampled.images]
+        assert all(x in [y.id for y in first.images] for x in [y.id for y in sampled.images])
+
+    def test_images_copied_on_access(self):
+        manifest = self._create_manifest()
+        view = DatasetManifestView(manifest, [3, 1, 3])
+        assert view.peek_image(0) is manifest.images[3]
+        assert view.images == [manifest.images[3], manifest.images[1], manifest.images[3]]
+
+        view.images[0].img_path = 'changed.jpg'
+        view.images[0].labels[0].category_id = 0
+        assert view.images[0].img_path == 'changed.jpg'
+        assert view.images[2].img_path == './3.jpg'
+        assert manifest.images[3].img_path == './3.jpg'
+        assert manifest.images[3].labels[0].category_id == 3
+
+        # modified images are carried over to views of the view, as copies
+        child = DatasetManifestView(view, [0, 1])
+        assert child.images[0].img_path == 'changed.jpg'
+        child.images[0].img_path = 'changed_again.jpg'
+        assert view.images[0].img_path == 'changed.jpg'
+
+    def test_remove_categories_does_not_modify_source(self):
+        manifest = self._create_manifest()
+        result = RemoveCategories(RemoveCategoriesConfig(['0'])).run(manifest)
+        assert [x.name for x in result.categories] == ['1', '2', '3']
+        assert [x.labels[0].category_id if x.labels else None for x in result.images[:4]] == [None, 0, 1, 2]
+        assert [x.labels[0].category_id for x in manifest.images[:4]] == [0, 1, 2, 3]
+        assert [x.name for x in manifest.categories] == ['0', '1', '2', '3']
+
+    def test_deepcopy_and_pickle_materialize(self):
+        manifest = self._create_manifest()
+        view = DatasetManifestView(manifest, [5, 2])
+        view.images[1].width = 20
+        for materialized in [copy.deepcopy(view), pickle.loads(pickle.dumps(view))]:
+            assert type(materialized) is DatasetManifest
+            assert [x.id for x in materialized.images] == [5, 2]
+            assert materialized.images[1].width == 20
+            assert materialized.images[0] is not manifest.images[5]
+
+    def test_invalid_indices(self):
+        with self.assertRaises(ValueError):
+            DatasetManifestView(self._create_manifest(), [20])
+
+    def test_images_modified_like_a_list(self):
+        manifest = self._create_manifest()
+        first, _ = SplitFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SplitConfig(0.5)).run(manifest)
+        ids = [x.id for x in first.images]
+
+        random.Random(0).shuffle(first.images)
+        assert sorted(x.id for x in first.images) == sorted(ids)
+        first.images[0] = ImageDataManifest(100, './100.jpg', 10, 10, [])
+        assert first.images[0].id == 100
+        first.images.append(ImageDataManifest(101, './101.jpg', 10, 10, []))
+        del first.images[1]
+        first.images.sort(key=lambda x: x.id)
+        assert [x.id for x in first.images] == sorted([x.id for x in first.images])
+        assert len(first.images) == len(ids)
+        assert first.images[-1].id == 101
+
+        first.images[0].img_path = 'changed.jpg'
+        assert all(x.img_path != 'changed.jpg' for x in manifest.images)
+        assert [x.id for x in manifest.images] == list(range(20))
+        child = DatasetManifestView(first, [len(ids) - 1])
+        assert child.images[0].id == 101
+
+
 class TestSpawn(unittest.TestCase):
     def test_spawn_od_manifest(self):
         images = [
@@ -639,6 +812,32 @@ class TestSpawn(unittest.TestCase):
         cnt = self.cnt_multiclass_labels(new_manifest)
         self.assertEqual(cnt, [30, 120, 60, 60])
 
+    def test_virtual_spawn_od_manifest(self):
+        images = [
+            ImageDataManifest(0, './0.jpg', 10, 10, []),
+            ImageDataManifest(1, './1.jpg', 10, 10, [ImageObjectDetectionLabelManifest([0, 1, 1, 2, 2]), ImageObjectDetectionLabelManifest([1, 2, 2, 3, 3])]),
+            ImageDataManifest(2, './2.jpg', 10, 10, [ImageObjectDetectionLabelManifest([1, 1, 1, 2, 2])]),
+        ]
+        manifest = DatasetManifest(images, [CategoryManifest(i, x) for i, x in enumerate(['a', 'b'])], DatasetTypes.IMAGE_OBJECT_DETECTION)
+        coco_generator = CocoDictGeneratorFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION)
+        merger = ManifestMerger(ManifestMergeStrategyFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION))
+        for weights in [None, [0., 0.5, 1.]]:
+            spawned = SpawnFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION, SpawnConfig(0, 30, weights)).run(manifest)
+            virtual = SpawnFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION, SpawnConfig(0, 30, weights, virtual=True)).run(manifest)
+
+            self.assertIsInstance(virtual, DatasetManifestView)
+            self.assertEqual(len(virtual), len(spawned))
+            self.assertEqual([virtual.peek_image(i).id for i in range(3)], [0, 1, 2])
+            self.assertEqual(coco_generator.run(virtual), coco_generator.run(spawned))
+            self.assertEqual(merger.run(virtual), merger.run(spawned))
+
+            # read by the dataset without copying images
+            dataset = VisionDataset(DatasetInfo({'name': 'od', 'type': 'object_detection'}), virtual, coordinates='absolute')
+            targets = [dataset.get_targets(i) for i in range(len(dataset))]
+            self.assertEqual([len(x) for x in targets], [len(virtual.peek_image(i).labels) for i in range(len(virtual))])
+            for i in range(len(virtual)):
+                self.assertIs(virtual.peek_image(i), manifest.images[virtual.images.indices[i]])
+
     def test_spawn_ic_multilabel_manifest(self):
         images = [
             ImageDataManifest(0, './0.jpg', 10, 10, []),
@@ -685,6 +884,43 @@ class TestSpawn(unittest.TestCase):
         return n_images_by_classe
 
 
+class TestBalancedInstanceWeightsGenerator(unittest.TestCase):
+    def test_detection(self):
+        images = [
+            ImageDataManifest(0, './0.jpg', 10, 10, []),
+            ImageDataManifest(1, './1.jpg', 10, 10, [ImageObjectDetectionLabelManifest([0, 1, 1, 2, 2]), ImageObjectDetectionLabelManifest([0, 2, 2, 3, 3])]),
+            ImageDataManifest(2, './2.jpg', 10, 10, [ImageObjectDetectionLabelManifest([0, 1, 1, 2, 2]), ImageObjectDetectionLabelManifest([1, 1, 1, 2, 2])]),
+            ImageDataManifest(3, './3.jpg', 10, 10, []),
+        ]
+        manifest = DatasetManifest(images, _generate_categories(3), DatasetTypes.IMAGE_OBJECT_DETECTION)
+        weights = BalancedInstanceWeightsGenerator(WeightsGenerationConfig(soft=False, weight_upper=10, weight_lower=0.1)).run(manifest)
+
+        # boxes per category: 3, 1, and 2 negative images, with a mean of 2
+        self.assertIsInstance(weights, np.ndarray)
+        np.testing.assert_allclose(weights, [1, (2 / 3) ** 2, 2 / 3 * 2, 1])
+
+    def test_multitask(self):
+        images = [
+            ImageDataManifest(0, './0.jpg', 10, 10, {'a': [ImageClassificationLabelManifest(0)], 'b': [ImageClassificationLabelManifest(0)]}),
+            ImageDataManifest(1, './1.jpg', 10, 10, {'a': [ImageClassificationLabelManifest(0)], 'b': []}),
+            ImageDataManifest(2, './2.jpg', 10, 10, {'a': [ImageClassificationLabelManifest(1)]}),
+            ImageDataManifest(3, './3.jpg', 10, 10, {'a': [], 'b': []}),
+        ]
+        manifest = DatasetManifest(images, {'a': _generate_categories(2), 'b': _generate_categories(1)},
+                                   {'a': DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, 'b': DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS})
+        weights = BalancedInstanceWeightsGenerator(WeightsGenerationConfig(soft=False, weight_upper=10, weight_lower=0.1)).run(manifest)
+
+        # a/0: 2, a/1: 1, b/0: 1, negative: 1, with a mean of 1.25
+        np.testing.assert_allclose(weights, [1.25 / 2 * 1.25, 1.25 / 2, 1.25, 1.25])
+
+    def test_spawn_with_weights(self):
+        images = [ImageDataManifest(i, f'./{i}.jpg', 10, 10, [ImageClassificationLabelManifest(0 if i < 9 else 1)]) for i in range(10)]
+        manifest = DatasetManifest(images, _generate_categories(2), DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        weights = BalancedInstanceWeightsGenerator(WeightsGenerationConfig(soft=False, weight_upper=10, weight_lower=0.1)).run(manifest)
+        spawned = SpawnFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, SpawnConfig(0, 36, weights)).run(manifest)
+        self.assertEqual(_get_instance_count_per_class(spawned), {0: 18, 1: 18})
+
+
 class TestCocoGeneration(unittest.TestCase):
     def test_coco_generation(self):
         for data_type in [
@@ -1,7 +1,14 @@
+import os
+import pathlib
+import pickle
+import subprocess
+import sys
 import unittest
+import zipfile
+from unittest import mock
 
 from tests.test_fixtures import DetectionTestFixtures
-from vision_datasets.common import DatasetInfo, DatasetTypes, VisionDataset
+from vision_datasets.common import ColumnarDatasetManifest, DatasetInfo, DatasetTypes, VisionDataset
 from vision_datasets.common.dataset.base_dataset import BaseDataset
 from vision_datasets.common.dataset.vision_dataset import LocalFolderCacheDecorator
 from vision_datasets.image_classification.manifest import ImageClassificationLabelManifest
@@ -51,6 +58,104 @@ class TestDetectionAsClassification(unittest.TestCase):
             assert img_4[0].size == (100, 50)
             assert img_4[1] == [ImageClassificationLabelManifest(3)]
 
+    def test_crops_of_image_decoded_once(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(3)
+        with tempdir:
+            dataset.dataset_manifest.images[1].labels = []
+            for manifest in [dataset.dataset_manifest, ColumnarDatasetManifest.from_dataset_manifest(dataset.dataset_manifest)]:
+                od_dataset = VisionDataset(dataset.dataset_info, manifest, boxes_as_array=isinstance(manifest, ColumnarDatasetManifest))
+                ic_dataset = DetectionAsClassificationByCroppingDataset(od_dataset, n_cached_images=1)
+                self.assertEqual(len(ic_dataset), 4)
+                self.assertEqual([ic_dataset.get_image_index(i) for i in range(4)], [0, 0, 2, 2])
+                with self.assertRaises(IndexError):
+                    ic_dataset.get_image_index(4)
+
+                with mock.patch.object(od_dataset, '_read_image', wraps=od_dataset._read_image) as read_image:
+                    crops = [ic_dataset[i] for i in range(4)]
+                    self.assertEqual(read_image.call_count, 2)
+                    self.assertEqual([x[0].size for x in crops], [(100, 100), (40, 90), (100, 100), (40, 90)])
+                    self.assertEqual([x[1] for x in crops], [[ImageClassificationLabelManifest(c)] for c in [0, 1, 0, 1]])
+
+                    crops_of_image = ic_dataset.get_crops_of_image(2)
+                    self.assertEqual(read_image.call_count, 2)
+                    self.assertEqual([(x[0].size, x[1], x[2]) for x in crops_of_image], [(x[0].size, x[1], x[2]) for x in crops[2:]])
+                    self.assertEqual(ic_dataset.get_crops_of_image(1), [])
+
+                    ic_dataset.get_crops_of_image(0)
+                    self.assertEqual(read_image.call_count, 3)
+
+                unpickled = pickle.loads(pickle.dumps(ic_dataset))
+                self.assertEqual(unpickled[3][0].size, (40, 90))
+
+    def test_generate_manifest(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(3, coordinates='absolute')
+        with tempdir:
+            aug_params = {'zoom_ratio_bounds': (0.5, 1.5), 'rnd_seed': 1}
+            manifests = []
+            for i, (output, n_workers) in enumerate([('crops', 1), ('crops_parallel', 2), ('crops.zip', 2)]):
+                ic_dataset = DetectionAsClassificationByCroppingDataset(dataset, aug_params)
+                manifest = ic_dataset.generate_manifest(dir=pathlib.Path(tempdir.name) / output, n_copies=2, n_workers=n_workers)
+                self.assertEqual(len(manifest.images), 12)
+                self.assertEqual([x.labels for x in manifest.images[:6]], [[ImageClassificationLabelManifest(c)] for c in [0, 1, 2, 3, 0, 1]])
+                manifests.append(manifest)
+
+            self.assertEqual([(x.width, x.height) for x in manifests[0].images], [(x.width, x.height) for x in manifests[1].images])
+            self.assertEqual([(x.width, x.height) for x in manifests[0].images], [(x.width, x.height) for x in manifests[2].images])
+            self.assertEqual(manifests[2].images[3].img_path, f'{(pathlib.Path(tempdir.name) / "crops.zip").as_posix()}@3.JPEG')
+            ic_dataset = VisionDataset(DatasetInfo({'name': 'ic', 'type': 'classification_multiclass'}), manifests[2])
+            self.assertEqual(ic_dataset[3][0].size, (manifests[2].images[3].width, manifests[2].images[3].height))
+            ic_dataset.close()
+
+    def test_generate_manifest_resumed(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(3, coordinates='absolute')
+        with tempdir:
+            for output in ['crops', 'crops.zip']:
+                crops_dir = pathlib.Path(tempdir.name) / output
+                expected = DetectionAsClassificationByCroppingDataset(dataset).generate_manifest(dir=crops_dir)
+                if output == 'crops':
+                    (crops_dir / '3.JPEG').unlink()
+
+                ic_dataset = DetectionAsClassificationByCroppingDataset(dataset)
+                with mock.patch.object(ic_dataset, '_encode_crops_of_image', wraps=ic_dataset._encode_crops_of_image) as encode:
+                    manifest = ic_dataset.generate_manifest(dir=crops_dir)
+                    self.assertEqual([x.args for x in encode.call_args_list], [(1, [0])] if output == 'crops' else [])
+                self.assertEqual([(x.img_path, x.width, x.height, x.labels) for x in manifest.images], [(x.img_path, x.width, x.height, x.labels) for x in expected.images])
+
+    def test_generate_manifest_resumed_after_killed_between_checkpoints(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(3, coordinates='absolute')
+        with tempdir:
+            expected = DetectionAsClassificationByCroppingDataset(dataset).generate_manifest(dir=pathlib.Path(tempdir.name) / 'expected.zip')
+            ic_dataset = DetectionAsClassificationByCroppingDataset(dataset)
+            zip_path = pathlib.Path(tempdir.name) / 'crops.zip'
+            # writes the crops of each image, with a checkpoint after the first 2, and gets killed before closing the zip
+            crops_by_image = [[x.img_path.split('@')[1] for x in expected.images[int(ic_dataset._box_offsets[i]):int(ic_dataset._box_offsets[i + 1])]] for i in range(3)]
+            script = f"""if True:
+                import os, zipfile
+                from vision_datasets.image_object_detection.detection_as_classification_dataset import _ZipCropWriter
+                _ZipCropWriter.CHECKPOINT_INTERVAL = 2
+                writer = _ZipCropWriter(__import__('pathlib').Path({str(zip_path)!r}))
+                with zipfile.ZipFile({str(pathlib.Path(tempdir.name) / 'expected.zip')!r}) as zf:
+                    for names in {crops_by_image!r}:
+                        writer.write([(int(x.split('.')[0]), zf.read(x), x.split('.')[1], 0, 0) for x in names])
+                os._exit(1)
+            """
+            self.assertEqual(subprocess.run([sys.executable, '-c', script]).returncode, 1)
+            with self.assertRaises(zipfile.BadZipFile):
+                zipfile.ZipFile(zip_path)
+            # the last entry is cut, as if killed while writing it
+            with open(zip_path, 'r+b') as f:
+                f.truncate(f.seek(0, os.SEEK_END) - 10)
+
+            with mock.patch.object(ic_dataset, '_encode_crops_of_image', wraps=ic_dataset._encode_crops_of_image) as encode:
+                manifest = ic_dataset.generate_manifest(dir=zip_path)
+                self.assertEqual([x.args for x in encode.call_args_list], [(2, [0])])
+            self.assertEqual([(x.img_path.split('@')[1], x.width, x.height, x.labels) for x in manifest.images],
+                             [(x.img_path.split('@')[1], x.width, x.height, x.labels) for x in expected.images])
+            with zipfile.ZipFile(zip_path) as zf:
+                self.assertEqual(zf.testzip(), None)
+                self.assertEqual(len(zf.namelist()), len(set(zf.namelist())))
+                self.assertEqual(sorted(zf.namelist()), sorted(x.img_path.split('@')[1] for x in expected.images))
+
     def test_od_as_ic_dataset_by_ignore_box(self):
         dataset, tempdir = DetectionTestFixtures.create_an_od_dataset()
         with tempdir:
@@ -1,4 +1,6 @@
+import concurrent.futures
 import contextlib
+import io
 import multiprocessing
 import os
 import pathlib
@@ -6,9 +8,16 @@ import pickle
 import tempfile
 import unittest
 import zipfile
+from unittest import mock
 
-from vision_datasets.common import FileReader
+import requests
+
+from vision_datasets.common import FileReader, HttpBackend, LocalObjectStoreBackend, StorageBackend, StorageBackendFactory
+from vision_datasets.common.data_reader.remote_zip_file import RemoteZipFile
 from vision_datasets.common.data_reader.file_reader import MultiProcessZipFile
+from vision_datasets.common.data_reader.zip_entry_index import ZipEntryIndex
+
+from .resources.util import local_http_server
 
 
 def open_zipfile(zip_file, filename, queue):
@@ -54,6 +63,114 @@ class TestMultiProcessZipFile(unittest.TestCase):
             deserialized.close()
             zip_file.close()
 
+    def test_read_stored_and_deflated_entries(self):
+        contents = {'a.txt': b'a' * 1000, 'dir/b.bin': os.urandom(1000), 'empty.txt': b''}
+        with self._with_test_zip(contents) as zip_filepath:
+            with zipfile.ZipFile(zip_filepath, 'a', zipfile.ZIP_DEFLATED) as f:
+                f.writestr('c.txt', b'c' * 1000)
+            zip_file = MultiProcessZipFile(zip_filepath)
+            for name, data in {**contents, 'c.txt': b'c' * 1000}.items():
+                with zip_file.open(name) as z:
+                    self.assertEqual(z.read(), data)
+            with self.assertRaises(KeyError):
+                zip_file.open('missing.txt')
+            self.assertEqual(zip_file.zipfiles, {})
+            zip_file.close()
+
+    def test_index_persisted_and_invalidated(self):
+        with self._with_test_zip({'test.txt': b'contents'}) as zip_filepath:
+            zip_file = MultiProcessZipFile(zip_filepath)
+            with zip_file.open('test.txt') as z:
+                self.assertEqual(z.read(), b'contents')
+            zip_file.close()
+            self.assertTrue(ZipEntryIndex.get_index_path(zip_filepath).exists())
+
+            with mock.patch.object(ZipEntryIndex, 'build', wraps=ZipEntryIndex.build) as build:
+                zip_file = MultiProcessZipFile(zip_filepath)
+                with zip_file.open('test.txt') as z:
+                    self.assertEqual(z.read(), b'contents')
+                zip_file.close()
+                build.assert_not_called()
+
+                with zipfile.ZipFile(zip_filepath, 'a') as f:
+                    f.writestr('test2.txt', b'contents2')
+                os.utime(zip_filepath, ns=(0, 0))
+                zip_file = MultiProcessZipFile(zip_filepath)
+                with zip_file.open('test2.txt') as z:
+                    self.assertEqual(z.read(), b'contents2')
+                zip_file.close()
+                build.assert_called_once()
+
+    def test_index_dir(self):
+        with self._with_test_zip({'test.txt': b'contents'}) as zip_filepath, tempfile.TemporaryDirectory() as index_dir:
+            zip_file = MultiProcessZipFile(zip_filepath, index_dir)
+            with pickle.loads(pickle.dumps(zip_file)).open('test.txt') as z:
+                self.assertEqual(z.read(), b'contents')
+            self.assertFalse(ZipEntryIndex.get_index_path(zip_filepath).exists())
+            self.assertTrue(ZipEntryIndex.get_index_path(zip_filepath, index_dir).exists())
+
+    def test_large_entry_read_by_zipfile(self):
+        with self._with_test_zip({'test.txt': b'contents'}) as zip_filepath:
+            zip_file = MultiProcessZipFile(zip_filepath)
+            zip_file.MAX_DIRECT_READ_SIZE = 4
+            with zip_file.open('test.txt') as z:
+                self.assertEqual(z.read(), b'contents')
+            self.assertEqual(len(zip_file.zipfiles), 1)
+            zip_file.close()
+
+    def test_corrupted_entry(self):
+        with self._with_test_zip({'test.txt': b'contents'}) as zip_filepath:
+            data = zip_filepath.read_bytes()
+            zip_filepath.write_bytes(data.replace(b'contents', b'Contents'))
+            zip_file = MultiProcessZipFile(zip_filepath)
+            with self.assertRaises(zipfile.BadZipFile):
+                zip_file.open('test.txt')
+            zip_file.close()
+
+    def test_mmap_stored_entries(self):
+        contents = {'a.txt': b'0123456789', 'empty.txt': b''}
+        with self._with_test_zip(contents) as zip_filepath:
+            with zipfile.ZipFile(zip_filepath, 'a', zipfile.ZIP_DEFLATED) as f:
+                f.writestr('c.txt', b'c' * 1000)
+            zip_file = pickle.loads(pickle.dumps(MultiProcessZipFile(zip_filepath, use_mmap=True)))
+            self.assertTrue(zip_file.use_mmap)
+
+            with zip_file.open('empty.txt') as z:
+                self.assertEqual(z.read(), b'')
+            with zip_file.open('c.txt') as z:
+                self.assertEqual(z.read(), b'c' * 1000)
+
+            z = zip_file.open('a.txt')
+            self.assertEqual(bytes(z.getbuffer()), b'0123456789')
+            self.assertEqual(z.read(3), b'012')
+            self.assertEqual(z.seek(-2, os.SEEK_END), 8)
+            self.assertEqual(z.read(), b'89')
+            self.assertEqual(z.read(), b'')
+            z.seek(1)
+            buffer = bytearray(4)
+            self.assertEqual(z.readinto(buffer), 4)
+            self.assertEqual(buffer, b'1234')
+            self.assertEqual(z.tell(), 5)
+            self.assertEqual(len(zip_file._mmaps), 1)
+
+            # closing with open streams over the map is fine
+            zip_file.close()
+            self.assertEqual(z.read(), b'56789')
+            z.close()
+            with self.assertRaises(ValueError):
+                z.read()
+
+    def test_mmap_image(self):
+        from PIL import Image
+        image_bytes = io.BytesIO()
+        Image.new('RGB', (20, 10), color=(255, 0, 0)).save(image_bytes, 'PNG')
+        with self._with_test_zip({'1.png': image_bytes.getvalue()}) as zip_filepath:
+            zip_file = MultiProcessZipFile(zip_filepath, use_mmap=True)
+            with zip_file.open('1.png') as z, Image.open(z) as image:
+                self.assertEqual(image.size, (20, 10))
+                self.assertEqual(image.getpixel((0, 0)), (255, 0, 0))
+            zip_file.close()
+
     @staticmethod
     @contextlib.contextmanager
     def _with_test_zip(contents):
@@ -84,10 +201,128 @@ class TestFileReader(unittest.TestCase):
             self.assertIsNotNone(file)
             self.assertEqual(file.read(), b'zip_contents')
             file.close()
+            self.assertEqual(list(reader.zip_files), [os.path.join(tempdir, 'test.zip')])
 
             with reader.open(os.path.join(tempdir, 'test.txt')) as f:
                 self.assertEqual(f.read(), 'txt_contents')
             reader.close()
+            self.assertEqual(reader.zip_files, {})
+
+    def test_read_from_threads(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            zip_path = os.path.join(tempdir, 'test.zip')
+            with zipfile.ZipFile(zip_path, 'w') as f:
+                for i in range(64):
+                    f.writestr(f'{i}.txt', f'contents_{i}'.encode('utf-8'))
+
+            reader = FileReader()
+
+            def read(i):
+                with reader.open(f'{zip_path}@{i}.txt') as f:
+                    return f.read()
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+                self.assertEqual(list(executor.map(read, range(64))), [f'contents_{i}'.encode('utf-8') for i in range(64)])
+            self.assertEqual(len(reader._backends), 1)
+            self.assertEqual(len(next(iter(reader._backends.values())).zip_files), 1)
+
+            unpickled = pickle.loads(pickle.dumps(reader))
+            self.assertEqual(unpickled.open(f'{zip_path}@1.txt').read(), b'contents_1')
+            unpickled.close()
+            reader.close()
+
+    def test_read_url(self):
+        with local_http_server({'a.txt': b'a_contents', 'b.txt': b'b' * 100000}) as server:
+            file_reader = FileReader()
+            for _ in range(3):
+                with file_reader.open(f'{server.url}/a.txt?sig=x', 'rb') as f:
+                    self.assertEqual(f.read(), b'a_contents')
+                with file_reader.open(f'{server.url}/b.txt') as f:
+                    self.assertEqual(f.read(10), b'b' * 10)
+                    self.assertEqual(len(f.read()), 100000 - 10)
+            self.assertEqual(len(server.connections), 1)
+
+            with self.assertRaises(requests.HTTPError):
+                file_reader.open(f'{server.url}/missing.txt')
+            file_reader.close()
+
+    def test_read_remote_zip(self):
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, 'w') as zf:
+            for i in range(200):
+                zf.writestr(f'images/{i}.bin', os.urandom(10000), compress_type=zipfile.ZIP_STORED if i % 2 else zipfile.ZIP_DEFLATED)
+            zf.writestr('labels/1.txt', b'label_contents')
+        zip_bytes = stream.getvalue()
+
+        with local_http_server({'c/images.zip': zip_bytes}) as server, mock.patch.object(RemoteZipFile, 'TAIL_SIZE', 1024):
+            file_reader = FileReader()
+            with file_reader.open(f'{server.url}/c/images.zip@labels/1.txt?sig=x') as f:
+                self.assertEqual(f.read(), b'label_contents')
+            # tail, rest of the central directory and the entry
+            self.assertEqual(server.n_requests, 3)
+
+            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+                for name in ['images/7.bin', 'images/8.bin']:
+                    with file_reader.open(f'{server.url}/c/images.zip@{name}?sig=x') as f:
+                        self.assertEqual(f.read(), zf.read(name))
+            self.assertEqual(server.n_requests, 5)
+            self.assertLess(server.n_bytes_sent, len(zip_bytes) / 10)
+
+            with self.assertRaises(KeyError):
+                file_reader.open(f'{server.url}/c/images.zip@missing.txt?sig=x')
+
+            unpickled = pickle.loads(pickle.dumps(file_reader))
+            with unpickled.open(f'{server.url}/c/images.zip@labels/1.txt') as f:
+                self.assertEqual(f.read(), b'label_contents')
+            unpickled.close()
+            file_reader.close()
+
+    def test_set_http_pool_size(self):
+        pool_size = HttpBackend.POOL_SIZE
+        try:
+            FileReader.set_http_pool_size(4)
+            self.assertEqual(HttpBackend.POOL_SIZE, 4)
+            self.assertEqual(HttpBackend.get_session().get_adapter('https://a.com')._pool_maxsize, 4)
+            with self.assertRaises(ValueError):
+                FileReader.set_http_pool_size(0)
+        finally:
+            FileReader.set_http_pool_size(pool_size)
+
+    def test_local_object_store(self):
+        with tempfile.TemporaryDirectory() as tempdir, mock.patch.object(LocalObjectStoreBackend, 'ROOT_DIR', tempdir):
+            LocalObjectStoreBackend.put('localstore://container/dir/a.txt', b'contents')
+            file_reader = FileReader()
+            with file_reader.open('localstore://container/dir/a.txt?sig=x') as f:
+                self.assertFalse(f.seekable())
+                self.assertEqual(f.read(), b'contents')
+            file_reader.close()
+
+    def test_register_backend(self):
+        class MemoryBackend(StorageBackend):
+            files = {'mem://a/b.txt': b'b', 'x.mem': b'x'}
+            n_instances = 0
+
+            def __init__(self):
+                MemoryBackend.n_instances += 1
+                self.closed = False
+
+            def open(self, name, mode='r', encoding=None):
+                return io.BytesIO(self.files[name])
+
+            def close(self):
+                self.closed = True
+
+        with mock.patch.dict(StorageBackendFactory._scheme_mapping), mock.patch.object(StorageBackendFactory, '_pattern_mapping', list(StorageBackendFactory._pattern_mapping)):
+            StorageBackendFactory.register(schemes=['mem'], pattern=r'\.mem$')(MemoryBackend)
+            file_reader = FileReader()
+            self.assertEqual(file_reader.open('mem://a/b.txt').read(), b'b')
+            self.assertEqual(file_reader.open('x.mem').read(), b'x')
+            self.assertEqual(MemoryBackend.n_instances, 1)
+            backend = file_reader._backends[MemoryBackend]
+            file_reader.close()
+            self.assertTrue(backend.closed)
+
+        self.assertNotEqual(StorageBackendFactory.get_backend_class('mem://a/b.txt'), MemoryBackend)
 
 
 if __name__ == '__main__':
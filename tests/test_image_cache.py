@@ -0,0 +1,137 @@
+import os
+import pathlib
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from tests.test_fixtures import DetectionTestFixtures
+from vision_datasets.common import ImageCache, VisionDataset
+
+
+def _image(w=10, h=10, mode='RGB', img_format='JPEG'):
+    if mode == 'F':
+        image = Image.fromarray(np.random.rand(h, w).astype(np.float32), mode)
+    else:
+        image = Image.fromarray(np.random.randint(0, 255, (h, w, 3), dtype=np.uint8)).convert(mode)
+    image.format = img_format
+    return image
+
+
+class TestImageCache(unittest.TestCase):
+    def test_memory_hit(self):
+        cache = ImageCache()
+        for mode in ['RGB', 'I', 'F']:
+            image = _image(mode=mode)
+            self.assertIsNone(cache.get(mode))
+            cache.put(mode, image)
+            cached = cache.get(mode)
+            self.assertEqual(cached.mode, mode)
+            self.assertEqual(cached.format, 'JPEG')
+            np.testing.assert_array_equal(np.asarray(cached), np.asarray(image))
+        self.assertEqual(cache.stats['memory_hits'], 3)
+        self.assertEqual(cache.stats['misses'], 3)
+
+    def test_cached_image_not_modified_by_caller(self):
+        cache = ImageCache()
+        image = _image()
+        cache.put('a', image)
+        cached = cache.get('a')
+        cached.paste((0, 0, 0), (0, 0, 10, 10))
+        np.testing.assert_array_equal(np.asarray(cache.get('a')), np.asarray(image))
+
+    def test_lru_eviction_by_bytes(self):
+        cache = ImageCache(max_memory_bytes=2 * 10 * 10 * 3)
+        for key in ['a', 'b']:
+            cache.put(key, _image())
+        cache.get('a')
+        cache.put('c', _image())
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats['memory_bytes'], 600)
+
+        cache.put('too_large', _image(100, 100))
+        self.assertIsNone(cache.get('too_large'))
+
+    def test_disk_tier_shared_by_instances(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            image = _image(img_format='PNG')
+            ImageCache(max_memory_bytes=0, disk_dir=tempdir).put('a', image)
+            cache = ImageCache(max_memory_bytes=0, disk_dir=tempdir)
+            cached = cache.get('a')
+            self.assertEqual(cached.format, 'PNG')
+            np.testing.assert_array_equal(np.asarray(cached), np.asarray(image))
+            self.assertEqual(cache.stats['disk_hits'], 1)
+            self.assertIsNone(cache.get('b'))
+
+    def test_disk_eviction(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = ImageCache(max_memory_bytes=0, disk_dir=tempdir, max_disk_bytes=3 * 400)
+            for i in range(5):
+                cache.put(str(i), _image())
+            n_files = len(list(pathlib.Path(tempdir).glob('*.img')))
+            self.assertLessEqual(n_files, 3)
+            self.assertIsNotNone(cache.get('4'))
+            self.assertIsNone(cache.get('0'))
+
+    def test_disk_eviction_by_access_without_listing_dir(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = ImageCache(max_memory_bytes=0, disk_dir=tempdir, max_disk_bytes=3 * 400)
+            with mock.patch.object(pathlib.Path, 'glob', wraps=pathlib.Path(tempdir).glob) as glob:
+                for i in range(3):
+                    cache.put(str(i), _image())
+                self.assertIsNotNone(cache.get('0'))
+                cache.put('3', _image())
+                self.assertEqual(glob.call_count, 1)
+            self.assertIsNone(cache.get('1'))
+            for key in ['0', '2', '3']:
+                self.assertIsNotNone(cache.get(key))
+
+            # another process lists the files once, in the order of their last access
+            for i, key in enumerate(['0', '2', '3']):
+                os.utime(cache._disk_path(key), (1000 + i, 1000 + i))
+            cache = ImageCache(max_memory_bytes=0, disk_dir=tempdir, max_disk_bytes=3 * 400)
+            cache.put('4', _image())
+            self.assertIsNone(cache.get('0'))
+            self.assertIsNotNone(cache.get('3'))
+
+    def test_pickle_drops_memory_entries(self):
+        cache = ImageCache(max_memory_bytes=1000)
+        cache.put('a', _image())
+        cache = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(cache.max_memory_bytes, 1000)
+        self.assertIsNone(cache.get('a'))
+
+    def test_vision_dataset_with_cache(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(2)
+        with tempdir, tempfile.TemporaryDirectory() as cache_dir:
+            cached_dataset = VisionDataset(dataset.dataset_info, dataset.dataset_manifest, image_cache=ImageCache(disk_dir=cache_dir))
+            for _ in range(3):
+                for i in range(len(dataset)):
+                    image, target, _ = cached_dataset[i]
+                    expected_image, expected_target, _ = dataset[i]
+                    np.testing.assert_array_equal(np.asarray(image), np.asarray(expected_image))
+                    self.assertEqual(image.format, expected_image.format)
+                    self.assertEqual(target, expected_target)
+            self.assertEqual(cached_dataset.image_cache.stats['misses'], 2)
+            self.assertEqual(cached_dataset.image_cache.stats['memory_hits'], 4)
+
+    def test_vision_dataset_with_cache_and_target_size(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(2, coordinates='absolute')
+        with tempdir, tempfile.TemporaryDirectory() as cache_dir:
+            for target_size in [25, 50, None]:
+                expected = VisionDataset(dataset.dataset_info, dataset.dataset_manifest, 'absolute', target_size=target_size)
+                # the disk tier is shared by datasets of different target sizes, each of them hitting it on its second pass
+                for image_cache in [ImageCache(disk_dir=cache_dir), ImageCache(max_memory_bytes=0, disk_dir=cache_dir)]:
+                    cached_dataset = VisionDataset(dataset.dataset_info, dataset.dataset_manifest, 'absolute', image_cache=image_cache, target_size=target_size)
+                    for _ in range(2):
+                        for i in range(len(dataset)):
+                            image, target, _ = cached_dataset[i]
+                            expected_image, expected_target, _ = expected[i]
+                            self.assertEqual(image.size, expected_image.size)
+                            self.assertEqual([x.label_data for x in target], [x.label_data for x in expected_target])
+                self.assertEqual(image_cache.stats['misses'], 0)
@@ -0,0 +1,118 @@
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from vision_datasets.common import ImageDecoder, ImageDecoderFactory, PILImageLoader
+from vision_datasets.common.data_reader.image_loader import ORIENTATION_EXIF_TAG
+
+
+def _image_bytes(size, img_format, orientation=None, mode='RGB'):
+    image = Image.new(mode, size) if mode != 'RGB' else Image.fromarray(np.random.randint(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+    params = {}
+    if orientation is not None:
+        exif = image.getexif()
+        exif[ORIENTATION_EXIF_TAG] = orientation
+        params['exif'] = exif.tobytes()
+    stream = io.BytesIO()
+    image.save(stream, format=img_format, **params)
+    return stream.getvalue()
+
+
+class TestPILImageLoader(unittest.TestCase):
+    def test_load_full_size(self):
+        image = PILImageLoader.load_from_stream(io.BytesIO(_image_bytes((40, 30), 'JPEG')))
+        self.assertEqual(image.size, (40, 30))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.mode, 'RGB')
+        self.assertEqual(PILImageLoader.get_original_size(image), (40, 30))
+
+    def test_target_longest_edge(self):
+        for img_format in ['JPEG', 'PNG']:
+            with self.subTest(img_format=img_format):
+                image = PILImageLoader.load_from_stream(io.BytesIO(_image_bytes((1600, 1200), img_format)), 224)
+                self.assertGreaterEqual(max(image.size), 224)
+                self.assertLess(max(image.size), 448)
+                self.assertEqual(image.format, img_format)
+                self.assertEqual(image.mode, 'RGB')
+                self.assertEqual(PILImageLoader.get_original_size(image), (1600, 1200))
+
+    def test_target_size_with_orientation(self):
+        # transposed by EXIF, displayed as 300 x 1200
+        image = PILImageLoader.load_from_stream(io.BytesIO(_image_bytes((1200, 300), 'JPEG', orientation=6)), (100, 200))
+        self.assertEqual(PILImageLoader.get_original_size(image), (300, 1200))
+        self.assertEqual(image.size, (150, 600))
+
+    def test_target_size_not_reduced_below(self):
+        image = PILImageLoader.load_from_stream(io.BytesIO(_image_bytes((1000, 100), 'PNG', mode='P')), (100, 60))
+        self.assertEqual(image.size, (1000, 100))
+
+        image = PILImageLoader.load_from_stream(io.BytesIO(_image_bytes((1000, 100), 'PNG', mode='P')), (100, 20))
+        self.assertEqual(image.size, (200, 20))
+        self.assertEqual(image.mode, 'RGB')
+
+
+class PILArrayDecoder(ImageDecoder):
+    """Decoder through PIL arrays, standing for accelerated decoders which are not installed"""
+
+    FORMATS = ('JPEG',)
+    REDUCIBLE_FORMATS = ('JPEG',)
+    calls = []
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def decode(self, data, img_format, reduction=1):
+        PILArrayDecoder.calls.append(reduction)
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', (image.size[0] // reduction, image.size[1] // reduction))
+        return np.asarray(image.convert('RGB'))
+
+
+class TestImageDecoder(unittest.TestCase):
+    def setUp(self):
+        PILArrayDecoder.calls = []
+        patches = [mock.patch.dict(ImageDecoderFactory._mapping), mock.patch.dict(ImageDecoderFactory._instances), mock.patch.object(PILImageLoader, 'DECODER', None)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        ImageDecoderFactory.register('pil_array', priority=100)(PILArrayDecoder)
+
+    def test_fastest_available_decoder_used(self):
+        self.assertEqual(ImageDecoderFactory.list_available()[0], 'pil_array')
+        self.assertEqual(ImageDecoderFactory.list_available()[-1], 'pil')
+        self.assertIsInstance(ImageDecoderFactory.get_decoder('JPEG'), PILArrayDecoder)
+        self.assertNotIsInstance(ImageDecoderFactory.get_decoder('PNG'), PILArrayDecoder)
+        self.assertIsNone(ImageDecoderFactory.get_decoder('JPEG', 'pil'))
+        with self.assertRaises(ValueError):
+            ImageDecoderFactory.get_decoder('JPEG', 'unknown')
+
+    def test_same_output_as_pil(self):
+        cases = [((64, 48), 'JPEG', None, 'RGB', None), ((64, 48), 'JPEG', 6, 'RGB', None), ((64, 48), 'JPEG', 3, 'L', None), ((640, 480), 'JPEG', 8, 'RGB', (100, 100)),
+                 ((640, 480), 'JPEG', None, 'RGB', 70), ((64, 48), 'PNG', None, 'RGB', None), ((64, 48), 'TIFF', None, 'F', None)]
+        for size, img_format, orientation, mode, target_size in cases:
+            with self.subTest(img_format=img_format, orientation=orientation, mode=mode, target_size=target_size):
+                data = _image_bytes(size, img_format, orientation, mode)
+                expected = PILImageLoader.load_from_stream(io.BytesIO(data), target_size, decoder='pil')
+                image = PILImageLoader.load_from_stream(io.BytesIO(data), target_size)
+                self.assertEqual(image.format, expected.format)
+                self.assertEqual(image.mode, expected.mode)
+                self.assertEqual(image.size, expected.size)
+                self.assertEqual(PILImageLoader.get_original_size(image), PILImageLoader.get_original_size(expected))
+                np.testing.assert_array_equal(np.asarray(image), np.asarray(expected))
+
+        # JPEG images in RGB or L only, reduced while decoding for the target sizes
+        self.assertEqual(PILArrayDecoder.calls, [1, 1, 1, 4, 8])
+
+    def test_default_decoder(self):
+        data = _image_bytes((64, 48), 'JPEG')
+        with mock.patch.object(PILImageLoader, 'DECODER', 'pil'):
+            PILImageLoader.load_from_stream(io.BytesIO(data))
+        self.assertEqual(PILArrayDecoder.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
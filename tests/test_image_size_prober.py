@@ -0,0 +1,92 @@
+import io
+import pathlib
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+from vision_datasets.common import ColumnarDatasetManifest, DatasetManifest, DatasetTypes, ImageDataManifest, ImageSizeProber, PILImageLoader
+from vision_datasets.common.data_reader.image_loader import ORIENTATION_EXIF_TAG
+
+
+class NonSeekableStream(io.RawIOBase):
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+        self.n_bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.n_bytes_read += len(data)
+        return data
+
+
+def _image_bytes(size, img_format, orientation=None, exif_padding=0):
+    image = Image.fromarray(np.random.randint(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+    params = {}
+    if orientation is not None:
+        exif = image.getexif()
+        exif[ORIENTATION_EXIF_TAG] = orientation
+        if exif_padding:
+            exif[0x010e] = 'x' * exif_padding  # ImageDescription
+        params['exif'] = exif.tobytes()
+    stream = io.BytesIO()
+    image.save(stream, format=img_format, **params)
+    return stream.getvalue()
+
+
+class TestImageSizeProber(unittest.TestCase):
+    def test_same_size_as_loaded_image(self):
+        for img_format in ['JPEG', 'PNG', 'WEBP']:
+            for orientation in [None, 1, 3, 5, 6, 8]:
+                data = _image_bytes((40, 30), img_format, orientation)
+                expected = PILImageLoader.load_from_stream(io.BytesIO(data)).size
+                self.assertEqual(ImageSizeProber.probe_from_stream(io.BytesIO(data)), expected, (img_format, orientation))
+                self.assertEqual(expected, (30, 40) if orientation and orientation >= 5 else (40, 30))
+
+    def test_pixels_not_decoded(self):
+        data = _image_bytes((40, 30), 'JPEG', 6)
+        with patch('PIL.ImageFile.ImageFile.load', side_effect=AssertionError('decoded')):
+            self.assertEqual(ImageSizeProber.probe_from_stream(io.BytesIO(data)), (30, 40))
+
+    def test_non_seekable_stream_read_partially(self):
+        data = _image_bytes((1000, 800), 'JPEG', 6)
+        stream = NonSeekableStream(data)
+        with patch.object(ImageSizeProber, 'INITIAL_READ_SIZE', 1024):
+            self.assertEqual(ImageSizeProber.probe_from_stream(stream), (800, 1000))
+        self.assertLess(stream.n_bytes_read, len(data))
+
+    def test_non_seekable_stream_with_large_header(self):
+        data = _image_bytes((50, 20), 'JPEG', 8, exif_padding=20000)
+        with patch.object(ImageSizeProber, 'INITIAL_READ_SIZE', 1024):
+            self.assertEqual(ImageSizeProber.probe_from_stream(NonSeekableStream(data)), (20, 50))
+
+    def test_invalid_image(self):
+        with self.assertRaises(Exception):
+            ImageSizeProber.probe_from_stream(NonSeekableStream(b'not an image'))
+
+    def test_fill_image_sizes(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            tempdir = pathlib.Path(tempdir)
+            (tempdir / '0.jpg').write_bytes(_image_bytes((40, 30), 'JPEG', 6))
+            (tempdir / '1.png').write_bytes(_image_bytes((20, 10), 'PNG'))
+            with zipfile.ZipFile(tempdir / 'images.zip', 'w') as zf:
+                zf.writestr('2.jpg', _image_bytes((16, 8), 'JPEG'))
+
+            images = [ImageDataManifest(0, str(tempdir / '0.jpg'), None, None, []), ImageDataManifest(1, str(tempdir / '1.png'), None, 10, []),
+                      ImageDataManifest(2, str(tempdir / 'images.zip') + '@2.jpg', None, None, []), ImageDataManifest(3, str(tempdir / 'missing.jpg'), 5, 6, [])]
+            manifest = DatasetManifest(images, [], DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+            columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+            ImageSizeProber.fill_image_sizes(manifest, max_workers=2)
+            ImageSizeProber.fill_image_sizes(columnar, max_workers=2)
+
+            for m in [manifest, columnar]:
+                self.assertEqual([(x.width, x.height) for x in m.images], [(30, 40), (20, 10), (16, 8), (5, 6)])
+
+            with self.assertRaises(FileNotFoundError):
+                ImageSizeProber.fill_image_sizes(manifest, overwrite=True)
@@ -0,0 +1,59 @@
+import io
+import json
+import unittest
+
+from vision_datasets.common import JsonObjectStreamReader
+
+
+class TestJsonObjectStreamReader(unittest.TestCase):
+    DOC = {
+        'info': {'description': 'ünïcode 中文', 'year': 2023},
+        'images': [{'id': i, 'file_name': f'{i}.jpg', 'width': 1.5 * i} for i in range(20)],
+        'empty': [],
+        'numbers': [1, -2.5e3, 12345678901234567890],
+        'flag': True,
+        'nothing': None,
+    }
+
+    def _read(self, text, streamed_keys, chunk_size):
+        result = {}
+        for stream in [io.StringIO(text), io.BytesIO(text.encode('utf-8')), io.BytesIO(b'\xef\xbb\xbf' + text.encode('utf-8'))]:
+            items = {}
+            for key, value in JsonObjectStreamReader(stream, chunk_size).iter_items(streamed_keys):
+                items[key] = list(value) if key in streamed_keys and not isinstance(value, list) else value
+            result[type(stream)] = items
+            self.assertEqual(items, json.loads(text))
+        return result
+
+    def test_matches_json_load(self):
+        for indent in [None, 2]:
+            text = json.dumps(self.DOC, indent=indent, ensure_ascii=False)
+            for chunk_size in [1, 2, 3, 7, 64, 1 << 20]:
+                self._read(text, {'images', 'empty', 'numbers'}, chunk_size)
+
+    def test_key_order_preserved(self):
+        text = json.dumps(self.DOC)
+        keys = [key for key, _ in JsonObjectStreamReader(io.StringIO(text), 5).iter_items({'images'})]
+        self.assertEqual(keys, list(self.DOC.keys()))
+
+    def test_unconsumed_elements_skipped(self):
+        text = json.dumps(self.DOC)
+        items = {}
+        for key, value in JsonObjectStreamReader(io.StringIO(text), 4).iter_items({'images'}):
+            items[key] = next(value) if key == 'images' else value
+        self.assertEqual(items['images'], self.DOC['images'][0])
+        self.assertEqual(items['flag'], True)
+
+    def test_non_array_streamed_key_yields_value(self):
+        items = dict(JsonObjectStreamReader(io.StringIO('{"images": {"a": 1}}')).iter_items({'images'}))
+        self.assertEqual(items, {'images': {'a': 1}})
+
+    def test_empty_object(self):
+        self.assertEqual(list(JsonObjectStreamReader(io.StringIO(' { } ')).iter_items()), [])
+
+    def test_invalid_documents(self):
+        for text in ['[1, 2]', '{"a": 1', '{"a" 1}', '{"a": [1 2]}', '{1: 2}', '']:
+            with self.assertRaises(ValueError):
+                for _, value in JsonObjectStreamReader(io.StringIO(text), 2).iter_items({'a'}):
+                    if not isinstance(value, int):
+                        list(value)
@@ -0,0 +1,85 @@
+import pathlib
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from vision_datasets.commands.utils import convert_to_jsonl
+from vision_datasets.common import DatasetInfo, DatasetManifest, DatasetTypes, ImageDataManifest, JsonlDataset
+from vision_datasets.image_caption import ImageCaptionLabelManifest
+from vision_datasets.image_object_detection import ImageObjectDetectionLabelManifest
+
+from .test_fixtures import DetectionTestFixtures
+
+
+class TestJsonlDataset(unittest.TestCase):
+    def test_not_flattened(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(n_images=3)
+        with tempdir:
+            jsonl_path = pathlib.Path(tempdir.name) / 'train.jsonl'
+            convert_to_jsonl(dataset.dataset_manifest, jsonl_path, flatten=False)
+            jsonl_dataset = JsonlDataset(dataset.dataset_info, [jsonl_path], dataset.categories)
+            self.assertEqual(len(jsonl_dataset), 3)
+            self.assertEqual(jsonl_dataset.categories, dataset.categories)
+
+            image, labels, img_id = jsonl_dataset[1]
+            self.assertEqual(img_id, '2')
+            self.assertEqual(image.size, (100, 100))
+            self.assertEqual([x.label_data for x in labels], [[2, 50, 50, 80, 80], [3, 0, 50, 100, 100]])
+            self.assertEqual([x.label_data for x in labels], [x.label_data for x in dataset.dataset_manifest.images[1].labels])
+            self.assertTrue(all(isinstance(x, ImageObjectDetectionLabelManifest) for x in labels))
+            self.assertEqual([x.label_data for x in jsonl_dataset.get_targets(1)], [x.label_data for x in labels])
+
+            unpickled = pickle.loads(pickle.dumps(jsonl_dataset))
+            self.assertEqual(unpickled[2][2], '3')
+            unpickled.close()
+            jsonl_dataset.close()
+
+    def test_flattened(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(n_images=2)
+        with tempdir:
+            jsonl_paths = [pathlib.Path(tempdir.name) / 'train.jsonl', pathlib.Path(tempdir.name) / 'train2.jsonl']
+            for jsonl_path in jsonl_paths:
+                convert_to_jsonl(dataset.dataset_manifest, jsonl_path, flatten=True)
+            jsonl_dataset = JsonlDataset(dataset.dataset_info, jsonl_paths, dataset.categories)
+            # rows of the labels of an image are one sample
+            self.assertEqual(len(jsonl_dataset), 4)
+            self.assertEqual([jsonl_dataset[i][2] for i in range(4)], ['1', '2'] * 2)
+            self.assertEqual([x.label_data for x in jsonl_dataset.get_targets(2)], [x.label_data for x in dataset.dataset_manifest.images[0].labels])
+            self.assertEqual([x.label_data for x in jsonl_dataset[3][1]], [x.label_data for x in dataset.dataset_manifest.images[1].labels])
+            self.assertEqual(np.asarray(jsonl_dataset[3][0]).shape, (100, 100, 3))
+            with self.assertRaises(IndexError):
+                jsonl_dataset.get_targets(4)
+
+            unpickled = pickle.loads(pickle.dumps(jsonl_dataset))
+            self.assertEqual(len(unpickled), 4)
+            self.assertEqual(unpickled[1][2], '2')
+            unpickled.close()
+            jsonl_dataset.close()
+
+    def test_categories_required(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(n_images=1)
+        with tempdir:
+            jsonl_path = pathlib.Path(tempdir.name) / 'train.jsonl'
+            convert_to_jsonl(dataset.dataset_manifest, jsonl_path, flatten=True)
+            with self.assertRaises(ValueError):
+                JsonlDataset(dataset.dataset_info, [jsonl_path])
+
+    def test_caption(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            Image.new('RGB', (10, 10)).save(pathlib.Path(tempdir) / '1.jpg')
+            images = [ImageDataManifest(1, str(pathlib.Path(tempdir) / '1.jpg'), 10, 10, [ImageCaptionLabelManifest('a cat'), ImageCaptionLabelManifest('a pet')])]
+            manifest = DatasetManifest(images, None, DatasetTypes.IMAGE_CAPTION)
+            jsonl_path = pathlib.Path(tempdir) / 'train.jsonl'
+            convert_to_jsonl(manifest, jsonl_path, flatten=True)
+            dataset_info = DatasetInfo({'name': 'dummy', 'type': 'image_caption', 'format': 'coco', 'test': {'index_path': 'test.json'}})
+            jsonl_dataset = JsonlDataset(dataset_info, [jsonl_path])
+            self.assertEqual(len(jsonl_dataset), 1)
+            self.assertEqual([x.caption for x in jsonl_dataset.get_targets(0)], ['a cat', 'a pet'])
+            jsonl_dataset.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
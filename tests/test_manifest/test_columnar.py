@@ -0,0 +1,172 @@
+import copy
+import json
+import pathlib
+import pickle
+import tempfile
+
+import numpy as np
+import pytest
+
+from vision_datasets.common import BalancedInstanceWeightsGenerator, CategoryManifest, CocoDictGeneratorFactory, CocoManifestAdaptorFactory, ColumnarDatasetManifest, \
+    ColumnarDatasetManifestBuilder, DatasetFilter, DatasetManifest, DatasetTypes, \
+    ImageDataManifest, ImageNoAnnotationFilter, ManifestMerger, ManifestMergeStrategyFactory, RemoveCategories, RemoveCategoriesConfig, SampleByFewShotConfig, SampleByNumSamplesConfig, \
+    SampleStrategyFactory, SampleStrategyType, SpawnConfig, SpawnFactory, SplitConfig, SplitFactory, WeightsGenerationConfig
+from vision_datasets.image_classification.manifest import ImageClassificationLabelManifest
+from vision_datasets.image_object_detection.manifest import ImageObjectDetectionLabelManifest
+
+from ..resources.util import coco_database, coco_dict_to_manifest
+
+DATA_TYPES = [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_OBJECT_DETECTION]
+TEST_CASES = [(task, coco_dict) for task in DATA_TYPES for coco_dict in coco_database[task]]
+
+
+def _od_manifest():
+    images = [
+        ImageDataManifest(0, './0.jpg', 10, 10, []),
+        ImageDataManifest(1, './1.jpg', 10, None, [ImageObjectDetectionLabelManifest([0, 1, 1, 2, 2]), ImageObjectDetectionLabelManifest([1, 2.5, 2, 3, 3], additional_info={'iscrowd': 1})]),
+        ImageDataManifest(2, './2.jpg', 10, 10, [ImageObjectDetectionLabelManifest([1, 1, 1, 2, 2])], additional_info={'source': 'web'}),
+        ImageDataManifest(3, './3.jpg', 10, 10, [ImageObjectDetectionLabelManifest([1, 0, 0, 2, 2]),
+                          ImageObjectDetectionLabelManifest([2, 1, 1, 2, 2]), ImageObjectDetectionLabelManifest([3, 2, 2, 3, 3])]),
+    ]
+    return DatasetManifest(images, [CategoryManifest(i, x) for i, x in enumerate(['a', 'b', 'c', 'd'])], DatasetTypes.IMAGE_OBJECT_DETECTION)
+
+
+class TestColumnarDatasetManifest:
+    @pytest.mark.parametrize("task, coco_dict", TEST_CASES)
+    def test_same_images_as_source(self, task, coco_dict):
+        manifest = coco_dict_to_manifest(task, coco_dict)
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        assert len(columnar) == len(manifest)
+        assert columnar == manifest
+        assert columnar.images[-1] == manifest.images[-1]
+        assert columnar.images[0:1] == manifest.images[0:1]
+
+    def test_od_columns(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        assert columnar == manifest
+        assert columnar.images[1].height is None
+        assert columnar.images[1].labels[1].additional_info == {'iscrowd': 1}
+        assert columnar.images[2].additional_info == {'source': 'web'}
+        assert columnar.get_category_ids(3).tolist() == [1, 2, 3]
+        assert columnar.get_boxes(1).tolist() == [[1, 1, 2, 2], [2.5, 2, 3, 3]]
+        assert columnar.n_labels(0) == 0
+
+    def test_box_coordinate_types_kept(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        for image, expected_image in zip(columnar.images, manifest.images):
+            for label, expected_label in zip(image.labels, expected_image.labels):
+                assert [type(x) for x in label.label_data] == [type(x) for x in expected_label.label_data]
+        assert columnar.images[1].labels[1].label_data == [1, 2.5, 2, 3, 3]
+
+        float_boxes = [ImageDataManifest(0, './0.jpg', 10, 10, [ImageObjectDetectionLabelManifest([0, 1.0, 1.0, 2.0, 2.0])])]
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(DatasetManifest(float_boxes, [CategoryManifest(0, 'a')], DatasetTypes.IMAGE_OBJECT_DETECTION))
+        assert columnar.box_int_mask is None
+        assert [type(x) for x in columnar.images[0].labels[0].label_data[1:]] == [float] * 4
+
+    def test_str_ids(self):
+        images = [ImageDataManifest(f'{i}.jpg', f'./{i}.jpg', 10, 10, [ImageClassificationLabelManifest(i % 2)]) for i in range(5)]
+        manifest = DatasetManifest(images, [CategoryManifest(0, 'a'), CategoryManifest(1, 'b')], DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        assert [x.id for x in columnar.images] == [f'{i}.jpg' for i in range(5)]
+        assert columnar == manifest
+
+    def test_multitask_not_supported(self):
+        manifest = DatasetManifest([], {'a': []}, {'a': DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS})
+        with pytest.raises(ValueError):
+            ColumnarDatasetManifest.from_dataset_manifest(manifest)
+
+    def test_deepcopy_and_materialize(self):
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(_od_manifest())
+        copied = copy.deepcopy(columnar)
+        assert type(copied) is ColumnarDatasetManifest
+        assert copied == columnar
+        assert copied.boxes is not columnar.boxes
+
+        materialized = columnar.to_dataset_manifest()
+        assert type(materialized) is DatasetManifest
+        materialized.images[1].labels[0].category_id = 3
+        assert columnar.images[1].labels[0].category_id == 0
+
+    @pytest.mark.parametrize("task, coco_dict", TEST_CASES)
+    def test_from_coco_without_image_manifests(self, task, coco_dict):
+        manifest = coco_dict_to_manifest(task, coco_dict)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            coco_path = pathlib.Path(temp_dir) / 'coco.json'
+            # annotations first and in reverse order, images not sorted by id
+            coco_path.write_text(json.dumps({**coco_dict, 'annotations': coco_dict['annotations'][::-1], 'images': coco_dict['images'][::-1]}))
+            columnar = CocoManifestAdaptorFactory.create(task).create_columnar_dataset_manifest(str(coco_path))
+        assert isinstance(columnar, ColumnarDatasetManifest)
+        expected = ColumnarDatasetManifest.from_dataset_manifest(coco_dict_to_manifest(task, {**coco_dict, 'annotations': coco_dict['annotations'][::-1]}))
+        assert columnar == expected
+        assert len(columnar) == len(manifest)
+        assert columnar.categories == manifest.categories
+
+    def test_from_arrays(self):
+        manifest = _od_manifest()
+        # labels of images out of order, in the order of the images otherwise
+        label_image_indices = np.array([3, 1, 3, 2, 1, 3])
+        category_ids = np.array([1, 0, 2, 1, 1, 3])
+        boxes = np.array([[0, 0, 2, 2], [1, 1, 2, 2], [1, 1, 2, 2], [1, 1, 2, 2], [2.5, 2, 3, 3], [2, 2, 3, 3]])
+        columnar = ColumnarDatasetManifest.from_arrays(np.arange(4), [f'./{i}.jpg' for i in range(4)], label_image_indices, category_ids, ImageObjectDetectionLabelManifest,
+                                                       manifest.categories, DatasetTypes.IMAGE_OBJECT_DETECTION, boxes, widths=np.full(4, 10.0), heights=np.array([10, np.nan, 10, 10]))
+        assert columnar.get_category_ids(3).tolist() == [1, 2, 3]
+        assert columnar.get_boxes(1).tolist() == [[1, 1, 2, 2], [2.5, 2, 3, 3]]
+        assert [[y.label_data for y in x.labels] for x in columnar.images] == [[y.label_data for y in x.labels] for x in manifest.images]
+        assert columnar.images[1].height is None
+        with pytest.raises(ValueError):
+            ColumnarDatasetManifest.from_arrays([0], ['./0.jpg'], [1], [0], ImageObjectDetectionLabelManifest, manifest.categories, DatasetTypes.IMAGE_OBJECT_DETECTION, [[0, 0, 1, 1]])
+
+    def test_builder_labels_in_any_order(self):
+        manifest = _od_manifest()
+        builder = ColumnarDatasetManifestBuilder()
+        for image in manifest.images[::-1]:
+            builder.add_image(image.id, image.img_path, image.width, image.height, image.additional_info)
+        for image_index, label_index in [(0, 0), (2, 0), (0, 1), (1, 0), (0, 2), (2, 1)]:
+            builder.add_label(image_index, manifest.images[3 - image_index].labels[label_index])
+        assert builder.n_labels(0) == 3
+        assert builder.build(manifest.categories, manifest.data_type, sort_by_image_id=True) == manifest
+
+    def test_pickleable(self):
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(_od_manifest())
+        assert pickle.loads(pickle.dumps(columnar)) == columnar
+
+
+class TestOperationsOnColumnarDatasetManifest:
+    def test_split(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        split = SplitFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION, SplitConfig(0.5, 1))
+        assert split.run(columnar) == split.run(manifest)
+
+    def test_sample(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        for strategy_type, config in [(SampleStrategyType.NumSamples, SampleByNumSamplesConfig(0, True, 10)), (SampleStrategyType.FewShot, SampleByFewShotConfig(0, 1))]:
+            sampler = SampleStrategyFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION, strategy_type, config)
+            assert sampler.sample(columnar) == sampler.sample(manifest)
+
+    def test_filter_and_remove_categories(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        dataset_filter = DatasetFilter(ImageNoAnnotationFilter())
+        assert dataset_filter.run(columnar) == dataset_filter.run(manifest)
+        remover = RemoveCategories(RemoveCategoriesConfig(['a', 'c']))
+        assert remover.run(columnar) == remover.run(manifest)
+
+    def test_spawn_and_merge(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        spawn = SpawnFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION, SpawnConfig(0, 12))
+        assert spawn.run(columnar) == spawn.run(manifest)
+        merger = ManifestMerger(ManifestMergeStrategyFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION))
+        assert merger.run(columnar, columnar) == merger.run(manifest, manifest)
+
+    def test_coco_and_weights(self):
+        manifest = _od_manifest()
+        columnar = ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        coco_generator = CocoDictGeneratorFactory.create(DatasetTypes.IMAGE_OBJECT_DETECTION)
+        assert coco_generator.run(columnar) == coco_generator.run(manifest)
+        weights_generator = BalancedInstanceWeightsGenerator(WeightsGenerationConfig())
+        assert list(weights_generator.run(columnar)) == list(weights_generator.run(manifest))
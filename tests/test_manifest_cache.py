@@ -0,0 +1,145 @@
+import io
+import json
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from vision_datasets.common import CategoryManifest, FileReader, ColumnarDatasetManifest, DataManifestFactory, DatasetInfo, DatasetManifest, DatasetTypes, ImageDataManifest, ManifestCache, Usages
+from vision_datasets.image_classification import ImageClassificationLabelManifest
+
+from .resources.util import coco_database, local_http_server
+
+
+class TestManifestCache(unittest.TestCase):
+    @staticmethod
+    def _dataset_info(root_folder, task, index_path='train.json', data_format='coco'):
+        return DatasetInfo({'name': 'dummy', 'version': 1, 'type': task, 'root_folder': root_folder, 'format': data_format, 'train': {'index_path': index_path}})
+
+    def test_coco_cached_as_columnar(self):
+        coco_dict = coco_database[DatasetTypes.IMAGE_OBJECT_DETECTION][0]
+        with tempfile.TemporaryDirectory() as tempdir:
+            pathlib.Path(tempdir, 'train.json').write_text(json.dumps(coco_dict))
+            dataset_info = self._dataset_info(tempdir, 'object_detection')
+            cache_dir = os.path.join(tempdir, 'cache')
+            expected = DataManifestFactory.create(dataset_info, Usages.TRAIN)
+
+            first = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir, columnar=True)
+            self.assertEqual(first, expected)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            cached = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir, columnar=True)
+            self.assertIsInstance(cached, ColumnarDatasetManifest)
+            self.assertIsInstance(cached.boxes, np.memmap)
+            self.assertEqual(cached, expected)
+            self.assertEqual(cached.categories, expected.categories)
+            self.assertEqual([[type(x) for x in label.label_data] for image in cached.images for label in image.labels],
+                             [[type(x) for x in label.label_data] for image in expected.images for label in image.labels])
+
+    def test_cached_manifest_same_type_as_uncached(self):
+        coco_dict = coco_database[DatasetTypes.IMAGE_OBJECT_DETECTION][0]
+        with tempfile.TemporaryDirectory() as tempdir:
+            pathlib.Path(tempdir, 'train.json').write_text(json.dumps(coco_dict))
+            dataset_info = self._dataset_info(tempdir, 'object_detection')
+            cache_dir = os.path.join(tempdir, 'cache')
+            expected = DataManifestFactory.create(dataset_info, Usages.TRAIN)
+            for _ in range(2):
+                manifest = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir)
+                self.assertIs(type(manifest), DatasetManifest)
+                self.assertEqual(manifest, expected)
+
+            manifest.images[0].img_path = 'new.jpg'
+            self.assertEqual(manifest.images[0].img_path, 'new.jpg')
+
+    def test_index_file_change_invalidates(self):
+        coco_dicts = coco_database[DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS]
+        with tempfile.TemporaryDirectory() as tempdir:
+            dataset_info = self._dataset_info(tempdir, 'classification_multiclass')
+            cache_dir = os.path.join(tempdir, 'cache')
+            for coco_dict in [coco_dicts[0], {**coco_dicts[0], 'images': coco_dicts[0]['images'][::-1]}]:
+                pathlib.Path(tempdir, 'train.json').write_text(json.dumps(coco_dict))
+                manifest = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir)
+                manifest = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir)
+                self.assertEqual(manifest, DataManifestFactory.create(dataset_info, Usages.TRAIN))
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_key_from_local_file_metadata(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = pathlib.Path(tempdir, 'train.json')
+            path.write_bytes(b'{}')
+            with mock.patch.object(FileReader, 'open') as file_open:
+                key = ManifestCache.compute_key([str(path), None], 'coco')
+                self.assertEqual(ManifestCache.compute_key([str(path), None], 'coco'), key)
+                file_open.assert_not_called()
+
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            self.assertNotEqual(ManifestCache.compute_key([str(path), None], 'coco'), key)
+            self.assertNotEqual(ManifestCache.compute_key([str(path), None], 'iris'), key)
+
+    def test_key_from_url_etag(self):
+        with local_http_server({'train.json': b'{}', 'index.zip': b'zip'}) as server:
+            key = ManifestCache.compute_key([f'{server.url}/train.json?sas', f'{server.url}/index.zip@train.json?sas'])
+            self.assertEqual(server.n_requests, 0)
+            self.assertEqual(ManifestCache.compute_key([f'{server.url}/train.json?sas', f'{server.url}/index.zip@train.json?sas']), key)
+            server.files['train.json'] = b'{"images": []}'
+            self.assertNotEqual(ManifestCache.compute_key([f'{server.url}/train.json?sas', f'{server.url}/index.zip@train.json?sas']), key)
+
+    def test_key_from_content_without_metadata(self):
+        with local_http_server({}) as server:
+            # HEAD fails, GET is mocked
+            with mock.patch.object(FileReader, 'open', side_effect=lambda *args: io.BytesIO(b'{}')):
+                key = ManifestCache.compute_key([f'{server.url}/train.json'])
+            with mock.patch.object(FileReader, 'open', side_effect=lambda *args: io.BytesIO(b'[]')):
+                self.assertNotEqual(ManifestCache.compute_key([f'{server.url}/train.json']), key)
+
+    def test_non_columnar_manifest_cached(self):
+        coco_dict = coco_database[DatasetTypes.IMAGE_CAPTION][0]
+        with tempfile.TemporaryDirectory() as tempdir:
+            pathlib.Path(tempdir, 'train.json').write_text(json.dumps(coco_dict))
+            dataset_info = self._dataset_info(tempdir, 'image_caption')
+            cache_dir = os.path.join(tempdir, 'cache')
+            DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir)
+            cached = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir)
+            self.assertNotIsInstance(cached, ColumnarDatasetManifest)
+            self.assertEqual(cached, DataManifestFactory.create(dataset_info, Usages.TRAIN))
+
+    def test_iris(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            pathlib.Path(tempdir, 'train.txt').write_text('0.jpg 0,1\n1.jpg 1\n2.jpg 2')
+            dataset_info = DatasetInfo({'name': 'dummy', 'version': 1, 'type': 'classification_multilabel', 'root_folder': tempdir, 'train': {'index_path': 'train.txt'}})
+            cache_dir = os.path.join(tempdir, 'cache')
+            DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir)
+            cached = DataManifestFactory.create(dataset_info, Usages.TRAIN, cache_dir=cache_dir, columnar=True)
+            self.assertIsInstance(cached, ColumnarDatasetManifest)
+            self.assertEqual(cached, DataManifestFactory.create(dataset_info, Usages.TRAIN))
+
+    def test_missing_usage(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            dataset_info = self._dataset_info(tempdir, 'classification_multiclass')
+            self.assertIsNone(DataManifestFactory.create(dataset_info, Usages.TEST, cache_dir=os.path.join(tempdir, 'cache')))
+
+    def test_str_ids_and_additional_info_roundtrip(self):
+        images = [ImageDataManifest(f'{i}.jpg', f'./{i}.jpg', 10, 10, [ImageClassificationLabelManifest(i % 2, additional_info={'score': i})], additional_info={'i': i}) for i in range(5)]
+        manifest = DatasetManifest(images, [CategoryManifest(0, 'a'), CategoryManifest(1, 'b')], DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, {'info': 'x'})
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = ManifestCache(tempdir)
+            self.assertTrue(cache.save('key', manifest))
+            cached = cache.load('key')
+            self.assertEqual(cached, manifest)
+            self.assertEqual([x.additional_info for x in cached.images], [x.additional_info for x in manifest.images])
+            self.assertEqual(cached.additional_info, {'info': 'x'})
+
+    def test_corrupted_entry_recreated(self):
+        manifest = DatasetManifest([ImageDataManifest(0, './0.jpg', 10, 10, [ImageClassificationLabelManifest(0)])], [CategoryManifest(0, 'a')], DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = ManifestCache(tempdir)
+            cache.save('key', manifest)
+            pathlib.Path(tempdir, 'key', 'meta.pkl').write_bytes(b'corrupted')
+            self.assertIsNone(cache.load('key'))
+            self.assertEqual(cache.get_or_create('key', lambda: manifest), manifest)
+            self.assertEqual(cache.load('key'), manifest)
+            self.assertEqual(os.listdir(tempdir), ['key'])
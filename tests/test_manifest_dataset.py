@@ -9,7 +9,7 @@ import numpy as np
 from PIL import Image
 
 from tests.test_fixtures import DetectionTestFixtures
-from vision_datasets.common import CocoManifestAdaptorFactory, DatasetInfo, DatasetInfoFactory, DatasetTypes, Usages, VisionDataset
+from vision_datasets.common import CocoManifestAdaptorFactory, ColumnarDatasetManifest, DatasetInfo, DatasetInfoFactory, DatasetTypes, Usages, VisionDataset
 from vision_datasets.common.data_manifest.iris_data_manifest_adaptor import IrisManifestAdaptor
 
 from .resources.util import coco_database, schema_database
@@ -67,6 +67,69 @@ class TestVisionDataset(unittest.TestCase):
             self.assertEqual([label.label_data for label in target0], [[0, 0.0, 0.0, 100.0, 100.0], [1, 10.0, 10.0, 50.0, 100.0]])
             self.assertEqual([label.label_data for label in target1], [[1, 50.0, 50.0, 80.0, 80.0], [3, 0.0, 50.0, 100.0, 100.0]])
 
+    def test_od_relative_targets_do_not_modify_manifest(self):
+        dataset, tempdir = self._create_an_od_dataset()
+        with tempdir:
+            _, target0, _ = dataset[0]
+            target0[0].label_data[1] = 0.3
+            self.assertEqual([label.label_data for label in dataset.dataset_manifest.images[0].labels], [[0, 0.0, 0.0, 100.0, 100.0], [1, 10.0, 10.0, 50.0, 100.0]])
+            self.assertEqual([label.label_data for label in dataset.get_targets(0)], [[0, 0.0, 0.0, 1.0, 1.0], [1, 0.1, 0.1, 0.5, 1.0]])
+
+    def test_od_boxes_as_array(self):
+        dataset, tempdir = self._create_an_od_dataset()
+        with tempdir:
+            for manifest in [dataset.dataset_manifest, ColumnarDatasetManifest.from_dataset_manifest(dataset.dataset_manifest)]:
+                for coordinates in ['relative', 'absolute']:
+                    expected = VisionDataset(dataset.dataset_info, dataset.dataset_manifest, coordinates)
+                    array_dataset = VisionDataset(dataset.dataset_info, manifest, coordinates, boxes_as_array=True)
+                    for i in range(len(expected)):
+                        _, target, _ = array_dataset[i]
+                        self.assertEqual(target.dtype, np.float32)
+                        self.assertEqual(target.shape, (2, 5))
+                        np.testing.assert_array_equal(target, np.array([label.label_data for label in expected[i][1]], dtype=np.float32))
+                        np.testing.assert_array_equal(array_dataset.get_targets(i), np.array([label.label_data for label in expected.get_targets(i)], dtype=np.float32))
+
+    def test_od_target_size(self):
+        dataset, tempdir = self._create_an_od_dataset()
+        with tempdir:
+            for manifest in [dataset.dataset_manifest, ColumnarDatasetManifest.from_dataset_manifest(dataset.dataset_manifest)]:
+                for coordinates in ['relative', 'absolute']:
+                    expected = VisionDataset(dataset.dataset_info, dataset.dataset_manifest, coordinates, boxes_as_array=True)
+                    reduced = VisionDataset(dataset.dataset_info, manifest, coordinates, boxes_as_array=True, target_size=25)
+                    for i in range(len(expected)):
+                        image, target, _ = reduced[i]
+                        self.assertEqual(image.size, (25, 25))
+                        expected_target = expected[i][1] / ([1, 4, 4, 4, 4] if coordinates == 'absolute' else 1)
+                        np.testing.assert_allclose(target, expected_target)
+
+            reduced = VisionDataset(dataset.dataset_info, dataset.dataset_manifest, 'absolute', target_size=(50, 50))
+            self.assertEqual([label.label_data for label in reduced[0][1]], [[0, 0.0, 0.0, 50.0, 50.0], [1, 5.0, 5.0, 25.0, 50.0]])
+            self.assertEqual([label.label_data for label in dataset.dataset_manifest.images[0].labels], [[0, 0.0, 0.0, 100.0, 100.0], [1, 10.0, 10.0, 50.0, 100.0]])
+
+    def test_get_many(self):
+        dataset, tempdir = self._create_an_od_dataset()
+        with tempdir:
+            indices = [1, 0, np.int64(1), 1, 0]
+            samples = dataset.get_many(indices, max_workers=4)
+            self.assertEqual([x[2] for x in samples], ['1', '0', '1', '1', '0'])
+            for sample, index in zip(samples, indices):
+                self.assertEqual([label.label_data for label in sample[1]], [label.label_data for label in dataset[int(index)][1]])
+            self.assertEqual([x[2] for x in dataset.get_many(range(2), max_workers=1)], ['0', '1'])
+            self.assertEqual(dataset.get_many([]), [])
+
+            with self.assertRaises(IndexError):
+                dataset.get_many([0, 2])
+            with self.assertRaises(ValueError):
+                dataset.get_many([0], max_workers=0)
+
+    def test_od_boxes_as_array_without_labels(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dataset_manifest = DetectionTestFixtures.create_an_od_manifest(temp_dir, n_images=1)
+            dataset_manifest.images[0].labels = []
+            Image.new('RGB', (100, 100)).save(pathlib.Path(temp_dir) / '1.jpg')
+            dataset = VisionDataset(DatasetInfo(DetectionTestFixtures.DATASET_INFO_DICT), dataset_manifest, boxes_as_array=True)
+            self.assertEqual(dataset[0][1].shape, (0, 5))
+
     def test_works_with_empty_manifest(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             dataset_manifest = DetectionTestFixtures.create_an_od_manifest(temp_dir)
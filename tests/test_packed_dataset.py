@@ -0,0 +1,122 @@
+import io
+import json
+import pathlib
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from vision_datasets.common import CategoryManifest, DatasetInfo, DatasetManifest, DatasetTypes, FileReader, ImageDataManifest, PackedDataset, PackedDatasetWriter, VisionDataset
+from vision_datasets.image_classification import ImageClassificationLabelManifest
+from vision_datasets.image_object_detection import ImageObjectDetectionLabelManifest
+
+from .resources.util import local_http_server
+from .test_fixtures import DetectionTestFixtures
+
+DATASET_INFO_DICT = {'name': 'dummy', 'version': 1, 'type': 'classification_multiclass', 'root_folder': '', 'format': 'coco', 'test': {'index_path': 'test.json'}}
+
+
+class TestPackedDataset(unittest.TestCase):
+    N_IMAGES = 5
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tempdir.name)
+        images = []
+        for i in range(self.N_IMAGES):
+            Image.fromarray(np.full((8, 4, 3), i * 10, dtype=np.uint8)).save(self.root / f'{i}.png')
+            images.append(ImageDataManifest(i, str(self.root / f'{i}.png'), 4, 8, [ImageClassificationLabelManifest(i % 2)]))
+        manifest = DatasetManifest(images, [CategoryManifest(0, 'a'), CategoryManifest(1, 'b')], DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        self.dataset = VisionDataset(DatasetInfo(DATASET_INFO_DICT), manifest)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_random_access(self):
+        PackedDatasetWriter(self.dataset, images_per_shard=2).write(self.root / 'packed')
+        self.assertEqual(sorted(x.name for x in (self.root / 'packed').glob('*.pack')), ['shard-00000.pack', 'shard-00001.pack', 'shard-00002.pack'])
+
+        packed = PackedDataset(self.root / 'packed')
+        self.assertEqual(len(packed), self.N_IMAGES)
+        self.assertEqual(packed.n_shards, 3)
+        self.assertEqual(packed.dataset_info.type, DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+        self.assertEqual([x.name for x in packed.categories], ['a', 'b'])
+        for i in [4, 0, 3]:
+            image, labels, image_id = packed[i]
+            self.assertEqual(image_id, str(i))
+            self.assertEqual(image.format, 'PNG')
+            self.assertEqual(image.size, (4, 8))
+            self.assertEqual(np.asarray(image)[0, 0, 0], i * 10)
+            self.assertEqual([x.label_data for x in labels], [i % 2])
+
+        unpickled = pickle.loads(pickle.dumps(packed))
+        self.assertEqual(np.asarray(unpickled[2][0])[0, 0, 0], 20)
+        with self.assertRaises(IndexError):
+            packed[self.N_IMAGES]
+        unpickled.close()
+        packed.close()
+
+    def test_detection(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(n_images=3, coordinates='absolute')
+        with tempdir:
+            PackedDatasetWriter(dataset).write(pathlib.Path(tempdir.name) / 'packed')
+            packed = PackedDataset(pathlib.Path(tempdir.name) / 'packed')
+            for i in range(3):
+                image, labels, _ = packed[i]
+                self.assertEqual(image.format, 'JPEG')
+                self.assertEqual(image.size, dataset[i][0].size)
+                self.assertEqual([x.label_data for x in labels], [x.label_data for x in dataset[i][1]])
+                self.assertTrue(all(isinstance(x, ImageObjectDetectionLabelManifest) for x in labels))
+            packed.close()
+
+    def test_boxes_as_array(self):
+        dataset, tempdir = DetectionTestFixtures.create_an_od_dataset(n_images=3, coordinates='absolute')
+        dataset.boxes_as_array = True
+        with tempdir:
+            PackedDatasetWriter(dataset).write(pathlib.Path(tempdir.name) / 'packed')
+            packed = PackedDataset(pathlib.Path(tempdir.name) / 'packed')
+            for i in range(3):
+                labels = packed[i][1]
+                self.assertEqual(labels.dtype, np.float32)
+                np.testing.assert_array_equal(labels, dataset[i][1])
+            packed.close()
+
+    def test_meta_and_labels_stored_as_json(self):
+        PackedDatasetWriter(self.dataset).write(self.root / 'packed')
+        meta = json.loads((self.root / 'packed' / 'meta.json').read_text())
+        self.assertEqual(meta['dataset_info']['type'], 'image_classification_multiclass')
+        self.assertEqual([x['name'] for x in meta['categories']], ['a', 'b'])
+        self.assertFalse((self.root / 'packed' / 'meta.pkl').exists())
+
+        packed = PackedDataset(self.root / 'packed')
+        self.assertEqual(packed.dataset_info.index_files, self.dataset.dataset_info.index_files)
+        self.assertEqual(packed.categories, self.dataset.categories)
+        self.assertTrue(all(isinstance(x, ImageClassificationLabelManifest) for x in packed[0][1]))
+        packed.close()
+
+    def test_stream_from_url(self):
+        PackedDatasetWriter(self.dataset, images_per_shard=3).write(self.root / 'packed')
+        shards = {x.name: x.read_bytes() for x in (self.root / 'packed').glob('*.pack')}
+        with local_http_server(shards) as server:
+            file_reader = FileReader()
+            samples = []
+            for shard_name in sorted(shards):
+                with file_reader.open(f'{server.url}/{shard_name}') as f:
+                    samples += list(PackedDataset.iter_stream(f))
+            file_reader.close()
+
+        self.assertEqual([x[2] for x in samples], ['0', '1', '2', '0', '1'])
+        self.assertEqual([np.asarray(x[0])[0, 0, 0] for x in samples], [0, 10, 20, 30, 40])
+        self.assertEqual([x[1][0].label_data for x in samples], [0, 1, 0, 1, 0])
+
+    def test_truncated_shard(self):
+        PackedDatasetWriter(self.dataset).write(self.root / 'packed')
+        data = (self.root / 'packed' / 'shard-00000.pack').read_bytes()
+        with self.assertRaises(IOError):
+            list(PackedDataset.iter_stream(io.BytesIO(data[:-1])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from vision_datasets.common import CategoryManifest, DatasetInfo, DatasetManifest, DatasetTypes, ImageDataManifest, PrefetchingIterator, VisionDataset
+from vision_datasets.image_classification import ImageClassificationLabelManifest
+
+from .resources.util import local_http_server
+
+DATASET_INFO_DICT = {'name': 'dummy', 'version': 1, 'type': 'classification_multiclass', 'root_folder': '', 'format': 'coco', 'test': {'index_path': 'test.json'}}
+
+
+def _image_bytes(i):
+    stream = io.BytesIO()
+    Image.fromarray(np.full((8, 8, 3), i, dtype=np.uint8)).save(stream, format='PNG')
+    return stream.getvalue()
+
+
+def _url_dataset(server_url, n_images):
+    images = [ImageDataManifest(i, f'{server_url}/{i}.png?sig=x', 8, 8, [ImageClassificationLabelManifest(i % 2)]) for i in range(n_images)]
+    manifest = DatasetManifest(images, [CategoryManifest(0, 'a'), CategoryManifest(1, 'b')], DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
+    return VisionDataset(DatasetInfo(DATASET_INFO_DICT), manifest)
+
+
+class TestPrefetchingIterator(unittest.TestCase):
+    N_IMAGES = 16
+
+    def test_ordered(self):
+        with local_http_server({f'{i}.png': _image_bytes(i) for i in range(self.N_IMAGES)}, delay=0.1) as server:
+            dataset = _url_dataset(server.url, self.N_IMAGES)
+            start = time.time()
+            samples = list(PrefetchingIterator(dataset, max_concurrency=8))
+            elapsed = time.time() - start
+
+            self.assertEqual([x[2] for x in samples], [str(i) for i in range(self.N_IMAGES)])
+            self.assertEqual([np.asarray(x[0])[0, 0, 0] for x in samples], list(range(self.N_IMAGES)))
+            self.assertGreater(server.max_active, 1)
+            self.assertLessEqual(server.max_active, 8)
+            self.assertLess(elapsed, self.N_IMAGES * 0.1)
+            # connections are reused
+            self.assertLessEqual(len(server.connections), 8)
+
+    def test_completion_order_with_indices(self):
+        with local_http_server({f'{i}.png': _image_bytes(i) for i in range(self.N_IMAGES)}) as server:
+            dataset = _url_dataset(server.url, self.N_IMAGES)
+            iterator = PrefetchingIterator(dataset, indices=[3, 1, 7, 5], max_concurrency=2, ordered=False)
+            self.assertEqual(len(iterator), 4)
+            self.assertEqual(sorted(x[2] for x in iterator), ['1', '3', '5', '7'])
+
+    def test_stop_early(self):
+        with local_http_server({f'{i}.png': _image_bytes(i) for i in range(self.N_IMAGES)}, delay=0.05) as server:
+            dataset = _url_dataset(server.url, self.N_IMAGES)
+            for i, _ in enumerate(PrefetchingIterator(dataset, max_concurrency=2)):
+                if i == 1:
+                    break
+            self.assertLess(server.n_requests, self.N_IMAGES)
+
+    def test_error_raised(self):
+        with local_http_server({f'{i}.png': _image_bytes(i) for i in range(2)}) as server:
+            dataset = _url_dataset(server.url, 4)
+            with self.assertRaises(Exception):
+                list(PrefetchingIterator(dataset, max_concurrency=4))
@@ -0,0 +1,145 @@
+import base64
+import io
+import json
+import pathlib
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from vision_datasets.common import DatasetInfo, LineIndexedFile, TsvDataset
+from vision_datasets.common.utils import TSV_FORMAT_LTWH_NORM
+
+
+def _b64_image(value, size=(10, 20)):
+    stream = io.BytesIO()
+    Image.fromarray(np.full((size[1], size[0], 3), value, dtype=np.uint8)).save(stream, format='PNG')
+    return base64.b64encode(stream.getvalue()).decode('utf-8')
+
+
+def _dataset_info(data_type):
+    return DatasetInfo({'name': 'dummy', 'type': data_type, 'format': 'coco', 'root_folder': ''})
+
+
+class TestLineIndexedFile(unittest.TestCase):
+    def test_lines(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = pathlib.Path(tempdir) / 'a.txt'
+            path.write_bytes(b'\xef\xbb\xbfline0\r\n\nline1\nline2')
+            lines = LineIndexedFile(path)
+            self.assertEqual(len(lines), 3)
+            self.assertEqual([lines[i] for i in [2, 0, 1]], [b'line2', b'line0', b'line1'])
+            with self.assertRaises(IndexError):
+                lines[3]
+            self.assertTrue((pathlib.Path(tempdir) / 'a.txt.lineidx').exists())
+            lines.close()
+
+    def test_index_persisted_and_invalidated(self):
+        with tempfile.TemporaryDirectory() as tempdir, tempfile.TemporaryDirectory() as index_dir:
+            path = pathlib.Path(tempdir) / 'a.txt'
+            path.write_bytes(b'line0\nline1\n')
+            LineIndexedFile(path, index_dir).close()
+            self.assertFalse((pathlib.Path(tempdir) / 'a.txt.lineidx').exists())
+
+            with mock.patch.object(LineIndexedFile, '_build', autospec=True, side_effect=LineIndexedFile._build) as build:
+                lines = pickle.loads(pickle.dumps(LineIndexedFile(path, index_dir)))
+                self.assertEqual(lines[1], b'line1')
+                build.assert_not_called()
+
+                path.write_bytes(b'line0\nline1\nline2\n')
+                lines = LineIndexedFile(path, index_dir)
+                self.assertEqual(len(lines), 3)
+                self.assertEqual(lines[2], b'line2')
+                build.assert_called_once()
+                lines.close()
+
+    def test_empty_file(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = pathlib.Path(tempdir) / 'a.txt'
+            path.write_bytes(b'')
+            self.assertEqual(len(LineIndexedFile(path)), 0)
+
+
+class TestTsvDataset(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tempdir.name)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write_tsv(self, name, rows):
+        path = self.root / name
+        path.write_text(''.join(f'{img_id}\t{json.dumps(labels)}\t{_b64_image(value)}\n' for img_id, labels, value in rows), encoding='utf-8')
+        return path
+
+    def test_classification(self):
+        tsv1 = self._write_tsv('1.tsv', [('a', [{'class': 'dog'}], 1), ('b', [{'class': 'cat'}], 2)])
+        tsv2 = self._write_tsv('2.tsv', [('c', [{'class': 'wolf'}, {'class': 'dog'}], 3)])
+        dataset = TsvDataset(_dataset_info('classification_multilabel'), [tsv1, tsv2])
+        self.assertEqual(len(dataset), 3)
+        self.assertEqual([x.name for x in dataset.categories], ['dog', 'cat', 'wolf'])
+
+        image, labels, img_id = dataset[2]
+        self.assertEqual(img_id, 'c')
+        self.assertEqual(image.size, (10, 20))
+        self.assertEqual(np.asarray(image)[0, 0, 0], 3)
+        self.assertEqual([x.label_data for x in labels], [2, 0])
+        self.assertEqual(dataset[0][2], 'a')
+
+        unpickled = pickle.loads(pickle.dumps(dataset))
+        self.assertEqual([x.label_data for x in unpickled[1][1]], [1])
+        self.assertEqual([x.name for x in unpickled.categories], ['dog', 'cat', 'wolf'])
+        unpickled.close()
+        dataset.close()
+
+    def test_labelmap(self):
+        tsv = self._write_tsv('1.tsv', [('a', [{'class': 'dog'}], 1), ('b', [{'class': 'cat'}], 2)])
+        dataset = TsvDataset(_dataset_info('classification_multiclass'), [tsv], labelmap=['cat', 'dog'])
+        self.assertEqual([x.label_data for x in dataset[0][1]], [1])
+        dataset.close()
+
+        with self.assertRaises(ValueError):
+            TsvDataset(_dataset_info('classification_multiclass'), [tsv], labelmap=['cat'])[0]
+
+    def test_detection(self):
+        tsv = self._write_tsv('1.tsv', [('a', [{'class': 'dog', 'rect': [1, 2, 5, 10]}], 1)])
+        dataset = TsvDataset(_dataset_info('object_detection'), [tsv], coordinates='absolute')
+        self.assertEqual(dataset[0][1][0].label_data, [0, 1, 2, 5, 10])
+
+        dataset = TsvDataset(_dataset_info('object_detection'), [tsv])
+        self.assertEqual(dataset[0][1][0].label_data, [0, 0.1, 0.1, 0.5, 0.5])
+        dataset.close()
+
+    def test_detection_box_format_and_difficult(self):
+        labels = [{'class': 'dog', 'rect': [0.1, 0.1, 0.4, 0.4]}, {'class': 'cat', 'rect': [0.5, 0.5, 0.5, 0.5], 'diff': 1}, {'class': 'dog', 'rect': [0.5, 0.5, 0, 0.1]}]
+        tsv = self._write_tsv('1.tsv', [('a', labels, 1)])
+        dataset = TsvDataset(_dataset_info('object_detection'), [tsv], coordinates='absolute', box_format=TSV_FORMAT_LTWH_NORM)
+        # the empty box is skipped, as by the tsv to coco converter
+        self.assertEqual([x.label_data for x in dataset[0][1]], [[0, 1, 2, 5, 10]])
+
+        dataset = TsvDataset(_dataset_info('object_detection'), [tsv], coordinates='absolute', box_format=TSV_FORMAT_LTWH_NORM, include_difficult=True)
+        self.assertEqual([x.label_data for x in dataset[0][1]], [[0, 1, 2, 5, 10], [1, 5, 10, 10, 20]])
+        dataset.close()
+
+        with self.assertRaises(ValueError):
+            TsvDataset(_dataset_info('object_detection'), [tsv], box_format='xywh')
+
+    def test_caption(self):
+        tsv = self._write_tsv('1.tsv', [('a', [{'caption': 'a dog'}, {'caption': 'a pet'}], 1)])
+        dataset = TsvDataset(_dataset_info('image_caption'), [tsv])
+        self.assertIsNone(dataset.categories)
+        self.assertEqual([x.caption for x in dataset[0][1]], ['a dog', 'a pet'])
+        dataset.close()
+
+    def test_unsupported_type(self):
+        tsv = self._write_tsv('1.tsv', [('a', [{'class': 'dog'}], 1)])
+        with self.assertRaises(ValueError):
+            TsvDataset(_dataset_info('image_matting'), [tsv])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Benchmark the decode throughput of the available image decoders per image format, to pick the decoder for a node (PILImageLoader.DECODER)
+"""
+
+import argparse
+import io
+import pathlib
+import time
+from collections import defaultdict
+
+from PIL import Image
+
+from vision_datasets.common import ImageDecoderFactory, PILImageLoader
+
+from .utils import set_up_cmd_logger
+
+logger = set_up_cmd_logger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tif', '.tiff'}
+
+
+def create_arg_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the decode throughput of the available image decoders per image format.')
+    parser.add_argument('images', type=pathlib.Path, nargs='+', help='image files, or folders of images')
+    parser.add_argument('-n', '--max_images', type=int, required=False, default=200, help='max number of images per format')
+    parser.add_argument('-r', '--repeats', type=int, required=False, default=3, help='number of passes over the images per decoder')
+    parser.add_argument('-t', '--target_size', type=int, required=False, default=None, help='longest edge that images are decoded for, see PILImageLoader.load_from_stream')
+
+    return parser
+
+
+def load_images_by_format(paths, max_images):
+    images_by_format = defaultdict(list)
+    files = [x for path in paths for x in (sorted(path.rglob('*')) if path.is_dir() else [path])]
+    for file in files:
+        if file.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        data = file.read_bytes()
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                img_format = image.format
+        except Exception as e:
+            logger.warning(f'Skipping {file}: {e}')
+            continue
+        if len(images_by_format[img_format]) < max_images:
+            images_by_format[img_format].append(data)
+
+    return images_by_format
+
+
+def benchmark(images, decoder, repeats, target_size=None):
+    """
+    Returns:
+        number of images and megapixels decoded per second
+    """
+
+    n_pixels = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for data in images:
+            image = PILImageLoader.load_from_stream(io.BytesIO(data), target_size, decoder)
+            n_pixels += image.size[0] * image.size[1]
+    elapsed = time.perf_counter() - start
+    return len(images) * repeats / elapsed, n_pixels / 1e6 / elapsed
+
+
+def main():
+    args = create_arg_parser().parse_args()
+
+    images_by_format = load_images_by_format(args.images, args.max_images)
+    if not images_by_format:
+        logger.error('No images found.')
+        return
+
+    decoders = ImageDecoderFactory.list_available()
+    logger.info(f'Available decoders: {decoders}')
+    print(f'{"format":<8} {"decoder":<12} {"images/s":>10} {"MP/s":>10}')
+    for img_format, images in sorted(images_by_format.items()):
+        best = None
+        for decoder in decoders:
+            if decoder != ImageDecoderFactory.PIL and ImageDecoderFactory.get_decoder(img_format, decoder) is None:
+                continue
+            images_per_second, megapixels_per_second = benchmark(images, decoder, args.repeats, args.target_size)
+            print(f'{img_format:<8} {decoder:<12} {images_per_second:>10.1f} {megapixels_per_second:>10.1f}')
+            if best is None or images_per_second > best[1]:
+                best = (decoder, images_per_second)
+        logger.info(f'Fastest decoder for {img_format} ({len(images)} images): {best[0]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,8 @@ Convert a detection dataset into classification dataset
 """
 
 import argparse
-import multiprocessing
 import os
 import pathlib
-import shutil
 
 from vision_datasets.common import CocoDictGeneratorFactory, DatasetHub, DatasetTypes
 from vision_datasets.image_object_detection import DetectionAsClassificationByCroppingDataset
@@ -26,13 +24,13 @@ def create_arg_parser():
                         help='lower/upper bounds of relative ratio wrt box width and height that a box can shift, during cropping, e.g., "-0.3/0.1"')
     parser.add_argument('-np', '--n_copies', type=int, required=False, default=1, help='number of copies per bbox')
     parser.add_argument('-s', '--rnd_seed', type=int, required=False, help='random see for box expansion/shrink/shifting.', default=0)
+    parser.add_argument('-w', '--n_workers', type=int, required=False, default=1, help='number of processes cropping images, per usage')
+    parser.add_argument('--zip', action='store_true', help='store the crops of each usage in <usage>.zip instead of a folder')
 
     return parser
 
 
-def process_usage(params):
-    args, data_reg_json, aug_params, usage = params
-
+def process_usage(args, data_reg_json, aug_params, usage):
     logger.info(f'download dataset manifest for {args.name}...')
     dataset_resources = DatasetHub(data_reg_json, args.blob_container, args.local_dir.as_posix())
     dataset = dataset_resources.create_vision_dataset(args.name, usage=usage, coordinates='absolute')
@@ -44,12 +42,16 @@ def process_usage(params):
         raise ValueError(f'Data type must be {DatasetTypes.IMAGE_OBJECT_DETECTION}')
     logger.info(f'start conversion for {args.name}...')
     ic_dataset = DetectionAsClassificationByCroppingDataset(dataset, aug_params)
-    ic_manifest = ic_dataset.generate_manifest(dir=str(usage), n_copies=args.n_copies)
+    # crops are written into the output folder directly, and the ones already there, e.g., from an interrupted run, are kept
+    crops_dir = args.output_folder / (f'{usage}.zip' if args.zip else str(usage))
+    ic_manifest = ic_dataset.generate_manifest(dir=crops_dir, n_copies=args.n_copies, n_workers=args.n_workers)
+    for image in ic_manifest.images:
+        image.img_path = pathlib.Path(image.img_path).relative_to(args.output_folder).as_posix()
 
     coco_gen = CocoDictGeneratorFactory.create(DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL)
     coco = coco_gen.run(ic_manifest)
     write_to_json_file_utf8(coco, args.output_folder / f'{usage}.json')
-    shutil.move(f'{usage}', f'{args.output_folder.as_posix()}/', copy_function=shutil.copytree)
+    ic_dataset.close()
 
 
 def main():
@@ -74,10 +76,9 @@ def main():
         args.local_dir.mkdir(parents=True, exist_ok=True)
 
     data_reg_json, usages = get_or_generate_data_reg_json_and_usages(args)
-    params = [(args, data_reg_json, aug_params, phase) for phase in usages]
-
-    with multiprocessing.Pool(len(usages)) as pool:
-        pool.map(process_usage, params)
+    # usages are processed one by one, each by n_workers processes
+    for usage in usages:
+        process_usage(args, data_reg_json, aug_params, usage)
 
 
 if __name__ == '__main__':
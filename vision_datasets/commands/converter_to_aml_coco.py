@@ -6,7 +6,7 @@ from urllib.parse import urlparse, urlunparse
 from tqdm import tqdm
 
 from vision_datasets.commands.utils import add_args_to_locate_dataset, get_or_generate_data_reg_json_and_usages
-from vision_datasets.common import FileReader, PILImageLoader, CocoDictGeneratorFactory, DatasetHub, DatasetTypes
+from vision_datasets.common import ImageSizeProber, CocoDictGeneratorFactory, DatasetHub, DatasetTypes
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +18,7 @@ def create_arg_parser():
     parser = argparse.ArgumentParser(description='Convert dataset to AML coco format (IC, OD only).')
     add_args_to_locate_dataset(parser)
     parser.add_argument('-o', '--output_dir', required=True, type=pathlib.Path, help='output dir for coco file(s).')
+    parser.add_argument('-w', '--n_workers', required=False, type=int, default=8, help='number of threads for reading image sizes.')
 
     return parser
 
@@ -43,20 +44,16 @@ def main():
     assert dataset_info.type in [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_OBJECT_DETECTION]
 
     coco_gen = CocoDictGeneratorFactory.create(dataset_info.type)
-    file_reader = FileReader()
     for usage in usages:
         manifest, _, _ = dataset_hub.create_dataset_manifest(args.name, version=1, usage=usage)
         if manifest is None:
             logger.info(f'{usage} not exist. Skipping.')
             continue
 
+        ImageSizeProber.fill_image_sizes(manifest, args.n_workers)
         coco_dict = coco_gen.run(manifest)
         for image in tqdm(coco_dict['images'], f'{usage}: Processing images...'):
             image['coco_url'] = keep_base_url(image['file_name'])
-            if not image.get('width') or not image.get('height'):
-                with file_reader.open(image['file_name'], 'rb') as f:
-                    img = PILImageLoader.load_from_stream(f)
-                    image['width'], image['height'] = img.size
             image['file_name'] = image['coco_url'][len(urlunparse(urlparse(keep_base_url(args.blob_container)))):]
 
         if dataset_info.type == DatasetTypes.IMAGE_OBJECT_DETECTION:
@@ -0,0 +1,46 @@
+"""
+Pack a dataset into a few large shard files, for fast random access and streaming with PackedDataset
+"""
+
+import argparse
+import pathlib
+
+from vision_datasets.common import DatasetHub, PackedDatasetWriter
+
+from .utils import add_args_to_locate_dataset, get_or_generate_data_reg_json_and_usages, set_up_cmd_logger
+
+logger = set_up_cmd_logger(__name__)
+
+
+def create_arg_parser():
+    parser = argparse.ArgumentParser(description='Pack a dataset into shards, readable by PackedDataset.')
+    add_args_to_locate_dataset(parser)
+    parser.add_argument('-o', '--output_folder', type=pathlib.Path, required=True, help='target folder of the packed dataset, with one sub folder per usage')
+    parser.add_argument('-n', '--images_per_shard', type=int, required=False, default=10000, help='max number of images per shard')
+    parser.add_argument('-w', '--n_workers', type=int, required=False, default=8, help='number of images being read concurrently')
+    parser.add_argument('--coordinates', type=str, choices=['relative', 'absolute'], default='relative', help='coordinates of the boxes stored, for detection datasets')
+
+    return parser
+
+
+def main():
+    args = create_arg_parser().parse_args()
+
+    if args.blob_container and args.local_dir:
+        args.local_dir.mkdir(parents=True, exist_ok=True)
+
+    data_reg_json, usages = get_or_generate_data_reg_json_and_usages(args)
+    dataset_hub = DatasetHub(data_reg_json, args.blob_container, args.local_dir.as_posix() if args.local_dir else None)
+    for usage in usages:
+        dataset = dataset_hub.create_vision_dataset(args.name, version=args.version, usage=usage, coordinates=args.coordinates)
+        if not dataset:
+            logger.info(f'Skipping non-existent phase {usage}.')
+            continue
+
+        usage_folder = str(usage).split('.')[1]
+        PackedDatasetWriter(dataset, args.images_per_shard, args.n_workers).write(args.output_folder / usage_folder)
+        dataset.close()
+
+
+if __name__ == '__main__':
+    main()
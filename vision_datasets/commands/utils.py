@@ -13,6 +13,7 @@ from tqdm import tqdm
 
 from vision_datasets import DatasetManifest, DatasetTypes, Usages
 from vision_datasets.common import Base64Utils, StandAloneImageListGeneratorFactory
+from vision_datasets.common.utils import TSV_FORMAT_LTRB, TSV_FORMAT_LTWH_NORM, verify_and_correct_box_or_none  # noqa: F401
 
 
 def set_up_cmd_logger(name):
@@ -24,9 +25,6 @@ def set_up_cmd_logger(name):
 
 logger = set_up_cmd_logger(__name__)
 
-TSV_FORMAT_LTRB = 'ltrb'
-TSV_FORMAT_LTWH_NORM = 'ltwh-normalized'
-
 
 def enum_type(enum_type):
     def func(value_str):
@@ -121,7 +119,7 @@ def generate_reg_json(name, type, coco_path):
 
 def convert_to_tsv(manifest: DatasetManifest, file_path: Union[str, pathlib.Path]):
     with open(file_path, 'w', encoding='utf-8') as file_out:
-        for img in tqdm(manifest.images, desc=f'Writing to {file_path}'):
+        for img in tqdm(manifest.peek_images(), total=len(manifest.images), desc=f'Writing to {file_path}'):
             converted_labels = []
             for label in img.labels:
                 if manifest.data_type in [DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS]:
@@ -170,30 +168,6 @@ def guess_encoding(tsv_file):
             return locale.getdefaultlocale()[1]
 
 
-def verify_and_correct_box_or_none(lp, box, data_format, img_w, img_h):
-    error_msg = f'{lp} Illegal box [{", ".join([str(x) for x in box])}], img wxh: {img_w}, {img_h}'
-    if len([x for x in box if x < 0]) > 0:
-        logger.error(f'{error_msg}. Skip this box.')
-        return None
-
-    if data_format == TSV_FORMAT_LTWH_NORM:
-        box[2] = int((box[0] + box[2]) * img_w)
-        box[3] = int((box[1] + box[3]) * img_h)
-        box[0] = int(box[0] * img_w)
-        box[1] = int(box[1] * img_h)
-
-    boundary_ratio_limit = 1.02
-    if box[0] >= img_w or box[1] >= img_h or box[2] / img_w > boundary_ratio_limit \
-            or box[3] / img_h > boundary_ratio_limit or box[0] >= box[2] or box[1] >= box[3]:
-        logger.error(f'{error_msg}. Skip this box.')
-        return None
-
-    box[2] = min(box[2], img_w)
-    box[3] = min(box[3], img_h)
-
-    return box
-
-
 def write_to_json_file_utf8(dict, filepath: Union[str, pathlib.Path]):
     assert filepath
 
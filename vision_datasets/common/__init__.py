@@ -3,10 +3,12 @@ from .data_manifest import BalancedInstanceWeightsGenerator, CategoryManifest, D
     ImageLabelManifest, ImageLabelWithCategoryManifest, ImageNoAnnotationFilter, ManifestMerger, ManifestSampler, MergeStrategy, MultiImageDatasetSingleTaskMerge, DatasetManifestWithMultiImageLabel, \
     MultiImageLabelManifest, Operation, RemoveCategories, RemoveCategoriesConfig, SampleBaseConfig, SampleByFewShotConfig, SampleByNumSamples, SampleByNumSamplesConfig, SampleFewShot, \
     SampleStrategy, SampleStrategyType, SingleTaskMerge, Spawn, SpawnConfig, Split, SplitConfig, SplitWithCategories, WeightsGenerationConfig, CocoManifestWithoutCategoriesAdaptor, \
-    CocoManifestWithCategoriesAdaptor, CocoManifestWithMultiImageLabelAdaptor, CocoManifestAdaptorBase, GenerateStandAloneImageListBase
+    CocoManifestWithCategoriesAdaptor, CocoManifestWithMultiImageLabelAdaptor, CocoManifestAdaptorBase, GenerateStandAloneImageListBase, ColumnarDatasetManifest, ColumnarDatasetManifestBuilder, \
+    StringColumn, ManifestCache, DatasetManifestView, AliasTableSampler
 from .dataset_info import BaseDatasetInfo, DatasetInfo, DatasetInfoFactory, KeyValuePairDatasetInfo, MultiTaskDatasetInfo
-from .data_reader import DatasetDownloader, FileReader, PILImageLoader
-from .dataset import VisionDataset
+from .data_reader import DatasetDownloader, FileReader, PILImageLoader, ImageDecoder, ImageDecoderFactory, ImageCache, ImageSizeProber, JsonObjectStreamReader, LineIndexedFile, \
+    StorageBackend, StorageBackendFactory, LocalFileBackend, ZipFileBackend, HttpBackend, LocalObjectStoreBackend
+from .dataset import VisionDataset, PrefetchingIterator, PackedDataset, PackedDatasetWriter, TsvDataset, JsonlDataset
 from .factory import CocoManifestAdaptorFactory, CocoDictGeneratorFactory, ManifestMergeStrategyFactory, DataManifestFactory, SampleStrategyFactory, BalancedInstanceWeightsFactory, SpawnFactory, \
     SplitFactory, StandAloneImageListGeneratorFactory, SupportedOperationsByDataType
 from .dataset_management import DatasetHub, DatasetRegistry
@@ -19,8 +21,11 @@ __all__ = [
     'MergeStrategy', 'SingleTaskMerge', 'Operation', 'RemoveCategories', 'RemoveCategoriesConfig', 'ManifestSampler', 'SampleBaseConfig', 'SampleByFewShotConfig', 'SampleByNumSamples',
     'SampleByNumSamplesConfig', 'SampleFewShot', 'SampleStrategy', 'SampleStrategyType', 'Spawn', 'SpawnConfig', 'Split', 'SplitConfig', 'SplitWithCategories',
     'CocoManifestWithoutCategoriesAdaptor', 'CocoManifestWithCategoriesAdaptor', 'CocoManifestWithMultiImageLabelAdaptor', 'CocoManifestAdaptorBase', 'GenerateStandAloneImageListBase',
+    'ColumnarDatasetManifest', 'ColumnarDatasetManifestBuilder', 'StringColumn', 'ManifestCache', 'DatasetManifestView', 'AliasTableSampler',
     'DatasetInfo', 'BaseDatasetInfo', 'KeyValuePairDatasetInfo', 'MultiTaskDatasetInfo', 'DatasetInfoFactory', 'DatasetDownloader', 'FileReader', 'PILImageLoader',
-    'VisionDataset',
+    'ImageDecoder', 'ImageDecoderFactory', 'ImageCache', 'ImageSizeProber', 'JsonObjectStreamReader', 'LineIndexedFile', 'StorageBackend', 'StorageBackendFactory', 'LocalFileBackend',
+    'ZipFileBackend', 'HttpBackend', 'LocalObjectStoreBackend',
+    'VisionDataset', 'PrefetchingIterator', 'PackedDataset', 'PackedDatasetWriter', 'TsvDataset', 'JsonlDataset',
     'CocoManifestAdaptorFactory', 'CocoDictGeneratorFactory', 'ManifestMergeStrategyFactory', 'DataManifestFactory', 'SampleStrategyFactory', 'BalancedInstanceWeightsFactory', 'SpawnFactory',
     'SplitFactory', 'StandAloneImageListGeneratorFactory', 'SupportedOperationsByDataType',
     'DatasetHub', 'DatasetRegistry', 'Base64Utils'
@@ -2,13 +2,17 @@ from .data_manifest import CategoryManifest, DatasetManifest, ImageDataManifest,
 from .operations import MultiImageDatasetSingleTaskMerge, BalancedInstanceWeightsGenerator, DatasetFilter, GenerateCocoDictBase, MultiImageCocoDictGenerator, GenerateStandAloneImageListBase, \
     ImageFilter, ImageNoAnnotationFilter, ManifestMerger, ManifestSampler, MergeStrategy, Operation, RemoveCategories, RemoveCategoriesConfig, \
     SampleBaseConfig, SampleByFewShotConfig, SampleByNumSamples, SampleByNumSamplesConfig, SampleFewShot, SampleStrategy, SampleStrategyType, SingleTaskMerge, \
-    Spawn, SpawnConfig, Split, SplitConfig, SplitWithCategories, WeightsGenerationConfig
+    Spawn, SpawnConfig, Split, SplitConfig, SplitWithCategories, WeightsGenerationConfig, AliasTableSampler
 from .coco_manifest_adaptor import CocoManifestWithCategoriesAdaptor, CocoManifestWithoutCategoriesAdaptor, CocoManifestAdaptorBase, CocoManifestWithMultiImageLabelAdaptor
+from .columnar_data_manifest import ColumnarDatasetManifest, ColumnarDatasetManifestBuilder, StringColumn
+from .manifest_cache import ManifestCache
+from .manifest_view import DatasetManifestView
 
 __all__ = ["ImageLabelManifest", "ImageLabelWithCategoryManifest", "MultiImageLabelManifest", "ImageDataManifest", "CategoryManifest", "DatasetManifest", "DatasetManifestWithMultiImageLabel",
            "BalancedInstanceWeightsGenerator", "WeightsGenerationConfig", "DatasetFilter", "ImageFilter", "ImageNoAnnotationFilter", "GenerateCocoDictBase", "MultiImageCocoDictGenerator",
            "GenerateStandAloneImageListBase", "ManifestMerger", "MergeStrategy", "SingleTaskMerge", "MultiImageDatasetSingleTaskMerge", "Operation",
            "RemoveCategories",
            "RemoveCategoriesConfig", "ManifestSampler", "SampleBaseConfig", "SampleByFewShotConfig", "SampleByNumSamples", "SampleByNumSamplesConfig", "SampleFewShot", "SampleStrategy",
-           "SampleStrategyType", "Spawn", "SpawnConfig", "Split", "SplitConfig", "SplitWithCategories",
-           "CocoManifestWithCategoriesAdaptor", "CocoManifestWithoutCategoriesAdaptor", "CocoManifestAdaptorBase", "CocoManifestWithMultiImageLabelAdaptor"]
+           "SampleStrategyType", "AliasTableSampler", "Spawn", "SpawnConfig", "Split", "SplitConfig", "SplitWithCategories",
+           "CocoManifestWithCategoriesAdaptor", "CocoManifestWithoutCategoriesAdaptor", "CocoManifestAdaptorBase", "CocoManifestWithMultiImageLabelAdaptor",
+           "ColumnarDatasetManifest", "ColumnarDatasetManifestBuilder", "StringColumn", "ManifestCache", "DatasetManifestView"]
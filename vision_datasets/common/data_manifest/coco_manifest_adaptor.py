@@ -3,9 +3,11 @@ import logging
 import pathlib
 from abc import ABC, abstractmethod
 from typing import Union
+from urllib.parse import quote, urlparse, urlunparse
 
-from ..data_reader import FileReader
+from ..data_reader import FileReader, JsonObjectStreamReader
 from ..utils import can_be_url, construct_full_url_or_path_func
+from .columnar_data_manifest import ColumnarDatasetManifest, ColumnarDatasetManifestBuilder
 from .data_manifest import CategoryManifest, DatasetManifest, ImageDataManifest, DatasetManifestWithMultiImageLabel, MultiImageLabelManifest
 
 logger = logging.getLogger(__name__)
@@ -18,16 +20,24 @@ class CocoManifestAdaptorBase(ABC):
     image paths should be stored under 'file_name'
     """
 
+    # sections that have to be loaded before annotations can be processed
+    _SECTIONS_REQUIRED_BY_ANNOTATIONS = ()
+    # top-level fields read when processing annotations
+    _FIELDS_AFFECTING_LABELS = {'bbox_format'}
+
     def __init__(self, data_type: Union[dict, str]) -> None:
         super().__init__()
         self.data_type = data_type
         self._url_or_root_dir = None
 
-    def create_dataset_manifest(self, coco_file_path_or_url: Union[str, dict, pathlib.Path], url_or_root_dir: str = None):
+    def create_dataset_manifest(self, coco_file_path_or_url: Union[str, dict, pathlib.Path], url_or_root_dir: str = None, streaming: bool = False):
         """ construct a dataset manifest out of coco file
         Args:
             coco_file_path_or_url (str or pathlib.Path or dict): path or url to coco file. dict if multitask
             url_or_root_dir (str): container url or sas if resources are store in blob container, or a local dir
+            streaming (bool): parse the coco file incrementally instead of loading it as a whole, which reduces the peak memory for large coco files.
+                Annotations are processed on the fly if 'images' (and 'categories' if applicable) precede 'annotations' in the file, otherwise they are buffered.
+                Top-level fields affecting label parsing, e.g., 'bbox_format', must precede 'annotations' in streaming mode.
         """
 
         if not coco_file_path_or_url:
@@ -39,14 +49,47 @@ class CocoManifestAdaptorBase(ABC):
         file_reader = FileReader()
         coco_file_path_or_url = coco_file_path_or_url if can_be_url(coco_file_path_or_url) else get_full_url_or_path(coco_file_path_or_url)
         with file_reader.open(coco_file_path_or_url, encoding='utf-8') as file_in:
-            coco_manifest = json.load(file_in)
+            if streaming:
+                manifest = self._create_dataset_manifest_from_stream(file_in)
+            else:
+                coco_manifest = json.load(file_in)
         file_reader.close()
 
-        images_by_id = {img['id']: ImageDataManifest(img['id'], self._append_zip_prefix_if_needed(img, img['file_name']), img.get('width'),
-                                                     img.get('height'), [], self._get_additional_info(img, {'id', 'file_name', 'width', 'height', 'zip_file'})) for img in coco_manifest['images']}
+        if streaming:
+            return manifest
+
+        images_by_id = {img['id']: self._create_image_manifest(img) for img in coco_manifest['images']}
 
         return self._construct_manifest(images_by_id, coco_manifest, self.data_type, self._get_additional_info(coco_manifest, {'images', 'categories', 'annotations'}))
 
+    def _create_dataset_manifest_from_stream(self, stream):
+        coco_manifest = {}
+        images_by_id = {}
+        images_loaded = False
+        manifest = None
+        for key, value in JsonObjectStreamReader(stream).iter_items(streamed_keys={'images', 'annotations'}):
+            if key == 'images':
+                for img in value:
+                    images_by_id[img['id']] = self._create_image_manifest(img)
+                images_loaded = True
+            elif key == 'annotations' and images_loaded and all(x in coco_manifest for x in self._SECTIONS_REQUIRED_BY_ANNOTATIONS):
+                # annotations are consumed from the stream one by one
+                manifest = self._construct_manifest(images_by_id, {**coco_manifest, 'annotations': value}, self.data_type, {})
+            elif key in self._FIELDS_AFFECTING_LABELS and manifest is not None:
+                raise ValueError(f'"{key}" must precede "annotations" in the coco file for streaming parse.')
+            else:
+                coco_manifest[key] = list(value) if key == 'annotations' else value
+
+        if manifest is None:
+            manifest = self._construct_manifest(images_by_id, coco_manifest, self.data_type, {})
+
+        manifest.additional_info = self._get_additional_info(coco_manifest, {'images', 'categories', 'annotations'})
+        return manifest
+
+    def _create_image_manifest(self, img: dict):
+        return ImageDataManifest(img['id'], self._append_zip_prefix_if_needed(img, img['file_name']), img.get('width'), img.get('height'), [],
+                                 self._get_additional_info(img, {'id', 'file_name', 'width', 'height', 'zip_file'}))
+
     def _construct_manifest(self, images_by_id, coco_manifest, data_type, additional_info):
         images, categories = self.get_images_and_categories(images_by_id, coco_manifest)
         return DatasetManifest(images, categories, data_type, additional_info)
@@ -57,12 +100,13 @@ class CocoManifestAdaptorBase(ABC):
 
     def _append_zip_prefix_if_needed(self, info_dict: dict, file_name):
         get_full_url_or_path = construct_full_url_or_path_func(self._url_or_root_dir)
-        zip_prefix = info_dict.get('zip_file', '')
-        if zip_prefix:
-            zip_prefix += '@'
-            if can_be_url(self._url_or_root_dir):
-                raise ValueError('Cannot read files in zip from blob directly. Please download the zip file to local folder first.')
+        zip_file = info_dict.get('zip_file', '')
+        if zip_file and can_be_url(self._url_or_root_dir):
+            # files in remote zip are read with range requests, from <zip_url>@<quoted file_name>[?<sas>]
+            zip_url = urlparse(get_full_url_or_path(zip_file))
+            return urlunparse(zip_url._replace(path=f'{zip_url.path}@{quote(file_name)}'))
 
+        zip_prefix = zip_file + '@' if zip_file else ''
         return get_full_url_or_path(zip_prefix + file_name)
 
     def _get_additional_info(self, data, to_exclude):
@@ -76,6 +120,8 @@ class CocoManifestWithCategoriesAdaptor(CocoManifestAdaptorBase):
     image paths should be stored under 'file_name'
     """
 
+    _SECTIONS_REQUIRED_BY_ANNOTATIONS = ('categories',)
+
     def get_images_and_categories(self, images_by_id, coco_manifest):
         label_id_to_pos, categories = self._process_categories(coco_manifest['categories'])
 
@@ -88,6 +134,55 @@ class CocoManifestWithCategoriesAdaptor(CocoManifestAdaptorBase):
 
         return images, categories
 
+    def create_columnar_dataset_manifest(self, coco_file_path_or_url: Union[str, pathlib.Path], url_or_root_dir: str = None) -> ColumnarDatasetManifest:
+        """ construct a ColumnarDatasetManifest out of coco file, parsed incrementally, with images and labels written into the columns as they are read instead of creating an
+        ImageDataManifest per image first. Same requirements on the order of sections as the streaming mode of create_dataset_manifest.
+
+        Args:
+            coco_file_path_or_url (str or pathlib.Path): path or url to coco file
+            url_or_root_dir (str): container url or sas if resources are store in blob container, or a local dir
+        """
+
+        if not coco_file_path_or_url:
+            return None
+
+        self._url_or_root_dir = url_or_root_dir
+        get_full_url_or_path = construct_full_url_or_path_func(self._url_or_root_dir)
+        coco_file_path_or_url = coco_file_path_or_url if can_be_url(coco_file_path_or_url) else get_full_url_or_path(coco_file_path_or_url)
+
+        builder = ColumnarDatasetManifestBuilder()
+        image_id_to_index = {}
+        coco_manifest = {}
+        categories = None
+        file_reader = FileReader()
+        with file_reader.open(coco_file_path_or_url, encoding='utf-8') as file_in:
+            for key, value in JsonObjectStreamReader(file_in).iter_items(streamed_keys={'images', 'annotations'}):
+                if key == 'images':
+                    for img in value:
+                        image_id_to_index[img['id']] = builder.add_image(img['id'], self._append_zip_prefix_if_needed(img, img['file_name']), img.get('width'), img.get('height'),
+                                                                         self._get_additional_info(img, {'id', 'file_name', 'width', 'height', 'zip_file'}))
+                    coco_manifest['images'] = None
+                elif key == 'annotations' and 'images' in coco_manifest and 'categories' in coco_manifest:
+                    # annotations are consumed from the stream one by one
+                    categories = self._add_labels_to_columns(builder, image_id_to_index, {**coco_manifest, 'annotations': value})
+                elif key in self._FIELDS_AFFECTING_LABELS and categories is not None:
+                    raise ValueError(f'"{key}" must precede "annotations" in the coco file for streaming parse.')
+                else:
+                    coco_manifest[key] = list(value) if key == 'annotations' else value
+        file_reader.close()
+
+        if categories is None:
+            categories = self._add_labels_to_columns(builder, image_id_to_index, coco_manifest)
+
+        return builder.build(categories, self.data_type, self._get_additional_info(coco_manifest, {'images', 'categories', 'annotations'}), sort_by_image_id=True)
+
+    def _add_labels_to_columns(self, builder: ColumnarDatasetManifestBuilder, image_id_to_index: dict, coco_manifest: dict):
+        label_id_to_pos, categories = self._process_categories(coco_manifest['categories'])
+        for annotation in coco_manifest['annotations']:
+            self.process_label(builder.image_writer(image_id_to_index[annotation['image_id']]), annotation, coco_manifest, label_id_to_pos)
+
+        return categories
+
     @abstractmethod
     def process_label(self, image: ImageDataManifest, annotation: dict, coco_manifest: dict, label_id_to_pos):
         pass
@@ -0,0 +1,449 @@
+import array
+import copy
+import logging
+import operator
+import typing
+
+import numpy as np
+
+from .data_manifest import CategoryManifest, DatasetManifest, ImageDataManifest, ImageLabelWithCategoryManifest
+
+logger = logging.getLogger(__name__)
+
+
+class StringColumn:
+    """
+    A column of strings stored as a single UTF-8 byte buffer plus an offset array, instead of one python str object per row.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        """
+        Args:
+            blob (np.ndarray): uint8 array holding the concatenated UTF-8 encoded strings
+            offsets (np.ndarray): int64 array of length n + 1, string i is blob[offsets[i]: offsets[i + 1]]
+        """
+        if len(offsets) == 0:
+            raise ValueError('offsets must contain at least one element.')
+
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: typing.Iterable[str]):
+        encoded = [str(x).encode('utf-8') for x in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError
+
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class _ColumnarImageList:
+    """
+    Read-only sequence of ImageDataManifest, generated on access from the columns of a ColumnarDatasetManifest.
+    """
+
+    def __init__(self, manifest: 'ColumnarDatasetManifest'):
+        self._manifest = manifest
+
+    def __len__(self):
+        return len(self._manifest.widths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._manifest.get_image(i) for i in range(*index.indices(len(self)))]
+
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError
+
+        return self._manifest.get_image(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._manifest.get_image(i)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+        except TypeError:
+            return False
+
+
+class ColumnarDatasetManifest(DatasetManifest):
+    """
+    Array-backed DatasetManifest for single-task classification and detection datasets with a large number of images.
+
+    Instead of keeping one ImageDataManifest (and a list of label manifests) per image, the image ids, paths, widths, heights, label offsets, category ids and boxes are kept in numpy arrays.
+    `images` exposes the same read API as a list of ImageDataManifest, with the objects created on access. As these objects are not backed by the arrays, modifying them does not change the
+    manifest; `to_dataset_manifest` materializes a regular DatasetManifest that can be modified, while `copy.deepcopy` copies the columns.
+
+    Besides `from_dataset_manifest`, the columns can be filled directly without creating the objects first, with `from_arrays`, ColumnarDatasetManifestBuilder, or
+    CocoManifestWithCategoriesAdaptor.create_columnar_dataset_manifest for coco files.
+    """
+
+    def __init__(self,
+                 image_ids: typing.Union[np.ndarray, StringColumn],
+                 img_paths: StringColumn,
+                 widths: np.ndarray,
+                 heights: np.ndarray,
+                 label_offsets: np.ndarray,
+                 category_ids: np.ndarray,
+                 boxes: typing.Optional[np.ndarray],
+                 label_type: typing.Optional[type],
+                 categories: typing.List[CategoryManifest],
+                 data_type,
+                 image_additional_info: typing.Dict[int, dict] = None,
+                 label_additional_info: typing.Dict[int, dict] = None,
+                 addtional_info={},
+                 box_int_mask: typing.Optional[np.ndarray] = None):
+        """
+        Args:
+            image_ids (np.ndarray or StringColumn): image ids, int64 array for integer ids or StringColumn for str ids
+            img_paths (StringColumn): image paths
+            widths (np.ndarray): float64 array of image widths, nan if unknown
+            heights (np.ndarray): float64 array of image heights, nan if unknown
+            label_offsets (np.ndarray): int64 array of length n_images + 1, labels of image i are the rows label_offsets[i]: label_offsets[i + 1] of the label columns
+            category_ids (np.ndarray): int32 array of category id per label
+            boxes (np.ndarray or None): float64 array of shape (n_labels, 4) with [left, top, right, bottom] per label for detection, None otherwise
+            label_type (type): ImageLabelWithCategoryManifest subclass used for creating label objects, can be None if there is no label
+            categories (list): categories
+            data_type (DatasetTypes): data type
+            image_additional_info (dict): sparse additional info of images, by image index
+            label_additional_info (dict): sparse additional info of labels, by label index
+            addtional_info (dict): additional info about this dataset
+            box_int_mask (np.ndarray or None): uint8 array of shape (n_labels,), with bit j set if coordinate j of the box was an int in the source, e.g., in COCO json, which is
+                returned as an int by the label objects. None if no coordinate was an int
+        """
+        if isinstance(data_type, dict):
+            raise ValueError('ColumnarDatasetManifest does not support multitask dataset.')
+
+        n_images = len(widths)
+        if len(image_ids) != n_images or len(img_paths) != n_images or len(heights) != n_images or len(label_offsets) != n_images + 1:
+            raise ValueError('image columns are of mismatched lengths.')
+
+        n_labels = int(label_offsets[-1])
+        if len(category_ids) != n_labels or (boxes is not None and boxes.shape != (n_labels, 4)) or (box_int_mask is not None and box_int_mask.shape != (n_labels,)):
+            raise ValueError('label columns are of mismatched lengths.')
+
+        if n_labels and label_type is None:
+            raise ValueError('label_type is required for creating labels.')
+
+        self.image_ids = image_ids
+        self.img_paths = img_paths
+        self.widths = widths
+        self.heights = heights
+        self.label_offsets = label_offsets
+        self.category_ids = category_ids
+        self.boxes = boxes
+        self.box_int_mask = box_int_mask
+        self.label_type = label_type
+        self.image_additional_info = image_additional_info or {}
+        self.label_additional_info = label_additional_info or {}
+
+        super().__init__(_ColumnarImageList(self), categories, data_type, addtional_info)
+
+    @classmethod
+    def from_dataset_manifest(cls, manifest: DatasetManifest):
+        """
+        Convert a DatasetManifest into the columnar representation.
+
+        Args:
+            manifest (DatasetManifest): single-task manifest, with labels being ImageLabelWithCategoryManifest with either an int category id, or a [c_id, left, top, right, bottom] box
+        """
+
+        if manifest.is_multitask:
+            raise ValueError('ColumnarDatasetManifest does not support multitask dataset.')
+
+        builder = ColumnarDatasetManifestBuilder()
+        for image in manifest.peek_images():
+            image_index = builder.add_image(image.id, image.img_path, image.width, image.height, image.additional_info)
+            for label in image.labels:
+                builder.add_label(image_index, label)
+
+        return builder.build(manifest.categories, manifest.data_type, manifest.additional_info)
+
+    @classmethod
+    def from_arrays(cls,
+                    image_ids: typing.Union[np.ndarray, typing.Sequence],
+                    img_paths: typing.Union[StringColumn, typing.Sequence[str]],
+                    label_image_indices: np.ndarray,
+                    category_ids: np.ndarray,
+                    label_type: typing.Optional[type],
+                    categories: typing.List[CategoryManifest],
+                    data_type,
+                    boxes: typing.Optional[np.ndarray] = None,
+                    widths: typing.Optional[np.ndarray] = None,
+                    heights: typing.Optional[np.ndarray] = None,
+                    addtional_info={}):
+        """
+        Create from flat arrays of images and labels, e.g., read from a parquet or npz file, without creating an object per image or label.
+
+        Args:
+            image_ids (np.ndarray or sequence): int or str image ids
+            img_paths (StringColumn or sequence): image paths
+            label_image_indices (np.ndarray): index of the image of each label, labels of an image keep their order in the label arrays
+            category_ids (np.ndarray): category id of each label
+            label_type (type): ImageLabelWithCategoryManifest subclass used for creating label objects, can be None if there is no label
+            categories (list): categories
+            data_type (DatasetTypes): data type
+            boxes (np.ndarray or None): array of shape (n_labels, 4) with [left, top, right, bottom] per label for detection, None otherwise
+            widths (np.ndarray or None): image widths, nan if unknown, None if all unknown
+            heights (np.ndarray or None): image heights, nan if unknown, None if all unknown
+            addtional_info (dict): additional info about this dataset
+        """
+
+        n_images = len(img_paths)
+        label_image_indices = np.asarray(label_image_indices, dtype=np.int64).reshape(-1)
+        if len(label_image_indices) and (label_image_indices.min() < 0 or label_image_indices.max() >= n_images):
+            raise ValueError(f'label_image_indices out of range [0, {n_images}).')
+
+        # stable, so that labels of an image keep their order
+        order = np.argsort(label_image_indices, kind='stable')
+        label_offsets = np.zeros(n_images + 1, dtype=np.int64)
+        np.cumsum(np.bincount(label_image_indices, minlength=n_images), out=label_offsets[1:])
+
+        return cls(_to_id_column(image_ids),
+                   img_paths if isinstance(img_paths, StringColumn) else StringColumn.from_strings(img_paths),
+                   _to_size_column(widths, n_images),
+                   _to_size_column(heights, n_images),
+                   label_offsets,
+                   np.asarray(category_ids, dtype=np.int32)[order],
+                   None if boxes is None else np.asarray(boxes, dtype=np.float64).reshape(-1, 4)[order],
+                   label_type, categories, data_type, addtional_info=addtional_info)
+
+    def to_dataset_manifest(self) -> DatasetManifest:
+        """
+        Materialize into a regular DatasetManifest, independent of this manifest.
+        """
+
+        return DatasetManifest(list(self.images), copy.deepcopy(self.categories), copy.deepcopy(self.data_type), copy.deepcopy(self.additional_info))
+
+    def get_image(self, index: int) -> ImageDataManifest:
+        return ImageDataManifest(self._get_image_id(index), self.img_paths[index], self._get_size(self.widths[index]), self._get_size(self.heights[index]),
+                                 [self._get_label(j) for j in range(self.label_offsets[index], self.label_offsets[index + 1])],
+                                 copy.deepcopy(self.image_additional_info.get(index, {})))
+
+    def get_image_size(self, index: int) -> typing.Tuple:
+        """
+        (width, height) of an image, None if unknown
+        """
+
+        return self._get_size(self.widths[index]), self._get_size(self.heights[index])
+
+    def get_category_ids(self, index: int) -> np.ndarray:
+        """
+        Category ids of labels of an image, as a view of the category id column
+        """
+
+        return self.category_ids[self.label_offsets[index]:self.label_offsets[index + 1]]
+
+    def get_boxes(self, index: int) -> typing.Optional[np.ndarray]:
+        """
+        [left, top, right, bottom] boxes of labels of an image, as a view of the box column, None if not a detection dataset
+        """
+
+        if self.boxes is None:
+            return None
+
+        return self.boxes[self.label_offsets[index]:self.label_offsets[index + 1]]
+
+    def n_labels(self, index: int) -> int:
+        return int(self.label_offsets[index + 1] - self.label_offsets[index])
+
+    def _get_image_id(self, index):
+        image_id = self.image_ids[index]
+        return image_id.item() if isinstance(image_id, np.generic) else image_id
+
+    def _get_label(self, label_index):
+        additional_info = copy.deepcopy(self.label_additional_info.get(label_index, {}))
+        c_id = int(self.category_ids[label_index])
+        if self.boxes is None:
+            return self.label_type(c_id, additional_info=additional_info)
+
+        box = self.boxes[label_index].tolist()
+        int_mask = int(self.box_int_mask[label_index]) if self.box_int_mask is not None else 0
+        if int_mask:
+            box = [int(x) if int_mask >> j & 1 else x for j, x in enumerate(box)]
+        return self.label_type([c_id] + box, additional_info=additional_info)
+
+    @staticmethod
+    def _get_size(value):
+        if np.isnan(value):
+            return None
+
+        value = float(value)
+        return int(value) if value.is_integer() else value
+
+
+def _to_id_column(ids) -> typing.Union[np.ndarray, StringColumn]:
+    if isinstance(ids, StringColumn):
+        return ids
+    if isinstance(ids, np.ndarray) and ids.dtype.kind in 'iu':
+        return ids.astype(np.int64, copy=False)
+    if all(isinstance(x, (int, np.integer)) and not isinstance(x, bool) for x in ids):
+        return np.asarray(ids, dtype=np.int64)
+    if all(isinstance(x, str) for x in ids):
+        return StringColumn.from_strings(ids)
+    return np.asarray(ids, dtype=object)
+
+
+def _to_size_column(sizes, n_images) -> np.ndarray:
+    if sizes is None:
+        return np.full(n_images, np.nan, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    if sizes.shape != (n_images,):
+        raise ValueError('image columns are of mismatched lengths.')
+    return sizes
+
+
+class _ColumnarLabelSink:
+    """
+    Appends labels of an image to a ColumnarDatasetManifestBuilder, for code appending labels to `image.labels`, e.g., CocoManifestAdaptor.process_label
+    """
+
+    def __init__(self, builder: 'ColumnarDatasetManifestBuilder', image_index: int):
+        self._builder = builder
+        self._image_index = image_index
+
+    def append(self, label: ImageLabelWithCategoryManifest):
+        self._builder.add_label(self._image_index, label)
+
+    def __len__(self):
+        return self._builder.n_labels(self._image_index)
+
+
+class _ColumnarImageWriter:
+    def __init__(self, builder: 'ColumnarDatasetManifestBuilder', image_index: int):
+        self.labels = _ColumnarLabelSink(builder, image_index)
+
+
+class ColumnarDatasetManifestBuilder:
+    """
+    Fills the columns of a ColumnarDatasetManifest image by image and label by label, without keeping an ImageDataManifest per image. Labels can be added in any order across images,
+    e.g., as annotations are read from a coco file.
+    """
+
+    def __init__(self):
+        self._ids = []
+        self._paths_blob = bytearray()
+        self._paths_offsets = array.array('q', [0])
+        self._widths = array.array('d')
+        self._heights = array.array('d')
+        self._n_labels_per_image = array.array('q')
+        self._image_additional_info = {}
+
+        self._label_image_indices = array.array('q')
+        self._category_ids = array.array('i')
+        self._boxes = array.array('d')
+        self._box_int_mask = array.array('B')
+        self._label_additional_info = {}
+        self._label_type = None
+        self._has_box = None
+
+    def add_image(self, image_id, img_path: str, width=None, height=None, additional_info: dict = {}) -> int:
+        """
+        Returns:
+            index of the image, for adding its labels
+        """
+
+        self._ids.append(image_id)
+        self._paths_blob += str(img_path).encode('utf-8')
+        self._paths_offsets.append(len(self._paths_blob))
+        self._widths.append(np.nan if width is None else width)
+        self._heights.append(np.nan if height is None else height)
+        self._n_labels_per_image.append(0)
+        if additional_info != {}:
+            self._image_additional_info[len(self._ids) - 1] = additional_info
+        return len(self._ids) - 1
+
+    def add_label(self, image_index: int, label: ImageLabelWithCategoryManifest):
+        if not isinstance(label, ImageLabelWithCategoryManifest):
+            raise ValueError(f'Unsupported label type {type(label)}, only labels with category are supported.')
+        if self._label_type is None:
+            self._label_type = type(label)
+            self._has_box = isinstance(label.label_data, (list, tuple))
+        elif type(label) is not self._label_type:
+            raise ValueError(f'Mixed label types {self._label_type} and {type(label)}.')
+
+        if label.additional_info != {}:
+            self._label_additional_info[len(self._category_ids)] = label.additional_info
+        self._label_image_indices.append(image_index)
+        self._n_labels_per_image[image_index] += 1
+        self._category_ids.append(label.category_id)
+        if self._has_box:
+            box = label.label_data[1:]
+            self._boxes.extend(box)
+            self._box_int_mask.append(sum(1 << j for j, x in enumerate(box) if isinstance(x, (int, np.integer)) and not isinstance(x, bool)))
+
+    def n_labels(self, image_index: int) -> int:
+        return self._n_labels_per_image[image_index]
+
+    def image_writer(self, image_index: int) -> _ColumnarImageWriter:
+        """
+        Object whose `labels.append` adds labels to the image
+        """
+
+        return _ColumnarImageWriter(self, image_index)
+
+    def build(self, categories: typing.List[CategoryManifest], data_type, addtional_info={}, sort_by_image_id: bool = False) -> ColumnarDatasetManifest:
+        """
+        Args:
+            categories (list): categories
+            data_type (DatasetTypes): data type
+            addtional_info (dict): additional info about this dataset
+            sort_by_image_id (bool): order images by id, as coco adaptors do, instead of the order they were added in
+        """
+
+        n_images = len(self._ids)
+        image_order = sorted(range(n_images), key=self._ids.__getitem__) if sort_by_image_id else None
+        if image_order == list(range(n_images)):
+            image_order = None
+
+        label_image_indices = np.frombuffer(self._label_image_indices, dtype=np.int64) if len(self._label_image_indices) else np.zeros(0, dtype=np.int64)
+        widths = np.array(self._widths, dtype=np.float64)
+        heights = np.array(self._heights, dtype=np.float64)
+        paths = StringColumn(np.frombuffer(bytes(self._paths_blob), dtype=np.uint8), np.array(self._paths_offsets, dtype=np.int64))
+        ids = self._ids
+        image_additional_info = self._image_additional_info
+        if image_order is not None:
+            new_positions = np.empty(n_images, dtype=np.int64)
+            new_positions[image_order] = np.arange(n_images)
+            label_image_indices = new_positions[label_image_indices]
+            widths, heights = widths[image_order], heights[image_order]
+            paths = StringColumn.from_strings(paths[i] for i in image_order)
+            ids = [ids[i] for i in image_order]
+            image_additional_info = {int(new_positions[k]): v for k, v in image_additional_info.items()}
+
+        # stable, so that labels of an image keep their order
+        order = np.argsort(label_image_indices, kind='stable')
+        label_offsets = np.zeros(n_images + 1, dtype=np.int64)
+        np.cumsum(np.bincount(label_image_indices, minlength=n_images), out=label_offsets[1:])
+
+        new_label_positions = np.empty(len(order), dtype=np.int64)
+        new_label_positions[order] = np.arange(len(order))
+        label_additional_info = {int(new_label_positions[k]): v for k, v in self._label_additional_info.items()}
+
+        category_ids = np.array(self._category_ids, dtype=np.int32)[order]
+        boxes = np.array(self._boxes, dtype=np.float64).reshape(-1, 4)[order] if self._has_box else None
+        box_int_mask = np.array(self._box_int_mask, dtype=np.uint8)[order] if self._has_box and any(self._box_int_mask) else None
+
+        return ColumnarDatasetManifest(_to_id_column(ids), paths, widths, heights, label_offsets, category_ids, boxes, self._label_type, categories, data_type,
+                                       image_additional_info, label_additional_info, addtional_info, box_int_mask)
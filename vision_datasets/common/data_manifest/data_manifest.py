@@ -1,7 +1,7 @@
 import abc
 import logging
 import pathlib
-from typing import Dict, List, Union
+from typing import Dict, Iterator, List, Union
 
 from ..constants import DatasetTypes
 
@@ -227,6 +227,20 @@ class DatasetManifest(ManifestBase):
 
         return isinstance(self.data_type, dict)
 
+    def peek_image(self, index: int) -> ImageDataManifest:
+        """
+        Image at index for reading, which must not be modified, without copying it if images are copied on access (see DatasetManifestView)
+        """
+
+        return self.images[index]
+
+    def peek_images(self) -> Iterator[ImageDataManifest]:
+        """
+        Images for reading, which must not be modified, without copying them if images are copied on access (see DatasetManifestView)
+        """
+
+        return iter(self.images)
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, DatasetManifest):
             return False
@@ -0,0 +1,254 @@
+import hashlib
+import logging
+import os
+import pathlib
+import pickle
+import shutil
+import tempfile
+import typing
+
+import numpy as np
+
+from ..data_reader import FileReader, HttpBackend, LocalFileBackend, StorageBackendFactory, ZipFileBackend
+from .columnar_data_manifest import ColumnarDatasetManifest, StringColumn
+from .data_manifest import DatasetManifest
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestCache:
+    """
+    On-disk cache of parsed dataset manifests, keyed on the metadata of the index files, e.g., size and modification time, and the adaptor parsing them.
+
+    Manifests that can be represented by ColumnarDatasetManifest are stored as a directory of .npy arrays, which are memory-mapped when loaded, so that a cached manifest loads in
+    milliseconds and its pages are shared by all processes on the same machine reading it. Other manifests, e.g., multitask or key-value pair ones, are stored pickled.
+
+    Entries are written to a temporary directory and renamed into place, so concurrent readers never see a partially written entry.
+    """
+
+    FORMAT_VERSION = 2
+    _META_FILE = 'meta.pkl'
+    _MANIFEST_FILE = 'manifest.pkl'
+
+    def __init__(self, cache_dir: typing.Union[str, pathlib.Path]):
+        """
+        Args:
+            cache_dir (str or pathlib.Path): local directory for storing the cache entries
+        """
+        if not cache_dir:
+            raise ValueError('cache_dir is required.')
+
+        self.cache_dir = pathlib.Path(cache_dir)
+
+    @classmethod
+    def compute_key(cls, file_paths: typing.Iterable[str], *args) -> str:
+        """
+        Compute cache key from the index files, and any other info determining the parsed manifest, e.g., adaptor type, data type and root dir.
+
+        Index files are identified by cheap metadata instead of their content: size and modification time for local files and local zips, ETag or Content-MD5 from a HEAD
+        request for urls, e.g., blobs. Files without such metadata, e.g., from other storage backends, are identified by the hash of their content.
+
+        Args:
+            file_paths (list): paths or urls to index files, None entries are allowed
+            args: other info determining the parsed manifest, converted to str for hashing
+        """
+
+        key_hash = hashlib.sha256(f'v{cls.FORMAT_VERSION}'.encode('utf-8'))
+        for arg in args:
+            key_hash.update(f'|{arg}'.encode('utf-8'))
+
+        file_reader = None
+        for file_path in file_paths:
+            key_hash.update(f'|{file_path}|'.encode('utf-8'))
+            if file_path is None:
+                continue
+            fingerprint = cls._get_file_fingerprint(str(file_path))
+            if fingerprint is not None:
+                key_hash.update(fingerprint.encode('utf-8'))
+                continue
+
+            file_reader = file_reader or FileReader()
+            key_hash.update(b'content:')
+            with file_reader.open(file_path, 'rb') as file_in:
+                for chunk in iter(lambda: file_in.read(1 << 20), b''):
+                    key_hash.update(chunk)
+        if file_reader is not None:
+            file_reader.close()
+
+        return key_hash.hexdigest()
+
+    @staticmethod
+    def _get_file_fingerprint(file_path: str) -> typing.Optional[str]:
+        """Metadata identifying the version of a file without reading it, None if not available"""
+
+        backend_class = StorageBackendFactory.get_backend_class(file_path)
+        if backend_class in (LocalFileBackend, ZipFileBackend):
+            # the zip of a file in a local zip
+            stat = os.stat(file_path.split('@', 1)[0] if backend_class is ZipFileBackend else file_path)
+            return f'stat:{stat.st_size}:{stat.st_mtime_ns}'
+
+        if backend_class is HttpBackend:
+            # files without the metadata are hashed instead
+            return HttpBackend.get_version_tag(file_path)
+
+        return None
+
+    def get_or_create(self, key: str, create_func: typing.Callable[[], DatasetManifest], columnar: bool = False) -> DatasetManifest:
+        """
+        Load the manifest cached under the key, or create it with create_func and cache it
+
+        Args:
+            key (str): cache key, see compute_key
+            create_func (callable): function creating the manifest, if it is not cached
+            columnar (bool): return the read-only memory-mapped ColumnarDatasetManifest for manifests cached in columns, instead of a manifest of the type create_func returns
+        """
+
+        manifest = self.load(key, columnar)
+        if manifest is not None:
+            return manifest
+
+        manifest = create_func()
+        if manifest is not None:
+            self.save(key, manifest)
+            if columnar and type(manifest) is DatasetManifest:
+                manifest = self.load(key, columnar) or manifest
+        return manifest
+
+    def load(self, key: str, columnar: bool = False) -> typing.Optional[DatasetManifest]:
+        """
+        Load the manifest cached under the key, None if not cached
+
+        Args:
+            key (str): cache key, see compute_key
+            columnar (bool): return the read-only memory-mapped ColumnarDatasetManifest for manifests cached in columns, instead of converting it to a DatasetManifest
+        """
+
+        entry_dir = self.cache_dir / key
+        if not entry_dir.is_dir():
+            return None
+
+        try:
+            with open(entry_dir / self._META_FILE, 'rb') as f:
+                meta = pickle.load(f)
+            if meta.get('version') != self.FORMAT_VERSION:
+                logger.info(f'Ignoring manifest cache {entry_dir} of version {meta.get("version")}.')
+                return None
+
+            if meta['kind'] == 'pickle':
+                with open(entry_dir / self._MANIFEST_FILE, 'rb') as f:
+                    return pickle.load(f)
+
+            manifest = self._load_columnar(entry_dir, meta)
+            return manifest if columnar else manifest.to_dataset_manifest()
+        except Exception as e:
+            logger.warning(f'Failed to load manifest cache {entry_dir}, ignored: {e}')
+            return None
+
+    def save(self, key: str, manifest: DatasetManifest) -> bool:
+        """
+        Cache the manifest under the key, returns whether succeeded. Failures, e.g., a read-only cache dir, are logged and not raised.
+        """
+
+        entry_dir = self.cache_dir / key
+        temp_dir = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_dir = pathlib.Path(tempfile.mkdtemp(prefix=f'.{key}.', dir=self.cache_dir))
+            columnar = self._to_columnar(manifest)
+
+            if columnar is None:
+                with open(temp_dir / self._MANIFEST_FILE, 'wb') as f:
+                    pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+                meta = {'kind': 'pickle'}
+            else:
+                meta = self._save_columnar(temp_dir, columnar)
+
+            # meta file is written last, marking the entry complete
+            meta['version'] = self.FORMAT_VERSION
+            with open(temp_dir / self._META_FILE, 'wb') as f:
+                pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(temp_dir, entry_dir)
+            temp_dir = None
+            return True
+        except OSError as e:
+            if entry_dir.is_dir():
+                # entry written by another process in the meantime
+                return True
+            logger.warning(f'Failed to write manifest cache {entry_dir}: {e}')
+            return False
+        finally:
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _to_columnar(manifest: DatasetManifest) -> typing.Optional[ColumnarDatasetManifest]:
+        if isinstance(manifest, ColumnarDatasetManifest):
+            return manifest
+        if type(manifest) is not DatasetManifest:
+            return None
+
+        try:
+            return ColumnarDatasetManifest.from_dataset_manifest(manifest)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _save_columnar(entry_dir: pathlib.Path, manifest: ColumnarDatasetManifest) -> dict:
+        arrays = {
+            'img_paths_blob': manifest.img_paths.blob,
+            'img_paths_offsets': manifest.img_paths.offsets,
+            'widths': manifest.widths,
+            'heights': manifest.heights,
+            'label_offsets': manifest.label_offsets,
+            'category_ids': manifest.category_ids,
+        }
+        if manifest.boxes is not None:
+            arrays['boxes'] = manifest.boxes
+        if manifest.box_int_mask is not None:
+            arrays['box_int_mask'] = manifest.box_int_mask
+
+        meta = {
+            'kind': 'columnar',
+            'label_type': manifest.label_type,
+            'categories': manifest.categories,
+            'data_type': manifest.data_type,
+            'image_additional_info': manifest.image_additional_info,
+            'label_additional_info': manifest.label_additional_info,
+            'additional_info': manifest.additional_info,
+        }
+
+        if isinstance(manifest.image_ids, StringColumn):
+            arrays['image_ids_blob'] = manifest.image_ids.blob
+            arrays['image_ids_offsets'] = manifest.image_ids.offsets
+            meta['image_ids'] = 'str'
+        elif manifest.image_ids.dtype == object:
+            meta['image_ids'] = list(manifest.image_ids)
+        else:
+            arrays['image_ids'] = manifest.image_ids
+            meta['image_ids'] = 'array'
+
+        for name, array in arrays.items():
+            np.save(entry_dir / f'{name}.npy', np.ascontiguousarray(array), allow_pickle=False)
+        meta['arrays'] = list(arrays)
+
+        return meta
+
+    @staticmethod
+    def _load_columnar(entry_dir: pathlib.Path, meta: dict) -> ColumnarDatasetManifest:
+        arrays = {}
+        for name in meta['arrays']:
+            arrays[name] = np.load(entry_dir / f'{name}.npy', mmap_mode='r', allow_pickle=False)
+
+        if meta['image_ids'] == 'str':
+            image_ids = StringColumn(arrays['image_ids_blob'], arrays['image_ids_offsets'])
+        elif meta['image_ids'] == 'array':
+            image_ids = arrays['image_ids']
+        else:
+            image_ids = np.asarray(meta['image_ids'], dtype=object)
+
+        return ColumnarDatasetManifest(image_ids, StringColumn(arrays['img_paths_blob'], arrays['img_paths_offsets']), arrays['widths'], arrays['heights'], arrays['label_offsets'],
+                                       arrays['category_ids'], arrays.get('boxes'), meta['label_type'], meta['categories'], meta['data_type'], meta['image_additional_info'],
+                                       meta['label_additional_info'], meta['additional_info'], arrays.get('box_int_mask'))
@@ -0,0 +1,191 @@
+import collections.abc
+import copy
+import logging
+import operator
+import typing
+
+import numpy as np
+
+from .data_manifest import DatasetManifest, ImageDataManifest
+
+logger = logging.getLogger(__name__)
+
+
+class _ImageListView(collections.abc.MutableSequence):
+    """
+    Sequence of ImageDataManifest selected by indices from the images of a source manifest. An image is copied from the source on its first access, and the copy is kept, so that
+    modifying it modifies the view only; images never accessed are never copied.
+
+    The view can be modified like a list: assigning an image at a position makes the view own it, and other changes, e.g., inserting, removing or sorting images, first materialize
+    the view into a list of copies of its images.
+    """
+
+    def __init__(self, images: typing.Sequence[ImageDataManifest], indices: np.ndarray, owned: typing.Dict[int, ImageDataManifest] = None):
+        """
+        Args:
+            images (sequence): images of the source manifest
+            indices (np.ndarray): int64 array of indices into images, can be repeated
+            owned (dict): images owned by the view by position, e.g., copies already accessed, which take precedence over the source images
+        """
+        self._images = images
+        self.indices = indices
+        self._owned = owned or {}
+        # list of images owned by the view, once it is materialized
+        self._list = None
+
+    def __len__(self):
+        return len(self._list) if self._list is not None else len(self.indices)
+
+    def __getitem__(self, index):
+        if self._list is not None:
+            return self._list[index]
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = self._check_index(index)
+        image = self._owned.get(index)
+        if image is None:
+            image = self._owned[index] = copy.deepcopy(self._images[int(self.indices[index])])
+        return image
+
+    def __setitem__(self, index, value):
+        if self._list is None and not isinstance(index, slice):
+            self._owned[self._check_index(index)] = value
+            return
+
+        self._materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    def sort(self, *args, **kwargs):
+        self._materialize().sort(*args, **kwargs)
+
+    def _materialize(self) -> typing.List[ImageDataManifest]:
+        if self._list is None:
+            self._list = [self[i] for i in range(len(self))]
+            self._images, self.indices, self._owned = None, None, None
+        return self._list
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __contains__(self, value):
+        return any(x is value or x == value for x in self.iter_peek())
+
+    def peek(self, index) -> ImageDataManifest:
+        """
+        Image at index without copying it, which must not be modified
+        """
+        if self._list is not None:
+            return self._list[index]
+
+        index = self._check_index(index)
+        image = self._owned.get(index)
+        return image if image is not None else self._images[int(self.indices[index])]
+
+    def iter_peek(self) -> typing.Iterator[ImageDataManifest]:
+        for i in range(len(self)):
+            yield self.peek(i)
+
+    def select(self, indices: np.ndarray) -> '_ImageListView':
+        """
+        View of the images at indices of this view, over the same source, with copies of the images this view owns
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if self._list is not None:
+            return _ImageListView(self._list, indices)
+
+        owned = {}
+        if self._owned:
+            for new_idx in np.flatnonzero(np.isin(indices, np.fromiter(self._owned, dtype=np.int64, count=len(self._owned)))):
+                owned[int(new_idx)] = copy.deepcopy(self._owned[int(indices[new_idx])])
+        return _ImageListView(self._images, self.indices[indices], owned)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def _check_index(self, index):
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError
+        return index
+
+    def __eq__(self, other):
+        try:
+            if len(self) != len(other):
+                return False
+            other_images = other.iter_peek() if isinstance(other, _ImageListView) else other
+            return all(x == y for x, y in zip(self.iter_peek(), other_images))
+        except TypeError:
+            return False
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(x, memo) for x in self.iter_peek()]
+
+
+class DatasetManifestView(DatasetManifest):
+    """
+    DatasetManifest of images selected by indices from a source manifest, returned by operations like Split, ManifestSampler, DatasetFilter and RemoveCategories instead of deep copies.
+
+    Images are copied from the source on first access through `images` (see _ImageListView), so creating a view is O(number of selected images) regardless of the size of the
+    images, and modifying the images of a view does not change the source. Views of views select from the original source directly, so chained operations do not stack up.
+    Operations reading images only use `peek_image`/`peek_images`, which do not copy. `copy.deepcopy` and pickling materialize a regular DatasetManifest of the selected images.
+    """
+
+    def __init__(self, source: DatasetManifest, indices: typing.Union[np.ndarray, typing.Sequence[int]], categories=None, data_type=None, addtional_info=None,
+                 owned_images: typing.Dict[int, ImageDataManifest] = None):
+        """
+        Args:
+            source (DatasetManifest): manifest to select images from, whose images must not be modified while the view is used
+            indices (np.ndarray or list): indices of the selected images in source, can be repeated
+            categories (list or dict): categories of the view, a deep copy of the ones of source if not provided
+            data_type (str or dict): data type of the view, the one of source if not provided
+            addtional_info (dict): additional info of the view, a deep copy of the one of source if not provided
+            owned_images (dict): images replacing the selected ones by position in the view, e.g., modified copies, owned by the view
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(source.images)):
+            raise ValueError(f'indices out of range [0, {len(source.images)}).')
+
+        source_images = source.images
+        images = source_images.select(indices) if isinstance(source_images, _ImageListView) else _ImageListView(source_images, indices)
+        for index, image in (owned_images or {}).items():
+            images[index] = image
+
+        super().__init__(images,
+                         copy.deepcopy(source.categories) if categories is None else categories,
+                         copy.deepcopy(source.data_type) if data_type is None else data_type,
+                         copy.deepcopy(source.additional_info) if addtional_info is None else addtional_info)
+
+    def peek_image(self, index: int) -> ImageDataManifest:
+        images = self.images
+        return images.peek(index) if isinstance(images, _ImageListView) else images[index]
+
+    def peek_images(self) -> typing.Iterator[ImageDataManifest]:
+        images = self.images
+        return images.iter_peek() if isinstance(images, _ImageListView) else iter(images)
+
+    def to_dataset_manifest(self) -> DatasetManifest:
+        """
+        Materialize into a regular DatasetManifest, independent of this view and of its source.
+        """
+
+        return DatasetManifest([copy.deepcopy(x) for x in self.peek_images()], copy.deepcopy(self.categories), copy.deepcopy(self.data_type), copy.deepcopy(self.additional_info))
+
+    def __deepcopy__(self, memo):
+        return self.to_dataset_manifest()
+
+    def __reduce__(self):
+        # pickling the source would pickle all of its images
+        return DatasetManifest, (list(self.peek_images()), self.categories, self.data_type, self.additional_info)
@@ -5,7 +5,8 @@ from .generate_stand_alone_image_list_base import GenerateStandAloneImageListBas
 from .merge import MultiImageDatasetSingleTaskMerge, ManifestMerger, MergeStrategy, SingleTaskMerge
 from .operation import Operation
 from .remove_categories import RemoveCategories, RemoveCategoriesConfig
-from .sample import ManifestSampler, SampleBaseConfig, SampleByFewShotConfig, SampleByNumSamples, SampleByNumSamplesConfig, SampleFewShot, SampleStrategy, SampleStrategyType
+from .sample import AliasTableSampler, ManifestSampler, SampleBaseConfig, SampleByFewShotConfig, SampleByNumSamples, SampleByNumSamplesConfig, SampleFewShot, SampleStrategy, \
+    SampleStrategyType
 from .spawn import Spawn, SpawnConfig
 from .split import Split, SplitConfig, SplitWithCategories
 
@@ -14,6 +15,7 @@ __all__ = ['Operation',
            'GenerateStandAloneImageListBase',
            'MultiImageDatasetSingleTaskMerge', 'MergeStrategy', 'ManifestMerger', 'SingleTaskMerge',
            'ManifestSampler', 'SampleBaseConfig', 'SampleByFewShotConfig', 'SampleByNumSamplesConfig', 'SampleStrategy', 'SampleStrategyType', 'SampleByNumSamples', 'SampleFewShot',
+           'AliasTableSampler',
            'Spawn', 'SpawnConfig',
            'Split', 'SplitWithCategories', 'SplitConfig',
            'ImageFilter', 'DatasetFilter', 'ImageNoAnnotationFilter',
@@ -2,12 +2,12 @@
 
 import logging
 import typing
-from collections import Counter
 from dataclasses import dataclass
 
 import numpy
 
-from ..data_manifest import DatasetManifest, ImageLabelWithCategoryManifest
+from ..data_manifest import DatasetManifest
+from ..utils import build_category_incidence
 from .operation import Operation
 
 logger = logging.getLogger(__name__)
@@ -23,47 +23,67 @@ class WeightsGenerationConfig:
 class BalancedInstanceWeightsGenerator(Operation):
     """
     Generate instance weights, with which sampling can achieve a balanced dataset across different categories.
+
+    The weights are computed with array operations over a CSR incidence matrix of images x categories, in which each label of an image is an entry of its category (so a category
+    is counted once per box for detection), and images without labels have a single entry of an extra negative category. For multitask datasets, the categories of tasks are
+    concatenated into blocks of columns.
     """
-    _NEG_CLASS_INDEX = -1
 
     def __init__(self, config: WeightsGenerationConfig) -> None:
         super().__init__()
         self.config = config
 
-    def run(self, *args: DatasetManifest):
+    def run(self, *args: DatasetManifest) -> numpy.ndarray:
+        """
+        Returns:
+            float64 array of instance weights, one per image
+        """
+
         data_manifest = args[0]
         if data_manifest is None:
             raise ValueError('data manifest is None.')
 
         logger.info("Generating instance weights for dataset balancing.")
-        image_tags = [self._process_labels(x.labels) for x in data_manifest.images]
-
-        class_wise_image_counter = Counter()
-        for tags in image_tags:
-            class_wise_image_counter.update(tags)
-
-        mean_class_wise_image_tag_count = numpy.mean(list(class_wise_image_counter.values()))
-        class_wise_multipliers = {x: mean_class_wise_image_tag_count / class_wise_image_counter[x] for x in class_wise_image_counter}
+        indptr, indices, n_columns = self._build_incidence_matrix(data_manifest)
+        if len(indptr) == 1:
+            return numpy.zeros(0, dtype=numpy.float64)
+
+        class_wise_counts = numpy.bincount(indices, minlength=n_columns)
+        present = class_wise_counts > 0
+        class_wise_multipliers = numpy.ones(n_columns, dtype=numpy.float64)
+        class_wise_multipliers[present] = class_wise_counts[present].mean() / class_wise_counts[present]
         if self.config.soft:
-            class_wise_multipliers = {x: numpy.sqrt(class_wise_multipliers[x]) for x in class_wise_multipliers}
+            class_wise_multipliers = numpy.sqrt(class_wise_multipliers)
+        class_wise_multipliers = self._scope_multiplier(class_wise_multipliers, self.config.weight_upper, self.config.weight_lower)
 
-        class_wise_multipliers = {x: BalancedInstanceWeightsGenerator._scope_multiplier(class_wise_multipliers[x], self.config.weight_upper, self.config.weight_lower) for x in class_wise_multipliers}
+        # every image has at least one entry, so that no segment of reduceat is empty
+        image_weights = self._scope_multiplier(numpy.multiply.reduceat(class_wise_multipliers[indices], indptr[:-1]), self.config.weight_upper, self.config.weight_lower)
 
-        image_weights = [BalancedInstanceWeightsGenerator._get_instance_multiplier(tags, class_wise_multipliers, self.config.weight_upper, self.config.weight_lower) for tags in image_tags]
-
-        logger.info(f'instance weights: max {max(image_weights)}, min {min(image_weights)}, len {len(image_weights)}')
+        logger.info(f'instance weights: max {image_weights.max()}, min {image_weights.min()}, len {len(image_weights)}')
 
         return image_weights
 
-    def _process_labels(self, labels: typing.List[ImageLabelWithCategoryManifest]):
-        return [x.category_id for x in labels] or [BalancedInstanceWeightsGenerator._NEG_CLASS_INDEX]
-
     @staticmethod
-    def _get_instance_multiplier(tags, class_wise_multipliers, weight_upper, weight_lower):
-        mul = numpy.prod([class_wise_multipliers[tag] for tag in tags])
-
-        return BalancedInstanceWeightsGenerator._scope_multiplier(mul, weight_upper, weight_lower)
+    def _build_incidence_matrix(data_manifest: DatasetManifest) -> typing.Tuple[numpy.ndarray, numpy.ndarray, int]:
+        """
+        Returns:
+            indptr (int64 array of length n_images + 1), indices (int64 array of column per entry) of the CSR matrix, and the number of columns, the last one being the negative one,
+            which is the only entry of images without labels
+        """
+
+        label_offsets, category_ids = build_category_incidence(data_manifest)
+        n_labels = numpy.diff(label_offsets)
+        neg_column = int(category_ids.max()) + 1 if len(category_ids) else 0
+        n_entries = numpy.maximum(n_labels, 1)
+        indptr = numpy.zeros(len(n_labels) + 1, dtype=numpy.int64)
+        numpy.cumsum(n_entries, out=indptr[1:])
+
+        indices = numpy.full(indptr[-1], neg_column, dtype=numpy.int64)
+        positions = numpy.arange(len(category_ids)) + numpy.repeat(indptr[:-1] - label_offsets[:-1], n_labels)
+        indices[positions] = category_ids
+
+        return indptr, indices, neg_column + 1
 
     @staticmethod
     def _scope_multiplier(value, weight_upper, weight_lower):
-        return min(max(value, weight_lower), weight_upper)
+        return numpy.minimum(numpy.maximum(value, weight_lower), weight_upper)
@@ -1,13 +1,18 @@
 import abc
-import copy
 
 from ..data_manifest import DatasetManifest, ImageDataManifest
+from ..manifest_view import DatasetManifestView
 from .operation import Operation
 
 
 class ImageFilter(abc.ABC):
     @abc.abstractmethod
     def should_be_filtered(self, image: ImageDataManifest, data_manifest: DatasetManifest) -> bool:
+        """
+        Args:
+            image (ImageDataManifest): image to check, which must not be modified
+            data_manifest (DatasetManifest): manifest of the image
+        """
         pass
 
 
@@ -23,10 +28,7 @@ class DatasetFilter(Operation):
             raise ValueError
 
         manifest = args[0]
-        return DatasetManifest(copy.deepcopy([x for x in manifest.images if not self.image_filter.should_be_filtered(x, manifest)]),
-                               copy.deepcopy(manifest.categories),
-                               copy.deepcopy(manifest.data_type),
-                               copy.deepcopy(manifest.additional_info))
+        return DatasetManifestView(manifest, [i for i, x in enumerate(manifest.peek_images()) if not self.image_filter.should_be_filtered(x, manifest)])
 
 
 class ImageNoAnnotationFilter(ImageFilter):
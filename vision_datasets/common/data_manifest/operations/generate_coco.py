@@ -11,7 +11,7 @@ class GenerateCocoDictBase(Operation):
 
     def _generate_annotations(self, manifest: DatasetManifest):
         annotations = []
-        for img_id, img in enumerate(manifest.images):
+        for img_id, img in enumerate(manifest.peek_images()):
             for ann in img.labels:
                 coco_ann = {
                     'id': len(annotations) + 1,
@@ -24,7 +24,8 @@ class GenerateCocoDictBase(Operation):
         return annotations
 
     def _generate_images(self, manifest):
-        images = [{'id': i + 1, 'file_name': x.img_path, 'width': x.width, 'height': x.height} for i, x in enumerate(manifest.images)]
+        images = manifest.peek_images() if isinstance(manifest, DatasetManifest) else manifest.images
+        images = [{'id': i + 1, 'file_name': x.img_path, 'width': x.width, 'height': x.height} for i, x in enumerate(images)]
         return images
 
     def run(self, *args):
@@ -24,7 +24,7 @@ class GenerateStandAloneImageListBase(Operation):
         manifest = args[0]
         file_reader = FileReader()
         if self._flatten:
-            for i, image in enumerate(manifest.images):
+            for i, image in enumerate(manifest.peek_images()):
                 b64_image = Base64Utils.file_to_b64_str(pathlib.Path(image.img_path), file_reader=file_reader)
                 for label in image.labels:
                     img = {
@@ -39,7 +39,7 @@ class GenerateStandAloneImageListBase(Operation):
                     img['image'] = b64_image
                     yield img
         else:
-            for i, x in enumerate(manifest.images):
+            for i, x in enumerate(manifest.peek_images()):
                 yield {
                     'id': i + 1,
                     'labels': list(self._generate_labels(x, manifest)),
@@ -53,7 +53,7 @@ class SingleTaskMerge(MergeStrategy):
         categories, category_name_to_idx = self._combine_categories(args) if bool(args[0].categories) else (None, None)
 
         for manifest in args:
-            for image in manifest.images:
+            for image in manifest.peek_images():
                 new_image = copy.deepcopy(image)
                 new_image.id = len(images)
                 if categories:
@@ -2,7 +2,10 @@ import copy
 import typing
 from dataclasses import dataclass
 
+import numpy as np
+
 from ..data_manifest import DatasetManifest
+from ..manifest_view import DatasetManifestView
 from .operation import Operation
 
 
@@ -30,9 +33,8 @@ class RemoveCategories(Operation):
         if not manifest.categories:
             raise ValueError
 
-        result = copy.deepcopy(manifest)
         if not self.config.category_names:
-            return result
+            return DatasetManifestView(manifest, np.arange(len(manifest.images)))
 
         c_name_to_idx = {c.name: i for i, c in enumerate(manifest.categories)}
         c_indices_to_remove = sorted([c_name_to_idx[c] for c in self.config.category_names])
@@ -48,12 +50,17 @@ class RemoveCategories(Operation):
             label.category_id = new_category_id
             return label
 
-        for image in result.images:
+        # only images with labels removed or re-indexed are copied here, others are copied from the source when accessed
+        altered_images = {}
+        for i, image in enumerate(manifest.peek_images()):
+            if all(old_c_idx_to_new_idx.get(label.category_id) == label.category_id for label in image.labels):
+                continue
+            image = altered_images[i] = copy.deepcopy(image)
             image.labels = [alter_cid(label, old_c_idx_to_new_idx[label.category_id]) for label in image.labels if label.category_id in old_c_idx_to_new_idx]
 
         def alter_category(category, new_idx):
             category.id = new_idx
             return category
 
-        result.categories = [alter_category(c, old_c_idx_to_new_idx[i]) for i, c in enumerate(result.categories) if i in old_c_idx_to_new_idx]
-        return result
+        categories = [alter_category(c, old_c_idx_to_new_idx[i]) for i, c in enumerate(copy.deepcopy(manifest.categories)) if i in old_c_idx_to_new_idx]
+        return DatasetManifestView(manifest, np.arange(len(manifest.images)), categories=categories, owned_images=altered_images)
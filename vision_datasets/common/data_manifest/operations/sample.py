@@ -1,6 +1,5 @@
 import abc
 import collections
-import copy
 import logging
 import random
 import typing
@@ -10,6 +9,8 @@ from enum import Enum
 import numpy as np
 
 from ..data_manifest import DatasetManifest
+from ..manifest_view import DatasetManifestView
+from ..utils import build_category_incidence
 from .operation import Operation
 
 logger = logging.getLogger(__name__)
@@ -29,7 +30,80 @@ class SampleByFewShotConfig(SampleBaseConfig):
 class SampleByNumSamplesConfig(SampleBaseConfig):
     with_replacement: bool
     n_samples: int
-    weights: typing.List[float] = None
+    weights: typing.Union[typing.Sequence[float], np.ndarray] = None  # sampling weights of images, not necessarily normalized
+    # sample by weights in O(n), with AliasTableSampler with replacement, and Efraimidis-Spirakis keys without, which select different images than the default for the same seed
+    fast_weighted_sampling: bool = False
+
+
+def normalize_weights(weights: typing.Union[typing.Sequence[float], np.ndarray], n: int = None) -> np.ndarray:
+    """
+    Normalize non-negative weights into float64 probabilities summing up to 1
+
+    Args:
+        weights (list or np.ndarray): weights
+        n (int): expected number of weights, not checked if None
+    """
+
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim != 1 or (n is not None and len(weights) != n):
+        raise ValueError(f'weights must be a 1-d array of length {n}, got shape {weights.shape}.')
+    if not np.all(np.isfinite(weights)) or np.any(weights < 0):
+        raise ValueError('weights must be finite and non-negative.')
+
+    # sequential sum, as python's sum, so that probabilities are the same as the ones normalized with it
+    total = weights.cumsum()[-1] if len(weights) else 0
+    if total <= 0:
+        raise ValueError('weights must not sum up to zero.')
+
+    return weights / total
+
+
+class AliasTableSampler:
+    """
+    Sampler of indices with replacement by weights, with Walker's alias method: the table is built in O(n) once (Vose's construction), then each draw takes O(1), a uniform
+    column plus a biased coin between the column and its alias, instead of a search in the cumulative weights. Draws are reproducible for a given np.random.Generator state.
+    """
+
+    def __init__(self, weights: typing.Union[typing.Sequence[float], np.ndarray]):
+        """
+        Args:
+            weights (list or np.ndarray): non-negative weights of indices 0 to len(weights) - 1, not necessarily normalized
+        """
+
+        scaled = normalize_weights(weights) * len(weights)
+        n = len(scaled)
+        # python lists, as the construction is sequential
+        prob = [1.0] * n
+        alias = list(range(n))
+        residual = scaled.tolist()
+        small = np.flatnonzero(scaled < 1).tolist()
+        large = np.flatnonzero(scaled >= 1).tolist()
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = residual[s]
+            alias[s] = g
+            residual[g] -= 1.0 - residual[s]
+            (small if residual[g] < 1.0 else large).append(g)
+        # left overs are (close to) 1 up to rounding errors, which keep prob 1
+
+        self.prob = np.asarray(prob, dtype=np.float64)
+        self.alias = np.asarray(alias, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        Draw size indices with replacement
+
+        Args:
+            rng (np.random.Generator): random generator, e.g., np.random.default_rng(seed)
+            size (int): number of indices to draw
+        """
+
+        columns = rng.integers(len(self.prob), size=size)
+        return np.where(rng.random(size) < self.prob[columns], columns, self.alias[columns])
 
 
 class SampleStrategy(abc.ABC):
@@ -70,15 +144,42 @@ class SampleByNumSamples(SampleStrategy):
         super().__init__(config)
 
     def sample(self, manifest: DatasetManifest):
+        return DatasetManifestView(manifest, self.sample_indices(manifest))
+
+    def sample_indices(self, manifest: DatasetManifest) -> np.ndarray:
+        """
+        Indices of the sampled images in manifest
+        """
+
         if not self.config.with_replacement and self.config.n_samples > len(manifest.images):
             raise ValueError('n_samples must be less than or equal to the number of images in the dataset.')
 
         rng = np.random.default_rng(self.config.random_seed)
-        normalized_weights = [w / sum(self.config.weights) for w in self.config.weights] if self.config.weights else None
-        sampled_indices = rng.choice(len(manifest.images), size=self.config.n_samples, replace=self.config.with_replacement, p=normalized_weights)
-        sampled_images = [manifest.images[i] for i in sampled_indices]
-
-        return DatasetManifest(copy.deepcopy(sampled_images), copy.deepcopy(manifest.categories), copy.deepcopy(manifest.data_type), copy.deepcopy(manifest.additional_info))
+        weights = self.config.weights
+        if weights is not None and len(weights) != 0:
+            if len(weights) != len(manifest.images):
+                raise ValueError(f'Number of weights {len(weights)} does not match the number of images {len(manifest.images)}.')
+            if not self.config.fast_weighted_sampling:
+                sampled_indices = rng.choice(len(manifest.images), size=self.config.n_samples, replace=self.config.with_replacement, p=normalize_weights(weights))
+            elif self.config.with_replacement:
+                sampled_indices = AliasTableSampler(weights).sample(rng, self.config.n_samples)
+            else:
+                sampled_indices = self._sample_without_replacement(rng, normalize_weights(weights), self.config.n_samples)
+        else:
+            sampled_indices = rng.choice(len(manifest.images), size=self.config.n_samples, replace=self.config.with_replacement)
+
+        return sampled_indices
+
+    @staticmethod
+    def _sample_without_replacement(rng: np.random.Generator, probs: np.ndarray, n_samples: int) -> np.ndarray:
+        # Efraimidis-Spirakis: the n_samples largest keys u^(1/p), compared in log space, in O(n) instead of renormalizing the weights after each draw
+        if np.count_nonzero(probs) < n_samples:
+            raise ValueError('Fewer images with non-zero weight than n_samples.')
+
+        with np.errstate(divide='ignore'):
+            keys = np.log(rng.random(len(probs))) / probs
+        selected = np.argpartition(-keys, n_samples - 1)[:n_samples]
+        return selected[np.argsort(-keys[selected], kind='stable')]
 
 
 class SampleFewShot(SampleStrategy):
@@ -86,8 +187,15 @@ class SampleFewShot(SampleStrategy):
         Randomly pick images from the original datasets until all classes have at least {num_min_images_per_class} tags/boxes.
 
         Note that images without any tag/box will be ignored. All images in the subset will have at least one tag/box.
+
+        Images are visited in a shuffled order, an image being picked if any of its classes still needs tags/boxes, with the category ids of labels read from a sparse incidence
+        of images x categories (see build_category_incidence) in chunks of the shuffled order, and per-class remaining counts, stopping once all classes are filled.
+        For multitask datasets, classes of tasks are concatenated.
     """
 
+    FIRST_CHUNK_SIZE = 1024
+    MAX_CHUNK_SIZE = 1024 * 1024
+
     def __init__(self, config: SampleByFewShotConfig) -> None:
         if config.n_shots <= 0:
             raise ValueError('n shots must be greater than zero.')
@@ -99,31 +207,52 @@ class SampleFewShot(SampleStrategy):
             manifest (DatasetManifest): manifest to be sampled from.
 
         Returns:
-            A samped dataset (DatasetManifest)
+            A samped dataset (DatasetManifestView)
 
         Raises:
             RuntimeError if it couldn't find n_shots samples for all classes
         """
 
-        images = list(manifest.images)
+        indices = list(range(len(manifest.images)))
         rng = random.Random(self.config.random_seed)
-        rng.shuffle(images)
+        rng.shuffle(indices)
+        order = np.asarray(indices, dtype=np.int64)
 
         num_classes = len(manifest.categories) if not manifest.is_multitask else sum(len(x) for x in manifest.categories.values())
-        total_counter = collections.Counter({i: self.config.n_shots for i in range(num_classes)})
-        sampled_images = []
-        for image in images:
-            counts = collections.Counter([c.category_id for c in image.labels])
-            if set((+total_counter).keys()) & set(counts.keys()):
-                total_counter -= counts
-                sampled_images.append(image)
-
-            if not +total_counter:
-                break
-
-        if +total_counter:
-            raise RuntimeError(f"Couldn't find {self.config.n_shots} samples for some classes: {+total_counter}")
-
-        sampled_images = [copy.deepcopy(x) for x in sampled_images]
-
-        return DatasetManifest(sampled_images, copy.deepcopy(manifest.categories), copy.deepcopy(manifest.data_type), copy.deepcopy(manifest.additional_info))
+        label_offsets, category_ids = build_category_incidence(manifest)
+        remaining = [self.config.n_shots] * num_classes
+        n_unfilled = num_classes
+        sampled_indices = []
+        start = 0
+        chunk_size = self.FIRST_CHUNK_SIZE
+        while n_unfilled and start < len(order):
+            chunk = order[start:start + chunk_size]
+            label_starts = label_offsets[chunk]
+            n_labels = label_offsets[chunk + 1] - label_starts
+            label_ends = np.cumsum(n_labels)
+            # category ids of labels of the images in the chunk, in the shuffled order
+            chunk_category_ids = category_ids[np.arange(label_ends[-1]) + np.repeat(label_starts - (label_ends - n_labels), n_labels)].tolist()
+
+            label_begin = 0
+            for index, label_end in zip(chunk.tolist(), label_ends.tolist()):
+                c_ids = [c for c in chunk_category_ids[label_begin:label_end] if 0 <= c < num_classes and remaining[c] > 0]
+                label_begin = label_end
+                if not c_ids:
+                    continue
+
+                sampled_indices.append(index)
+                for c in c_ids:
+                    if remaining[c] > 0:
+                        remaining[c] -= 1
+                        n_unfilled -= remaining[c] == 0
+                if not n_unfilled:
+                    break
+
+            start += len(chunk)
+            chunk_size = min(chunk_size * 2, self.MAX_CHUNK_SIZE)
+
+        if n_unfilled:
+            unfilled = collections.Counter({c: n for c, n in enumerate(remaining) if n > 0})
+            raise RuntimeError(f"Couldn't find {self.config.n_shots} samples for some classes: {unfilled}")
+
+        return DatasetManifestView(manifest, sampled_indices)
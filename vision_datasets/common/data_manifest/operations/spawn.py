@@ -1,9 +1,11 @@
-import copy
 import logging
 import typing
 from dataclasses import dataclass
 
+import numpy
+
 from ..data_manifest import DatasetManifest
+from ..manifest_view import DatasetManifestView
 from .merge import SingleTaskMerge
 from .operation import Operation
 from .sample import SampleByNumSamples, SampleByNumSamplesConfig
@@ -15,7 +17,8 @@ logger = logging.getLogger(__name__)
 class SpawnConfig:
     random_seed: int
     target_n_samples: int
-    instance_weights: typing.List[float] = None
+    instance_weights: typing.Union[typing.Sequence[float], numpy.ndarray] = None
+    virtual: bool = False  # return a DatasetManifestView repeating source images by index, instead of a merged copy
 
 
 class Spawn(Operation):
@@ -35,8 +38,12 @@ class Spawn(Operation):
         If instance_weights is not provided, spawn follows class distribution.
         Otherwise spawn the dataset so that the instances follow the given weights. In this case the spawned size is not guranteed to be num_samples.
 
+        With config.virtual, no image is copied: the result is a DatasetManifestView of the original images followed by the spawned ones, whose memory cost is a single index
+        array, and which VisionDataset reads without copying. Images keep the ids of their source images, while they are renumbered by position in merge and COCO export
+        as for a spawned copy.
+
         Returns:
-            Spawned dataset (DatasetManifest)
+            Spawned dataset (DatasetManifest, or DatasetManifestView if config.virtual)
         """
 
         if len(args) != 1:
@@ -44,22 +51,22 @@ class Spawn(Operation):
 
         manifest = args[0]
         cfg = self.config
-        if cfg.instance_weights:
-            if len(cfg.instance_weights) != len(manifest) or any([x < 0 for x in cfg.instance_weights]):
+        # weights can be an array, e.g., from BalancedInstanceWeightsGenerator, whose truth value is ambiguous
+        if cfg.instance_weights is not None and len(cfg.instance_weights) != 0:
+            instance_weights = numpy.asarray(cfg.instance_weights, dtype=numpy.float64)
+            if len(instance_weights) != len(manifest) or numpy.any(instance_weights < 0):
                 raise ValueError
 
-            sum_weights = sum(cfg.instance_weights)
             # Distribute the number of num_samples to each image by the weights. The original image is subtracted.
-            n_copies_per_sample = [max(0, round(w / sum_weights * cfg.target_n_samples - 1)) for w in cfg.instance_weights]
-            spawned_images = []
-            for image, n_copies in zip(manifest.images, n_copies_per_sample):
-                spawned_images += [copy.deepcopy(image) for _ in range(n_copies)]
-
-            sampled_manifest = DatasetManifest(spawned_images, manifest.categories, manifest.data_type, manifest.additional_info)
+            n_copies_per_sample = numpy.maximum(0, numpy.round(instance_weights / instance_weights.sum() * cfg.target_n_samples - 1)).astype(numpy.int64)
+            sampled_indices = numpy.repeat(numpy.arange(len(manifest)), n_copies_per_sample)
         else:
             cfg = SampleByNumSamplesConfig(cfg.random_seed, True, cfg.target_n_samples - len(manifest))
-            sampled_manifest = SampleByNumSamples(cfg).sample(manifest)
+            sampled_indices = SampleByNumSamples(cfg).sample_indices(manifest)
+
+        if self.config.virtual:
+            return DatasetManifestView(manifest, numpy.concatenate([numpy.arange(len(manifest)), sampled_indices]))
 
-        # Merge with the copy of the original dataset to ensure each class has sample.
+        # Merge with the copy of the original dataset to ensure each class has sample. Copies are made once by the merge.
         merger = SingleTaskMerge()
-        return merger.merge(manifest, sampled_manifest)
+        return merger.merge(manifest, DatasetManifestView(manifest, sampled_indices))
@@ -1,9 +1,11 @@
 import random
 import typing
-from copy import deepcopy
 from dataclasses import dataclass
 
+import numpy as np
+
 from ..data_manifest import DatasetManifest
+from ..manifest_view import DatasetManifestView
 from .operation import Operation
 
 
@@ -31,19 +33,16 @@ class Split(Operation):
         manifest = args[0]
         first_cnt = int(self.config.ratio * len(manifest))
         if first_cnt == 0:
-            return DatasetManifest([], deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info)), \
-                DatasetManifest(deepcopy(manifest.images), deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info))
+            return DatasetManifestView(manifest, []), DatasetManifestView(manifest, np.arange(len(manifest)))
 
         if first_cnt == len(manifest):
-            return DatasetManifest(deepcopy(manifest.images), deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info)), \
-                DatasetManifest([], deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info))
+            return DatasetManifestView(manifest, np.arange(len(manifest))), DatasetManifestView(manifest, [])
 
         rng = random.Random(self.config.random_seed)
-        images = deepcopy(manifest.images)
-        rng.shuffle(images)
+        indices = list(range(len(manifest)))
+        rng.shuffle(indices)
 
-        return DatasetManifest(images[: first_cnt], deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info)), \
-            DatasetManifest(images[first_cnt:], deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info))
+        return DatasetManifestView(manifest, indices[:first_cnt]), DatasetManifestView(manifest, indices[first_cnt:])
 
 
 class SplitWithCategories(Operation):
@@ -57,30 +56,14 @@ class SplitWithCategories(Operation):
 
         manifest = args[0]
         if int(len(manifest.images) * self.config.ratio) == 0:
-            return DatasetManifest(
-                [],
-                deepcopy(manifest.categories),
-                deepcopy(manifest.data_type),
-                deepcopy(manifest.additional_info)), DatasetManifest(
-                deepcopy(manifest.images),
-                deepcopy(manifest.categories),
-                deepcopy(manifest.data_type),
-                deepcopy(manifest.additional_info))
+            return DatasetManifestView(manifest, []), DatasetManifestView(manifest, np.arange(len(manifest.images)))
 
         if int(len(manifest.images) * self.config.ratio) == len(manifest.images):
-            return DatasetManifest(
-                deepcopy(manifest.images),
-                deepcopy(manifest.categories),
-                deepcopy(manifest.data_type),
-                deepcopy(manifest.additional_info)), DatasetManifest(
-                [],
-                deepcopy(manifest.categories),
-                deepcopy(manifest.data_type),
-                deepcopy(manifest.additional_info))
+            return DatasetManifestView(manifest, np.arange(len(manifest.images))), DatasetManifestView(manifest, [])
 
         rng = random.Random(self.config.random_seed)
-        images = deepcopy(manifest.images)
-        rng.shuffle(images)
+        indices = list(range(len(manifest.images)))
+        rng.shuffle(indices)
 
         first_imgs = []
         second_imgs = []
@@ -97,14 +80,15 @@ class SplitWithCategories(Operation):
             for label in labels:
                 n_images_by_class[label.category_id] += 1
 
-        for image in images:
+        for index in indices:
+            image = manifest.peek_image(index)
             if image.is_negative():
                 if n_first_negative_imgs == 0 or n_second_negative_imgs / n_first_negative_imgs >= first_to_second_ratio:
                     n_first_negative_imgs += 1
-                    first_imgs.append(image)
+                    first_imgs.append(index)
                 else:
                     n_second_negative_imgs += 1
-                    second_imgs.append(image)
+                    second_imgs.append(index)
 
                 continue
 
@@ -115,11 +99,10 @@ class SplitWithCategories(Operation):
             second_cnt_sum = sum(img_label_cnt_in_second)
             second_cnt_min = min(img_label_cnt_in_second)
             if second_cnt_min < first_cnt_min or (second_cnt_min == first_cnt_min and second_cnt_sum < first_cnt_sum):
-                second_imgs.append(image)
+                second_imgs.append(index)
                 add_cnt(image.labels, n_second_imgs_by_class)
             else:
-                first_imgs.append(image)
+                first_imgs.append(index)
                 add_cnt(image.labels, n_first_imgs_by_class)
 
-        return DatasetManifest(first_imgs, deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info)), \
-            DatasetManifest(second_imgs, deepcopy(manifest.categories), deepcopy(manifest.data_type), deepcopy(manifest.additional_info))
+        return DatasetManifestView(manifest, first_imgs), DatasetManifestView(manifest, second_imgs)
@@ -1,5 +1,8 @@
-from typing import Dict
+from typing import Dict, Tuple
 
+import numpy as np
+
+from .columnar_data_manifest import ColumnarDatasetManifest
 from .data_manifest import DatasetManifest, ImageDataManifest
 
 
@@ -9,7 +12,7 @@ def generate_multitask_dataset_manifest(manifest_by_task: Dict[str, DatasetManif
         if not task_manifest:
             continue
 
-        for image in task_manifest.images:
+        for image in task_manifest.peek_images():
             if image.id not in images_by_id:
                 multi_task_image_manifest = ImageDataManifest(image.id, image.img_path, image.width, image.height, {task_name: image.labels})
                 images_by_id[image.id] = multi_task_image_manifest
@@ -24,3 +27,33 @@ def generate_multitask_dataset_manifest(manifest_by_task: Dict[str, DatasetManif
     additional_info_by_task = {k: manifest.additional_info for k, manifest in manifest_by_task.items() if manifest.additional_info}
 
     return DatasetManifest([v for v in images_by_id.values()], categories_by_task, dataset_types_by_task, addtional_info=additional_info_by_task)
+
+
+def build_category_incidence(manifest: DatasetManifest) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sparse incidence of images x categories in CSR layout, with one entry per label (e.g., per box), read from the label columns for ColumnarDatasetManifest. For multitask
+    manifests, categories of tasks are concatenated into blocks, in the order of manifest.categories.
+
+    Returns:
+        label_offsets (int64 array of length n_images + 1) and category_ids (int64 array), category ids of labels of image i being category_ids[label_offsets[i]: label_offsets[i + 1]]
+    """
+
+    if isinstance(manifest, ColumnarDatasetManifest):
+        return manifest.label_offsets.astype(np.int64, copy=False), manifest.category_ids.astype(np.int64)
+
+    task_offsets = None
+    if manifest.is_multitask:
+        task_names = list(manifest.categories)
+        task_offsets = dict(zip(task_names, np.cumsum([0] + [len(manifest.categories[x] or []) for x in task_names]).tolist()))
+
+    label_offsets = [0]
+    category_ids = []
+    for image in manifest.peek_images():
+        if task_offsets is None:
+            category_ids.extend(label.category_id for label in image.labels)
+        else:
+            for task_name, labels in image.labels.items():
+                category_ids.extend(task_offsets[task_name] + label.category_id for label in labels)
+        label_offsets.append(len(category_ids))
+
+    return np.asarray(label_offsets, dtype=np.int64), np.asarray(category_ids, dtype=np.int64)
@@ -1,5 +1,12 @@
 from .dataset_downloader import DatasetDownloader, DownloadedDatasetsResources
 from .file_reader import FileReader
+from .image_cache import ImageCache
+from .image_decoder import ImageDecoder, ImageDecoderFactory
 from .image_loader import PILImageLoader
+from .image_size_prober import ImageSizeProber
+from .json_stream_reader import JsonObjectStreamReader
+from .line_indexed_file import LineIndexedFile
+from .storage_backend import HttpBackend, LocalFileBackend, LocalObjectStoreBackend, StorageBackend, StorageBackendFactory, ZipFileBackend
 
-__all__ = ['DatasetDownloader', 'DownloadedDatasetsResources', 'FileReader', 'PILImageLoader']
+__all__ = ['DatasetDownloader', 'DownloadedDatasetsResources', 'FileReader', 'PILImageLoader', 'ImageDecoder', 'ImageDecoderFactory', 'ImageCache', 'ImageSizeProber',
+           'JsonObjectStreamReader', 'LineIndexedFile', 'StorageBackend', 'StorageBackendFactory', 'LocalFileBackend', 'ZipFileBackend', 'HttpBackend', 'LocalObjectStoreBackend']
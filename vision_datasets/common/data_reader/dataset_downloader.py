@@ -1,15 +1,21 @@
+import base64
+import hashlib
 import logging
 import os
 import pathlib
 import re
 import shutil
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from urllib import parse as urlparse
 
 import azure.storage.blob
 import requests
 import tenacity
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
 from azure.core.exceptions import AzureError
 from azure.identity import DefaultAzureCredential
 
@@ -28,18 +34,94 @@ class AzureDownloader:
         self._container_client = azure.storage.blob.ContainerClient.from_container_url(container_url, credential=credential)
 
     @tenacity.retry(stop=tenacity.stop_after_attempt(3), retry=tenacity.retry_if_exception_type(AzureError), reraise=True)
-    def download(self, file_path, target_dir):
-        target_dir = pathlib.Path(target_dir)
-        (target_dir / file_path).parent.mkdir(parents=True, exist_ok=True)
-        stream = self._container_client.download_blob(file_path, max_concurrency=8, read_timeout=1800)
-        with open((target_dir / file_path), 'wb') as f:
-            stream.readinto(f)
+    def download(self, file_path, target_dir, max_concurrency=8, progress=None):
+        """
+        Download to a .part file first, resuming from the existing .part file if any, and verify the MD5 checksum of the blob, if any, before renaming it to the target file.
+
+        Args:
+            file_path (str): path of the blob in the container, and of the file in target_dir
+            target_dir (str or pathlib.Path): dir where the file is downloaded
+            max_concurrency (int): max number of connections downloading ranges of the blob in parallel
+            progress (_ByteProgress): progress the bytes downloaded are added to, if provided
+        """
+        target_file_path = pathlib.Path(target_dir) / file_path
+        target_file_path.parent.mkdir(parents=True, exist_ok=True)
+        part_file_path = target_file_path.with_name(target_file_path.name + DatasetDownloader.PART_FILE_SUFFIX)
+        properties = self._container_client.get_blob_client(file_path).get_blob_properties()
+        n_existing_bytes = part_file_path.stat().st_size if part_file_path.exists() else 0
+        if n_existing_bytes > properties.size:
+            n_existing_bytes = 0
+        if progress:
+            progress.add(properties.size, n_existing_bytes)
+
+        if n_existing_bytes < properties.size:
+            n_reported_bytes = 0
+
+            def progress_hook(n_bytes, _):
+                nonlocal n_reported_bytes
+                if progress:
+                    progress.update(n_bytes - n_reported_bytes)
+                n_reported_bytes = n_bytes
+
+            kwargs = {'offset': n_existing_bytes} if n_existing_bytes else {}
+            stream = self._container_client.download_blob(file_path, max_concurrency=max_concurrency, read_timeout=1800, progress_hook=progress_hook, **kwargs)
+            with open(part_file_path, 'r+b' if n_existing_bytes else 'wb') as f:
+                f.seek(n_existing_bytes)
+                writer = _ContiguousWriter(f)
+                try:
+                    stream.readinto(writer)
+                except BaseException:
+                    # ranges are written out of order in parallel, so only the part before the first missing range is kept for resuming
+                    f.truncate(writer.contiguous_end)
+                    raise
+
+        expected_md5 = properties.content_settings.content_md5
+        if expected_md5:
+            md5 = hashlib.md5()
+            with open(part_file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(DatasetDownloader.CHUNK_SIZE), b''):
+                    md5.update(chunk)
+            if md5.digest() != bytes(expected_md5):
+                part_file_path.unlink()
+                raise ValueError(f'MD5 checksum mismatch for blob {file_path}.')
+
+        os.replace(part_file_path, target_file_path)
 
     @staticmethod
     def is_azure_blob_url(url):
         return 'blob.core.windows.net' in url
 
 
+class _ContiguousWriter:
+    """Seekable writer over a file, keeping track of the end of the bytes written contiguously from the initial position, as ranges can be written out of order."""
+
+    def __init__(self, f):
+        self._f = f
+        self.contiguous_end = f.tell()
+        # start => end of the ranges written after a missing range
+        self._pending = {}
+
+    def write(self, data):
+        start = self._f.tell()
+        n_bytes = self._f.write(data)
+        if start == self.contiguous_end:
+            self.contiguous_end = start + n_bytes
+            while self.contiguous_end in self._pending:
+                self.contiguous_end = self._pending.pop(self.contiguous_end)
+        elif start > self.contiguous_end:
+            self._pending[start] = start + n_bytes
+        return n_bytes
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    def seekable(self):
+        return True
+
+
 class DownloadedDatasetsResources:
     """Wrapper class to make sure the temporary directory is removed."""
 
@@ -64,15 +146,29 @@ class DownloadedDatasetsResources:
 
 
 class DatasetDownloader:
-    def __init__(self, dataset_sas_url: str, dataset_info: BaseDatasetInfo):
+    CHUNK_SIZE = 4194304
+    PART_FILE_SUFFIX = '.part'
+
+    def __init__(self, dataset_sas_url: str, dataset_info: BaseDatasetInfo, max_concurrency: int = 8):
+        """
+        Args:
+            dataset_sas_url (str): url (with sas) to the container or folder of the dataset
+            dataset_info (BaseDatasetInfo): dataset info
+            max_concurrency (int): max number of concurrent connections in total, shared by all files being downloaded
+        """
         if not dataset_info:
             raise ValueError
 
         if not can_be_url(dataset_sas_url):
             raise ValueError('An url to the dataset should be provided.')
 
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be greater than 0.')
+
         self._base_url = dataset_sas_url
         self._dataset_info = dataset_info
+        self._max_concurrency = max_concurrency
+        self._session = None
 
     def download(self, target_dir: str = None, purposes=[Usages.TRAIN, Usages.VAL, Usages.TEST]):
         if not purposes:
@@ -122,6 +218,7 @@ class DatasetDownloader:
         parts = urlparse.urlparse(self._base_url)
 
         azure_downloader = AzureDownloader(self._base_url) if AzureDownloader.is_azure_blob_url(self._base_url) else None
+        tasks = []
         for file_path in file_paths:
             path = os.path.join(parts[2], file_path).replace('\\', '/')
             url = urlparse.urlunparse((parts[0], parts[1], path, parts[3], parts[4], parts[5]))
@@ -132,20 +229,119 @@ class DatasetDownloader:
                 logger.info(f'{target_file_path} exists. Skip downloading.')
                 continue
 
+            tasks.append((file_path, url, target_file_path))
+
+        if not tasks:
+            return
+
+        n_workers = min(self._max_concurrency, len(tasks))
+        # connections of a single blob download are bounded, so that the total stays within max_concurrency
+        blob_concurrency = max(1, self._max_concurrency // n_workers)
+        progress = _ByteProgress(len(tasks))
+
+        def download(task):
+            file_path, url, target_file_path = task
             if AzureDownloader.is_azure_blob_url(url):
                 try:
                     logger.info('Detected the URL is from Azure blob.')
-                    azure_downloader.download(file_path.as_posix(), target_dir)
+                    azure_downloader.download(pathlib.Path(file_path).as_posix(), target_dir, blob_concurrency, progress)
+                    progress.file_done()
+                    return
                 except Exception as e:
-                    logger.warn(f'Azure downloading fails {e}. Fallback to regular download.')
-                    self._download_file(url, target_file_path)
-            else:
-                self._download_file(url, target_file_path)
+                    logger.warning(f'Azure downloading fails {e}. Fallback to regular download.')
+            self._download_file(url, target_file_path, progress)
+            progress.file_done()
 
-    @tenacity.retry(stop=tenacity.stop_after_attempt(3))
-    def _download_file(self, url: str, filepath: pathlib.Path):
+        try:
+            if n_workers == 1:
+                download(tasks[0])
+            else:
+                with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                    for _ in executor.map(download, tasks):
+                        pass
+        finally:
+            progress.close()
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            # connections to the same host are reused across files
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self._max_concurrency, pool_maxsize=self._max_concurrency)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    @tenacity.retry(stop=tenacity.stop_after_attempt(3), reraise=True)
+    def _download_file(self, url: str, filepath: pathlib.Path, progress=None):
+        """
+        Download to a .part file first, resuming from the existing .part file with a range request if any, and verify the MD5 checksum provided by the server, if any.
+        """
         logger.info(f'Downloading from {url} to {filepath.absolute()}.')
-        with requests.get(url, stream=True, allow_redirects=True, timeout=60) as r:
+        part_filepath = filepath.with_name(filepath.name + self.PART_FILE_SUFFIX)
+        n_existing_bytes = part_filepath.stat().st_size if part_filepath.exists() else 0
+        kwargs = {'headers': {'Range': f'bytes={n_existing_bytes}-'}} if n_existing_bytes else {}
+
+        with self._get_session().get(url, stream=True, allow_redirects=True, timeout=60, **kwargs) as r:
+            if r.status_code == 416:
+                # range not satisfiable, the .part file is not a prefix of the file
+                part_filepath.unlink()
+                raise ValueError(f'Invalid partial download of {url}, restarting.')
             r.raise_for_status()
-            with open(filepath, 'wb') as f:
-                shutil.copyfileobj(r.raw, f, length=4194304)
+
+            resumed = n_existing_bytes > 0 and r.status_code == 206
+            if not resumed:
+                n_existing_bytes = 0
+            content_length = r.headers.get('Content-Length')
+            if progress:
+                progress.add(n_existing_bytes + int(content_length) if content_length else 0, n_existing_bytes)
+
+            # Content-MD5 of a range response is about the range only
+            expected_md5 = r.headers.get('x-ms-blob-content-md5') or (None if resumed else r.headers.get('Content-MD5'))
+            md5 = hashlib.md5() if expected_md5 else None
+            with open(part_filepath, 'ab' if resumed else 'wb') as f:
+                if resumed and md5:
+                    with open(part_filepath, 'rb') as existing:
+                        for chunk in iter(lambda: existing.read(self.CHUNK_SIZE), b''):
+                            md5.update(chunk)
+                for chunk in iter(lambda: r.raw.read(self.CHUNK_SIZE), b''):
+                    f.write(chunk)
+                    if md5:
+                        md5.update(chunk)
+                    if progress:
+                        progress.update(len(chunk))
+
+        if md5 and base64.b64encode(md5.digest()).decode('ascii') != expected_md5:
+            part_filepath.unlink()
+            raise ValueError(f'MD5 checksum mismatch for {url}.')
+
+        os.replace(part_filepath, filepath)
+
+
+class _ByteProgress:
+    """Thread-safe progress bar over the total bytes of all files, with total growing as the sizes of files get known."""
+
+    def __init__(self, n_files):
+        self._lock = threading.Lock()
+        self._n_files = n_files
+        self._n_files_done = 0
+        self._bar = tqdm(total=0, unit='B', unit_scale=True, unit_divisor=1024, desc=self._desc())
+
+    def add(self, n_total_bytes, n_done_bytes):
+        with self._lock:
+            self._bar.total += n_total_bytes
+            self._bar.update(n_done_bytes)
+
+    def update(self, n_bytes):
+        with self._lock:
+            self._bar.update(n_bytes)
+
+    def file_done(self):
+        with self._lock:
+            self._n_files_done += 1
+            self._bar.set_description(self._desc(), refresh=True)
+
+    def close(self):
+        self._bar.close()
+
+    def _desc(self):
+        return f'Downloading files ({self._n_files_done}/{self._n_files})'
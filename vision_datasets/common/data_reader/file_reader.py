@@ -1,36 +1,10 @@
-import os
 import pathlib
-import zipfile
+import threading
 from typing import Union
-from urllib.parse import quote
-from urllib.request import urlopen
 
-from ..utils import can_be_url
-
-
-class MultiProcessZipFile:
-    """ZipFile which is readable from multi processes"""
-
-    def __init__(self, filename):
-        self.filename = filename
-        self.zipfiles = {}
-
-    def open(self, file):
-        if os.getpid() not in self.zipfiles:
-            self.zipfiles[os.getpid()] = zipfile.ZipFile(self.filename)
-        return self.zipfiles[os.getpid()].open(file)
-
-    def close(self):
-        for z in self.zipfiles.values():
-            z.close()
-        self.zipfiles = {}
-
-    def __getstate__(self):
-        return {'filename': self.filename}
-
-    def __setstate__(self, state):
-        self.filename = state['filename']
-        self.zipfiles = {}
+from .storage_backend import HttpBackend, StorageBackendFactory, ZipFileBackend
+# re-exported, as MultiProcessZipFile used to be defined here
+from .zip_file import MultiProcessZipFile  # noqa: F401
 
 
 class FileReader:
@@ -38,32 +12,52 @@ class FileReader:
      1. <zip_filename>@<file_name>
      2. url
      3. regular file name
+
+     Files are opened by the storage backend registered for their paths in StorageBackendFactory, e.g., ZipFileBackend for 1, HttpBackend for http(s) urls and
+     LocalFileBackend for 3. More backends, e.g., for other url schemes, can be registered with StorageBackendFactory.register.
+
+     Files can be opened by multiple threads concurrently.
      """
 
     def __init__(self):
-        self.zip_files = {}
+        self._backends = {}
+        self._lock = threading.Lock()
 
     def open(self, name: Union[pathlib.Path, str], mode='r', encoding=None):
         name = str(name)
-        # read file from url
-        if can_be_url(name):
-            return urlopen(self._encode_non_ascii(name))
+        backend_class = StorageBackendFactory.get_backend_class(name)
+        backend = self._backends.get(backend_class)
+        if backend is None:
+            with self._lock:
+                backend = self._backends.get(backend_class)
+                if backend is None:
+                    backend = self._backends[backend_class] = backend_class()
+        return backend.open(name, mode, encoding)
+
+    @property
+    def zip_files(self) -> dict:
+        """
+        MultiProcessZipFile by path of the local zip files opened, i.e., the ones of ZipFileBackend
+        """
+        backend = self._backends.get(ZipFileBackend)
+        return backend.zip_files if backend is not None else {}
 
-        # read file from local zip: <zip_filename>@<entry_name>, e.g. images.zip@1.jpg
-        if '@' in name:
-            zip_path, file_path = name.split('@', 1)
-            if zip_path not in self.zip_files:
-                self.zip_files[zip_path] = MultiProcessZipFile(zip_path)
-            return self.zip_files[zip_path].open(file_path)
+    def close(self):
+        with self._lock:
+            backends, self._backends = self._backends, {}
+        for backend in backends.values():
+            backend.close()
 
-        # read file from local dir
-        return open(name, mode, encoding=encoding)
+    def __getstate__(self):
+        return {'_backends': self._backends}
 
-    def close(self):
-        for zip_file in self.zip_files.values():
-            zip_file.close()
-        self.zip_files = {}
+    def __setstate__(self, state):
+        self._backends = state['_backends']
+        self._lock = threading.Lock()
 
     @staticmethod
-    def _encode_non_ascii(s):
-        return ''.join([c if ord(c) < 128 else quote(c) for c in s])
+    def set_http_pool_size(pool_size: int):
+        """
+        Set the max number of pooled connections per host for reading urls, e.g., to match the number of threads reading concurrently
+        """
+        HttpBackend.set_pool_size(pool_size)
@@ -0,0 +1,233 @@
+import collections
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import tempfile
+import threading
+import typing
+
+import numpy as np
+from PIL import Image
+
+from .image_loader import PILImageLoader
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """
+    Cache of decoded images, with an in-memory LRU tier bounded by bytes, and an optional on-disk tier.
+
+    Images are kept as raw pixel buffers, so that a hit skips reading, decoding, EXIF transposing and color conversion. Images returned are read-only views of the cached buffers;
+    PIL copies the pixels before any in-place modification, so cached images are never modified.
+
+    The disk tier stores one file per image, which is memory-mapped on access, so that the same image cached by one dataloader worker is shared through the page cache by the
+    others. Files are used instead of a single shared file with an offset index: each file is written to a temp file and renamed into place, so that processes write concurrently
+    without cross-process locks and readers never see a partial entry, and evicting an image frees its space without compacting a shared file.
+
+    Disk files are evicted by least recent access when the total size exceeds max_disk_bytes, from an in-memory index of the files and their sizes in LRU order, built from
+    the dir once per process (ordered by modification time, which is updated on access) and kept up to date with the files this process writes and reads, so that the dir
+    is not listed on writes. Files written by other processes since are accounted once read.
+    """
+
+    _HEADER_SIZE_FORMAT = '<I'
+    _DISK_FILE_SUFFIX = '.img'
+
+    def __init__(self, max_memory_bytes: int = 1 << 30, disk_dir: typing.Union[str, pathlib.Path] = None, max_disk_bytes: int = None):
+        """
+        Args:
+            max_memory_bytes (int): max total size of the pixel buffers cached in memory, per process. 0 to disable the memory tier.
+            disk_dir (str or pathlib.Path): local dir for the disk tier, which can be shared by processes. None to disable the disk tier.
+            max_disk_bytes (int): max total size of the files in disk_dir, unlimited if None
+        """
+        if max_memory_bytes < 0:
+            raise ValueError('max_memory_bytes must be non-negative.')
+        if max_disk_bytes is not None and max_disk_bytes < 0:
+            raise ValueError('max_disk_bytes must be non-negative.')
+
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = pathlib.Path(disk_dir) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._init_state()
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        # file name => size of the disk files known to this process in LRU order, built on first use for eviction
+        self._disk_index = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'memory_bytes': self._memory_bytes, 'memory_items': len(self._memory)}
+
+    def get(self, key: str) -> typing.Optional[Image.Image]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._to_image(*entry)
+
+        entry = self._read_from_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_in_memory(key, entry)
+
+        return self._to_image(*entry)
+
+    def put(self, key: str, image: Image.Image):
+        meta = {'mode': image.mode, 'size': image.size, 'format': image.format}
+        if PILImageLoader.ORIGINAL_SIZE_INFO_KEY in image.info:
+            # size before a reduced decode, which boxes are scaled from (see PILImageLoader.get_original_size)
+            meta[PILImageLoader.ORIGINAL_SIZE_INFO_KEY] = image.info[PILImageLoader.ORIGINAL_SIZE_INFO_KEY]
+        entry = (meta, np.frombuffer(image.tobytes('raw', image.mode), dtype=np.uint8))
+        with self._lock:
+            self._put_in_memory(key, entry)
+        self._write_to_disk(key, entry)
+
+    def get_or_load(self, key: str, load_func: typing.Callable[[], Image.Image]) -> Image.Image:
+        image = self.get(key)
+        if image is None:
+            image = load_func()
+            self.put(key, image)
+        return image
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _put_in_memory(self, key, entry):
+        n_bytes = entry[1].nbytes
+        if n_bytes > self.max_memory_bytes:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1].nbytes
+        self._memory[key] = entry
+        self._memory_bytes += n_bytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    @staticmethod
+    def _to_image(meta, pixels):
+        image = Image.frombuffer(meta['mode'], tuple(meta['size']), pixels, 'raw', meta['mode'], 0, 1)
+        image.format = meta['format']
+        if PILImageLoader.ORIGINAL_SIZE_INFO_KEY in meta:
+            image.info[PILImageLoader.ORIGINAL_SIZE_INFO_KEY] = tuple(meta[PILImageLoader.ORIGINAL_SIZE_INFO_KEY])
+        return image
+
+    def _disk_path(self, key):
+        return self.disk_dir / (hashlib.sha1(key.encode('utf-8')).hexdigest() + self._DISK_FILE_SUFFIX)
+
+    def _read_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header_size = struct.unpack_from(self._HEADER_SIZE_FORMAT, mm)[0]
+            offset = struct.calcsize(self._HEADER_SIZE_FORMAT)
+            meta = json.loads(mm[offset:offset + header_size].decode('utf-8'))
+            if meta.get('key') != key:
+                # hash collision
+                return None
+            pixels = np.frombuffer(mm, dtype=np.uint8, offset=offset + header_size)
+            os.utime(path)  # access time for eviction by other processes, as atime is not reliable
+            self._touch_disk_index(path.name, len(mm))
+            return meta, pixels
+        except FileNotFoundError:
+            self._touch_disk_index(path.name, None)
+            return None
+        except Exception as e:
+            logger.warning(f'Failed to read cached image {path}: {e}')
+            return None
+
+    def _write_to_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+
+        meta, pixels = entry
+        if self.max_disk_bytes is not None and pixels.nbytes > self.max_disk_bytes:
+            return
+
+        header = json.dumps({**meta, 'key': key}).encode('utf-8')
+        path = self._disk_path(key)
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(struct.pack(self._HEADER_SIZE_FORMAT, len(header)))
+                    f.write(header)
+                    f.write(pixels.data)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError as e:
+            logger.warning(f'Failed to write cached image {path}: {e}')
+            return
+
+        self._touch_disk_index(path.name, struct.calcsize(self._HEADER_SIZE_FORMAT) + len(header) + pixels.nbytes, evict=True)
+
+    def _touch_disk_index(self, name, size, evict=False):
+        """Record the access of a disk file of size, or its removal if size is None, and evict the least recently accessed files if evict"""
+        if self.max_disk_bytes is None:
+            return
+
+        with self._lock:
+            if self._disk_index is None:
+                self._disk_index = self._list_disk_files()
+                self._disk_bytes = sum(self._disk_index.values())
+
+            if name in self._disk_index:
+                self._disk_bytes -= self._disk_index.pop(name)
+            if size is not None:
+                self._disk_index[name] = size
+                self._disk_bytes += size
+
+            while evict and self._disk_bytes > self.max_disk_bytes and len(self._disk_index) > 1:
+                evicted_name, evicted_size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= evicted_size
+                try:
+                    (self.disk_dir / evicted_name).unlink()
+                except OSError:
+                    # e.g., evicted by another process
+                    pass
+
+    def _list_disk_files(self):
+        files = []
+        for path in self.disk_dir.glob(f'*{self._DISK_FILE_SUFFIX}'):
+            try:
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name, stat.st_size))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        return collections.OrderedDict((name, size) for _, name, size in files)
+
+    def __getstate__(self):
+        # in-memory entries are not shared with other processes, e.g., dataloader workers
+        return {'max_memory_bytes': self.max_memory_bytes, 'disk_dir': self.disk_dir, 'max_disk_bytes': self.max_disk_bytes}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
@@ -0,0 +1,159 @@
+import logging
+import threading
+import typing
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDecoder(ABC):
+    """
+    Decoder of compressed images into RGB arrays, accelerating PILImageLoader for the formats it supports. PIL is the baseline, used for the formats no available decoder supports.
+
+    Only 8-bit images which PIL loads as 'RGB' or 'L' are decoded by accelerated decoders, so that the loaded images are the same as the ones decoded by PIL.
+    """
+
+    NAME = None
+    PRIORITY = 0
+    FORMATS = ()
+    # formats decodable at 1/2, 1/4 or 1/8 scale while decoding, like PIL Image.draft for JPEG
+    REDUCIBLE_FORMATS = ()
+
+    @staticmethod
+    @abstractmethod
+    def is_available() -> bool:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes, img_format: str, reduction: int = 1) -> np.ndarray:
+        """
+        Args:
+            data (bytes): compressed image
+            img_format (str): PIL format name of the image, one of FORMATS
+            reduction (int): 1, 2, 4 or 8, scale down by this factor while decoding, only for REDUCIBLE_FORMATS
+
+        Returns:
+            uint8 array of shape (height, width, 3) in RGB, ignoring EXIF orientation
+        """
+        pass
+
+
+class ImageDecoderFactory:
+    """
+    Registry of accelerated image decoders, by name. For each format, the available decoder of the highest priority is used, unless a decoder is specified by name.
+    """
+
+    PIL = 'pil'
+    _mapping = {}
+    _instances = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, name: str, priority: int = 0):
+        def decorator(klass):
+            klass.NAME = name
+            klass.PRIORITY = priority
+            cls._mapping[name] = klass
+            return klass
+        return decorator
+
+    @classmethod
+    def list_available(cls) -> typing.List[str]:
+        """Names of the available decoders, from the highest priority, with PIL being the last"""
+        names = sorted((name for name, klass in cls._mapping.items() if cls._get_instance(name) is not None), key=lambda x: -cls._mapping[x].PRIORITY)
+        return names + [cls.PIL]
+
+    @classmethod
+    def get_decoder(cls, img_format: str, name: str = None) -> typing.Optional[ImageDecoder]:
+        """
+        Decoder of the format, or None if PIL should be used
+
+        Args:
+            img_format (str): PIL format name, e.g., 'JPEG'
+            name (str): name of the decoder to use, the fastest available one if not provided, PIL if 'pil' or if the decoder does not support the format
+        """
+
+        if name == cls.PIL:
+            return None
+
+        if name is not None:
+            if name not in cls._mapping:
+                raise ValueError(f'Unknown image decoder {name}, registered ones: {list(cls._mapping)}')
+            decoder = cls._get_instance(name)
+            if decoder is None:
+                raise ValueError(f'Image decoder {name} is not available.')
+            return decoder if img_format in decoder.FORMATS else None
+
+        for name in cls.list_available()[:-1]:
+            decoder = cls._get_instance(name)
+            if img_format in decoder.FORMATS:
+                return decoder
+        return None
+
+    @classmethod
+    def _get_instance(cls, name):
+        if name not in cls._instances:
+            with cls._lock:
+                if name not in cls._instances:
+                    klass = cls._mapping[name]
+                    instance = None
+                    try:
+                        instance = klass() if klass.is_available() else None
+                    except Exception as e:
+                        logger.warning(f'Image decoder {name} is installed but failed to initialize: {e}')
+                    cls._instances[name] = instance
+        return cls._instances[name]
+
+
+@ImageDecoderFactory.register('turbojpeg', priority=20)
+class TurboJpegDecoder(ImageDecoder):
+    """JPEG decoder with libjpeg-turbo through PyTurboJPEG (pip install PyTurboJPEG)"""
+
+    FORMATS = ('JPEG',)
+    REDUCIBLE_FORMATS = ('JPEG',)
+
+    def __init__(self):
+        from turbojpeg import TJPF_RGB, TurboJPEG
+        self._turbo_jpeg = TurboJPEG()
+        self._pixel_format = TJPF_RGB
+
+    @staticmethod
+    def is_available():
+        try:
+            import turbojpeg  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def decode(self, data: bytes, img_format: str, reduction: int = 1) -> np.ndarray:
+        return self._turbo_jpeg.decode(data, pixel_format=self._pixel_format, scaling_factor=(1, reduction) if reduction > 1 else None)
+
+
+@ImageDecoderFactory.register('opencv', priority=10)
+class OpenCVDecoder(ImageDecoder):
+    """JPEG and PNG decoder with OpenCV (pip install opencv-python-headless)"""
+
+    FORMATS = ('JPEG', 'PNG')
+    REDUCIBLE_FORMATS = ('JPEG',)
+
+    def __init__(self):
+        import cv2
+        self._cv2 = cv2
+        self._flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+    @staticmethod
+    def is_available():
+        try:
+            import cv2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def decode(self, data: bytes, img_format: str, reduction: int = 1) -> np.ndarray:
+        # EXIF orientation is handled by PILImageLoader as for PIL
+        image = self._cv2.imdecode(np.frombuffer(data, dtype=np.uint8), self._flags[reduction] | self._cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is None:
+            raise ValueError(f'Failed to decode {img_format} image with OpenCV.')
+        return self._cv2.cvtColor(image, self._cv2.COLOR_BGR2RGB)
@@ -1,7 +1,12 @@
+import io
 import logging
+import math
+import typing
 
 from PIL import Image
 
+from .image_decoder import ImageDecoder, ImageDecoderFactory
+
 logger = logging.getLogger(__name__)
 
 # see https://exiv2.org/tags.html
@@ -11,8 +16,29 @@ ORIENTATION_EXIF_TAG = 0x0112
 class PILImageLoader:
     """Load PIL image and fix image orientation using EXIF"""
 
+    ORIGINAL_SIZE_INFO_KEY = 'original_size'
+    # name of the ImageDecoder used by default, e.g., the fastest one benchmarked on a node, see the vision_benchmark_decoders command
+    DECODER = None
+
     @staticmethod
-    def load_from_stream(f):
+    def load_from_stream(f, target_size: typing.Union[int, typing.Tuple[int, int]] = None, decoder: str = None):
+        """
+        Args:
+            f: binary stream of the image
+            target_size (int or tuple): longest edge, or (width, height), that the image is going to be resized to. If provided, the image is decoded at a reduced size, not smaller
+                than the target size, e.g., with DCT-domain downscaling of JPEG, which is much faster than decoding at full resolution and resizing. The size of the image before
+                reduction is in image.info[ORIGINAL_SIZE_INFO_KEY], see get_original_size
+            decoder (str): name of the ImageDecoder to decode the image with if it supports the format, 'pil' for PIL. If not provided, the fastest available decoder supporting
+                the format is used, see ImageDecoderFactory
+        """
+
+        decoder = decoder or PILImageLoader.DECODER
+        data = None
+        if decoder != ImageDecoderFactory.PIL and (decoder is not None or len(ImageDecoderFactory.list_available()) > 1):
+            # headers and EXIF are still parsed by PIL
+            data = f.read()
+            f = io.BytesIO(data)
+
         image = Image.open(f)
         img_format = image.format
 
@@ -23,9 +49,19 @@ class PILImageLoader:
             exif = None
 
         orientation = exif.get(ORIENTATION_EXIF_TAG) if exif else None
+        # orientation is 1 based, shift to zero based and flip/transpose based on 0-based values
+        orientation = orientation - 1 if orientation else None
+        transposed = orientation is not None and orientation >= 4
+        original_size = image.size[::-1] if transposed else image.size
+        min_size = PILImageLoader._get_min_size(image.size, target_size, transposed) if target_size else None
+
+        image_decoder = ImageDecoderFactory.get_decoder(img_format, decoder) if data is not None and image.mode in ('RGB', 'L') else None
+        if image_decoder is not None:
+            image = PILImageLoader._decode(image_decoder, data, image, min_size)
+        elif min_size:
+            image = PILImageLoader._reduce(image, min_size)
+
         if orientation:
-            # orientation is 1 based, shift to zero based and flip/transpose based on 0-based values
-            orientation -= 1
             if orientation >= 4:
                 image = image.transpose(Image.TRANSPOSE)
             if orientation == 2 or orientation == 3 or orientation == 6 or orientation == 7:
@@ -36,8 +72,53 @@ class PILImageLoader:
         if image.mode != "I" and image.mode != "F":
             image = image.convert('RGB')
         image.format = img_format
+        if target_size:
+            image.info[PILImageLoader.ORIGINAL_SIZE_INFO_KEY] = original_size
         return image
 
+    @staticmethod
+    def get_original_size(image: Image.Image) -> typing.Tuple[int, int]:
+        """Size of the image before being reduced to the target size on load, for scaling boxes consistently"""
+        return tuple(image.info.get(PILImageLoader.ORIGINAL_SIZE_INFO_KEY, image.size))
+
+    @staticmethod
+    def _get_min_size(size, target_size, transposed):
+        w, h = size
+        if isinstance(target_size, int):
+            scale = target_size / max(w, h)
+            return max(1, math.ceil(w * scale)), max(1, math.ceil(h * scale))
+        return tuple(target_size[::-1]) if transposed else tuple(target_size)
+
+    @staticmethod
+    def _reduce(image: Image.Image, min_size):
+        min_w, min_h = min_size
+        if min_w >= image.size[0] or min_h >= image.size[1]:
+            return image
+
+        if image.format == 'JPEG':
+            # scales by 1/2, 1/4 or 1/8 while decoding, keeping the size not smaller than requested
+            image.draft(image.mode, (min_w, min_h))
+
+        if image.mode in ('P', '1'):
+            image = image.convert('RGB')
+        factor = min(image.size[0] // min_w, image.size[1] // min_h)
+        if factor >= 2:
+            image = image.reduce(factor)
+        return image
+
+    @staticmethod
+    def _decode(image_decoder: ImageDecoder, data: bytes, image: Image.Image, min_size):
+        reduction = 1
+        if min_size and image.format in image_decoder.REDUCIBLE_FORMATS:
+            # same scale as Image.draft
+            scale = min(image.size[0] // min_size[0], image.size[1] // min_size[1])
+            reduction = next(x for x in (8, 4, 2, 1) if x <= max(scale, 1))
+
+        decoded = Image.fromarray(image_decoder.decode(data, image.format, reduction))
+        decoded.info.update(image.info)
+        image.close()
+        return PILImageLoader._reduce(decoded, min_size) if min_size else decoded
+
     @staticmethod
     def load_from_file(filepath):
         try:
@@ -0,0 +1,149 @@
+import io
+import logging
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+from .file_reader import FileReader
+from .image_loader import ORIENTATION_EXIF_TAG
+
+logger = logging.getLogger(__name__)
+
+
+class ImageSizeProber:
+    """
+    Get image sizes by reading image headers only, without decoding the pixels.
+
+    Sizes are the same as the ones of images loaded by PILImageLoader, i.e., width and height are swapped if the EXIF orientation transposes the image.
+    """
+
+    # for non-seekable streams, e.g., url streams, the header is searched in a prefix of the stream, growing from INITIAL_READ_SIZE up to MAX_READ_SIZE
+    INITIAL_READ_SIZE = 64 * 1024
+    MAX_READ_SIZE = 16 * 1024 * 1024
+
+    @staticmethod
+    def probe_from_stream(f) -> typing.Tuple[int, int]:
+        """
+        Args:
+            f: binary stream of an image file
+
+        Returns:
+            (width, height) of the image after applying EXIF orientation
+        """
+
+        if ImageSizeProber._is_seekable(f):
+            return ImageSizeProber._probe(f)
+
+        prefix = b''
+        read_size = ImageSizeProber.INITIAL_READ_SIZE
+        while True:
+            data = f.read(read_size - len(prefix))
+            prefix += data
+            try:
+                return ImageSizeProber._probe(io.BytesIO(prefix))
+            except Exception:
+                if not data or len(prefix) >= ImageSizeProber.MAX_READ_SIZE:
+                    raise
+            read_size = min(read_size * 4, ImageSizeProber.MAX_READ_SIZE)
+
+    @staticmethod
+    def probe_from_file(filepath) -> typing.Tuple[int, int]:
+        try:
+            with open(filepath, 'rb') as f:
+                return ImageSizeProber.probe_from_stream(f)
+        except Exception:
+            logger.exception(f'Failed to probe image size: {filepath}')
+            raise
+
+    @staticmethod
+    def fill_image_sizes(manifest, max_workers: int = 8, overwrite: bool = False):
+        """
+        Fill in width and height of the images in a manifest, in place, with a pool of threads probing the image headers
+
+        Args:
+            manifest (DatasetManifest or DatasetManifestWithMultiImageLabel): manifest whose images are either local files, files in zip, or urls
+            max_workers (int): number of threads probing image sizes in parallel
+            overwrite (bool): probe all images, instead of only the ones with width or height missing
+        """
+
+        from ..data_manifest import ColumnarDatasetManifest
+
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
+
+        columnar = isinstance(manifest, ColumnarDatasetManifest)
+        if columnar:
+            img_paths = manifest.img_paths
+            to_probe = np.arange(len(img_paths)) if overwrite else np.flatnonzero(np.isnan(manifest.widths) | np.isnan(manifest.heights))
+            # columns might be memory-mapped read-only
+            manifest.widths = np.array(manifest.widths)
+            manifest.heights = np.array(manifest.heights)
+        else:
+            images = manifest.images
+            img_paths = [x.img_path for x in images]
+            to_probe = [i for i, x in enumerate(images) if overwrite or not x.width or not x.height]
+
+        local = threading.local()
+        file_readers = []
+        lock = threading.Lock()
+
+        def probe(index):
+            if not hasattr(local, 'file_reader'):
+                local.file_reader = FileReader()
+                with lock:
+                    file_readers.append(local.file_reader)
+            img_path = img_paths[index]
+            try:
+                with local.file_reader.open(img_path, 'rb') as f:
+                    return index, ImageSizeProber.probe_from_stream(f)
+            except Exception:
+                logger.exception(f'Failed to probe image size: {img_path}')
+                raise
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for index, (w, h) in tqdm(executor.map(probe, to_probe), total=len(to_probe), desc='Probing image sizes...', disable=len(to_probe) == 0):
+                    if columnar:
+                        manifest.widths[index], manifest.heights[index] = w, h
+                    else:
+                        images[index].width, images[index].height = w, h
+        finally:
+            for file_reader in file_readers:
+                file_reader.close()
+
+    @staticmethod
+    def _probe(f):
+        # PIL reads only the header when opening an image, pixels are decoded on load()
+        with Image.open(f) as image:
+            w, h = image.size
+            orientation = ImageSizeProber._get_orientation(image)
+
+        # orientations 5-8 transpose the image
+        if orientation and orientation >= 5:
+            w, h = h, w
+        return w, h
+
+    @staticmethod
+    def _get_orientation(image):
+        if image.format == 'PNG' and 'exif' not in image.info:
+            # EXIF chunk of PNG after the image data is only available after decoding all the pixels, not worth it for probing
+            return None
+
+        try:
+            exif = image.getexif()
+        except Exception as e:
+            logger.warning(f'Failed to get EXIF from an image: {e}')
+            return None
+
+        return exif.get(ORIENTATION_EXIF_TAG) if exif else None
+
+    @staticmethod
+    def _is_seekable(f):
+        try:
+            return f.seekable()
+        except Exception:
+            return False
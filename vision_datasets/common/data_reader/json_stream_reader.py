@@ -0,0 +1,142 @@
+import codecs
+import json
+import typing
+
+_NUMBER_DELIMITERS = ' \t\n\r,]}'
+
+
+class JsonObjectStreamReader:
+    """
+    Incrementally read the top-level object of a json document from a text or binary stream, e.g., a local file or an url stream from FileReader.
+
+    Values of the top-level keys are decoded one by one, while arrays under the requested keys are decoded element by element, so that the document is never held in memory as a whole.
+    """
+
+    def __init__(self, stream, chunk_size: int = 1 << 20):
+        """
+        Args:
+            stream: text or binary (utf-8) stream supporting read(size)
+            chunk_size (int): number of characters/bytes read from the stream at a time
+        """
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be greater than zero.')
+
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._json_decoder = json.JSONDecoder()
+        self._bytes_decoder = None
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def iter_items(self, streamed_keys: typing.Iterable[str] = ()) -> typing.Generator:
+        """
+        Iterate through (key, value) of the top-level object, in the order they appear in the document.
+
+        Args:
+            streamed_keys: keys whose array values are yielded as generators of the array elements instead of lists. A generator is only valid until the next item is requested,
+                elements not consumed by then are skipped.
+        """
+
+        streamed_keys = set(streamed_keys)
+        if self._peek() != '{':
+            raise ValueError('Expecting a json object at the top level.')
+        self._pos += 1
+
+        first = True
+        while True:
+            c = self._peek()
+            if c == '}':
+                self._pos += 1
+                return
+
+            if not first:
+                self._expect(',')
+                self._peek()
+            first = False
+
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise ValueError(f'Expecting a string key, got {key}.')
+            self._peek()
+            self._expect(':')
+
+            if key in streamed_keys and self._peek() == '[':
+                self._pos += 1
+                elements = self._iter_array()
+                yield key, elements
+                for _ in elements:
+                    pass
+            else:
+                self._peek()
+                yield key, self._decode_value()
+
+    def _iter_array(self):
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            self._peek()
+            yield self._decode_value()
+            c = self._peek()
+            self._pos += 1
+            if c == ']':
+                return
+            if c != ',':
+                raise ValueError(f'Expecting "," or "]" at position {self._pos - 1} of the current buffer, got "{c}".')
+
+    def _decode_value(self):
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read_chunk():
+                    raise
+                continue
+
+            # a number is only complete when followed by a delimiter, e.g., "1" in buffer might be "1.5e3" with the next chunk
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and (end == len(self._buffer) or self._buffer[end] not in _NUMBER_DELIMITERS) \
+                    and self._read_chunk():
+                continue
+
+            self._pos = end
+            return value
+
+    def _peek(self) -> str:
+        """
+        Skip whitespaces and return the next character, '' if reaching the end of stream.
+        """
+
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\n\r\ufeff':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_chunk():
+                return ''
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f'Expecting "{char}", got "{self._peek()}".')
+        self._pos += 1
+
+    def _read_chunk(self) -> bool:
+        if self._eof:
+            return False
+
+        data = self._stream.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            if self._bytes_decoder:
+                self._bytes_decoder.decode(b'', final=True)  # raise on truncated utf-8 sequence
+            return False
+
+        if isinstance(data, bytes):
+            if self._bytes_decoder is None:
+                self._bytes_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            data = self._bytes_decoder.decode(data)
+
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import struct
+import tempfile
+import threading
+import typing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LineIndexedFile:
+    """
+    Random access to the lines of a text file, e.g., rows of a TSV or JSONL file, through an index of line offsets.
+
+    The index is built by scanning the file once, saved next to the file as <file>.lineidx (or in index_dir, falling back to FALLBACK_INDEX_DIR if the dir of the file is read-only),
+    and memory-mapped on later opens. It is rebuilt if the size or modification time of the file changes. Lines are read with one positional read on a file opened once per
+    process, so that they can be read from multiple threads and processes. Empty lines are skipped.
+    """
+
+    VERSION = 1
+    FALLBACK_INDEX_DIR = pathlib.Path(tempfile.gettempdir()) / 'vision_datasets_line_index'
+    _MAGIC = b'VDLIDX'
+    _UTF8_BOM = b'\xef\xbb\xbf'
+
+    def __init__(self, file_path: typing.Union[str, pathlib.Path], index_dir: typing.Union[str, pathlib.Path] = None, scanner=None):
+        """
+        Args:
+            file_path (str or pathlib.Path): path to the local file
+            index_dir (str or pathlib.Path): dir for the index file, next to the file if not provided
+            scanner: object with scan(line: bytes), called with each line when the index is built, e.g., to collect class names in one pass with indexing, and result(),
+                returning json-serializable metadata, which is saved with the index and available as self.metadata
+        """
+        self.file_path = pathlib.Path(file_path)
+        self.index_dir = index_dir
+        self.scanner = scanner
+        self._init_state()
+
+    def _init_state(self):
+        self._offsets, self.metadata = self._load_or_build()
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        if index < 0 or index >= len(self):
+            raise IndexError
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._read(start, end - start).rstrip()
+
+    def close(self):
+        f = self._files.pop(os.getpid(), None)
+        if f is not None:
+            f.close()
+        self._files = {}
+
+    def _read(self, offset, size):
+        pid = os.getpid()
+        f = self._files.get(pid)
+        if f is None:
+            with self._lock:
+                f = self._files.get(pid)
+                if f is None:
+                    f = open(self.file_path, 'rb')
+                    self._files[pid] = f
+
+        if hasattr(os, 'pread'):
+            return os.pread(f.fileno(), size, offset)
+
+        with self._lock:
+            f.seek(offset)
+            return f.read(size)
+
+    def _get_index_paths(self):
+        if self.index_dir:
+            return [self._get_index_path_in_dir(self.index_dir)]
+        return [self.file_path.with_name(self.file_path.name + '.lineidx'), self._get_index_path_in_dir(self.FALLBACK_INDEX_DIR)]
+
+    def _get_index_path_in_dir(self, index_dir):
+        path_hash = hashlib.sha1(str(self.file_path.absolute()).encode('utf-8')).hexdigest()[:16]
+        return pathlib.Path(index_dir) / f'{self.file_path.name}.{path_hash}.lineidx'
+
+    def _load_or_build(self):
+        stat = self.file_path.stat()
+        file_state = {'version': self.VERSION, 'file_size': stat.st_size, 'file_mtime_ns': stat.st_mtime_ns}
+        index_paths = self._get_index_paths()
+        for index_path in index_paths:
+            loaded = self._load(index_path, file_state)
+            if loaded is not None:
+                return loaded
+
+        logger.info(f'Building line index of {self.file_path}.')
+        offsets, metadata = self._build()
+        for index_path in index_paths:
+            if self._save(index_path, file_state, offsets, metadata):
+                break
+        else:
+            logger.warning(f'Failed to save line index of {self.file_path}, index will be rebuilt next time.')
+        return offsets, metadata
+
+    def _build(self):
+        # line i spans from starts[i] to starts[i + 1], empty lines in between are stripped on read
+        starts = []
+        end = 0
+        with open(self.file_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                content = line[len(self._UTF8_BOM):] if offset == 0 and line.startswith(self._UTF8_BOM) else line
+                start = offset + len(line) - len(content)
+                offset += len(line)
+                if not content.strip():
+                    continue
+                starts.append(start)
+                end = offset
+                if self.scanner:
+                    self.scanner.scan(content.rstrip())
+
+        offsets = np.array(starts + [end], dtype=np.int64) if starts else np.zeros(1, dtype=np.int64)
+        metadata = self.scanner.result() if self.scanner else None
+        return offsets, metadata
+
+    def _load(self, index_path, file_state):
+        try:
+            with open(index_path, 'rb') as f:
+                if f.read(len(self._MAGIC)) != self._MAGIC:
+                    return None
+                header_size = struct.unpack('<I', f.read(4))[0]
+                header = json.loads(f.read(header_size).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f'Failed to load line index {index_path}: {e}')
+            return None
+
+        if header.get('file_state') != file_state or (self.scanner and header.get('metadata') is None):
+            return None
+
+        offsets = np.memmap(index_path, dtype='<i8', mode='r', offset=len(self._MAGIC) + 4 + header_size, shape=(header['n_offsets'],))
+        return offsets, header.get('metadata')
+
+    def _save(self, index_path, file_state, offsets, metadata):
+        header = json.dumps({'file_state': file_state, 'n_offsets': len(offsets), 'metadata': metadata}).encode('utf-8')
+        # offsets start at an 8-byte aligned position
+        header += b' ' * (-(len(self._MAGIC) + 4 + len(header)) % 8)
+        temp_path = None
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=index_path.parent, prefix=f'.{index_path.name}.')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._MAGIC)
+                f.write(struct.pack('<I', len(header)))
+                f.write(header)
+                f.write(offsets.astype('<i8').tobytes())
+            os.replace(temp_path, index_path)
+            temp_path = None
+            return True
+        except OSError as e:
+            logger.info(f'Failed to save line index to {index_path}: {e}')
+            return False
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+
+    def __getstate__(self):
+        # the index is memory-mapped again instead of being copied to other processes
+        return {'file_path': self.file_path, 'index_dir': self.index_dir, 'scanner': None, 'metadata': self.metadata}
+
+    def __setstate__(self, state):
+        metadata = state.pop('metadata')
+        self.__dict__.update(state)
+        self._init_state()
+        self.metadata = metadata
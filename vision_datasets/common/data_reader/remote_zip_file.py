@@ -0,0 +1,172 @@
+import io
+import logging
+import re
+import struct
+import threading
+import typing
+import zipfile
+
+import requests
+
+from .zip_file import _decompress_entry_data
+
+logger = logging.getLogger(__name__)
+
+
+class _NotFetched(Exception):
+    def __init__(self, position):
+        super().__init__(f'Bytes from {position} are not fetched.')
+        self.position = position
+
+
+class _TailBuffer(io.RawIOBase):
+    """Seekable stream over the fetched bytes from offset to the end of a remote file, which is all a ZipFile reads to parse the central directory"""
+
+    def __init__(self, data: bytes, offset: int):
+        self._data = data
+        self._offset = offset
+        self._pos = offset + len(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._offset + len(self._data) + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+        if pos < 0:
+            raise OSError(f'Negative seek position {pos}')
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def readinto(self, b):
+        if self._pos < self._offset:
+            raise _NotFetched(self._pos)
+        start = self._pos - self._offset
+        n = max(0, min(len(b), len(self._data) - start))
+        b[:n] = self._data[start:start + n]
+        self._pos += n
+        return n
+
+
+class RemoteZipFile:
+    """
+    Zip file at a url supporting range requests, e.g., a blob, whose entries are read without downloading the zip.
+
+    The central directory is fetched on first access with a couple of range requests, one for the tail of the zip holding the end of central directory record, and one for the
+    rest of the central directory if it is larger than the tail, and cached in memory. Each entry is then read with a single range request of its local header and data,
+    plus LOCAL_HEADER_SLACK bytes for the extra field of the local header, which is not in the central directory. Stored and deflated entries are supported.
+    """
+
+    TAIL_SIZE = 64 * 1024
+    LOCAL_HEADER_SLACK = 1024
+    _LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+    _CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+    def __init__(self, url: str, get_session: typing.Callable[[], requests.Session], timeout=60):
+        """
+        Args:
+            url (str): url of the zip file, with sas token if needed
+            get_session (callable): returning the requests.Session to send requests with, e.g., HttpBackend.get_session
+            timeout (float): timeout of requests in seconds
+        """
+        self.url = url
+        self.get_session = get_session
+        self.timeout = timeout
+        self._init_state()
+
+    def _init_state(self):
+        self._infos = None
+        self._lock = threading.Lock()
+
+    def open(self, file) -> io.BytesIO:
+        return io.BytesIO(self.read(file))
+
+    def read(self, file) -> bytes:
+        info = self._get_infos().get(file)
+        if info is None:
+            raise KeyError(f'There is no item named {file!r} in the archive')
+        if info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise NotImplementedError(f'Reading encrypted or compression type {info.compress_type} entries from remote zip is not supported: {file}')
+
+        start = info.header_offset
+        expected_size = self._LOCAL_HEADER.size + len(info.orig_filename.encode('utf-8')) + len(info.extra) + info.compress_size + self.LOCAL_HEADER_SLACK
+        data, _, _ = self._fetch(start, start + expected_size - 1)
+        header = self._LOCAL_HEADER.unpack(data[:self._LOCAL_HEADER.size]) if len(data) >= self._LOCAL_HEADER.size else None
+        if header is None or header[0] != b'PK\x03\x04':
+            raise zipfile.BadZipFile(f'Bad local file header for {file} in {self.url}.')
+
+        data_start = self._LOCAL_HEADER.size + header[10] + header[11]
+        if len(data) < data_start + info.compress_size:
+            # local extra field larger than the slack
+            rest, _, _ = self._fetch(start + len(data), start + data_start + info.compress_size - 1)
+            data += rest
+        data = data[data_start:data_start + info.compress_size]
+        if len(data) != info.compress_size:
+            raise zipfile.BadZipFile(f'Truncated entry {file} in {self.url}.')
+        return _decompress_entry_data(data, info.compress_type, info.file_size, info.CRC, file)
+
+    def namelist(self) -> typing.List[str]:
+        return list(self._get_infos())
+
+    def _get_infos(self) -> typing.Dict[str, zipfile.ZipInfo]:
+        if self._infos is None:
+            with self._lock:
+                if self._infos is None:
+                    self._infos = self._fetch_central_directory()
+        return self._infos
+
+    def _fetch_central_directory(self):
+        logger.info(f'Fetching central directory of {self._get_url_without_query()}.')
+        data, offset, _ = self._fetch(None, None, tail_size=self.TAIL_SIZE)
+        while True:
+            try:
+                with zipfile.ZipFile(_TailBuffer(data, offset)) as zf:
+                    # for duplicated names, the last entry wins, as in ZipFile
+                    return {x.filename: x for x in zf.infolist()}
+            except _NotFetched as e:
+                if e.position >= offset:
+                    raise
+                head, _, _ = self._fetch(e.position, offset - 1)
+                data, offset = head + data, e.position
+
+    def _fetch(self, start, end, tail_size=None):
+        """Fetch bytes from start to end (inclusive), or the last tail_size bytes, returning the bytes, their offset in the file and the file size"""
+
+        byte_range = f'bytes=-{tail_size}' if tail_size else f'bytes={start}-{end}'
+        with self.get_session().get(self.url, headers={'Range': byte_range}, timeout=self.timeout) as response:
+            response.raise_for_status()
+            data = response.content
+
+        if response.status_code != 206:
+            # range not supported by the server, whole file returned
+            logger.warning(f'Range requests not supported for {self._get_url_without_query()}, whole file downloaded.')
+            if tail_size:
+                return data, 0, len(data)
+            return data[start:end + 1], start, len(data)
+
+        match = self._CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if match is None:
+            raise zipfile.BadZipFile(f'Invalid Content-Range of {self._get_url_without_query()}: {response.headers.get("Content-Range")}')
+        return data, int(match.group(1)), int(match.group(3))
+
+    def _get_url_without_query(self):
+        return self.url.split('?', 1)[0]
+
+    def __getstate__(self):
+        return {'url': self.url, 'get_session': self.get_session, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
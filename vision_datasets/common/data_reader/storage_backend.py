@@ -0,0 +1,267 @@
+import io
+import logging
+import os
+import pathlib
+import re
+import tempfile
+import threading
+import time
+import typing
+from abc import ABC, abstractmethod
+from urllib.parse import quote, unquote, urlparse, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..utils import can_be_url
+from .remote_zip_file import RemoteZipFile
+from .zip_file import MultiProcessZipFile
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """
+    Backend of FileReader, opening files whose paths it is registered for in StorageBackendFactory. A FileReader creates one instance of each backend it uses, which is closed
+    with the FileReader, and might be pickled to other processes. Backends are used by multiple threads, e.g., through BaseDataset.get_many, so state created lazily, e.g.,
+    per zip file, must be guarded by self._lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def open(self, name: str, mode='r', encoding=None):
+        pass
+
+    def close(self):
+        pass
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class StorageBackendFactory:
+    """
+    Registry of storage backends, keyed by url scheme (e.g., 'https') or by a regex pattern of paths (e.g., '@' for files in zip). Url schemes are checked first, then patterns,
+    with the latest registered pattern checked first, and local files are the fallback.
+    """
+
+    _scheme_mapping = {}
+    _pattern_mapping = []
+
+    @classmethod
+    def register(cls, schemes: typing.Iterable[str] = (), pattern: str = None):
+        def decorator(klass):
+            for scheme in schemes:
+                cls._scheme_mapping[scheme.lower()] = klass
+            if pattern is not None:
+                cls._pattern_mapping.insert(0, (re.compile(pattern), klass))
+            return klass
+        return decorator
+
+    @classmethod
+    def get_backend_class(cls, name: str) -> typing.Type[StorageBackend]:
+        if can_be_url(name):
+            klass = cls._scheme_mapping.get(urlparse(name).scheme.lower())
+            if klass is not None:
+                return klass
+
+        for pattern, klass in cls._pattern_mapping:
+            if pattern.search(name):
+                return klass
+
+        return LocalFileBackend
+
+
+class LocalFileBackend(StorageBackend):
+    def open(self, name: str, mode='r', encoding=None):
+        return open(name, mode, encoding=encoding)
+
+
+@StorageBackendFactory.register(pattern='@')
+class ZipFileBackend(StorageBackend):
+    """
+    Files in local zip: <zip_filename>@<entry_name>, e.g. images.zip@1.jpg
+
+    Entry indices of zip files are saved next to the zip files, or in INDEX_DIR if set. With USE_MMAP, stored entries of zip files are read from memory maps.
+    """
+
+    INDEX_DIR = None
+    USE_MMAP = False
+
+    def __init__(self):
+        super().__init__()
+        self.zip_files = {}
+
+    def open(self, name: str, mode='r', encoding=None):
+        zip_path, file_path = name.split('@', 1)
+        zip_file = self.zip_files.get(zip_path)
+        if zip_file is None:
+            with self._lock:
+                zip_file = self.zip_files.get(zip_path)
+                if zip_file is None:
+                    zip_file = self.zip_files[zip_path] = MultiProcessZipFile(zip_path, self.INDEX_DIR, self.USE_MMAP)
+        return zip_file.open(file_path)
+
+    def close(self):
+        for zip_file in self.zip_files.values():
+            zip_file.close()
+        self.zip_files = {}
+
+
+@StorageBackendFactory.register(schemes=['http', 'https'])
+class HttpBackend(StorageBackend):
+    """
+    Urls are read through a requests.Session shared by all readers in a process, so that connections to the same host are kept alive and reused, up to POOL_SIZE connections
+    per host.
+
+    Files in remote zip: <zip_url>@<entry_name>[?<sas>], e.g. https://account.blob.core.windows.net/container/images.zip@1.jpg?<sas>, are read with range requests of the
+    entries only, after fetching the central directory of the zip once per process (see RemoteZipFile). entry_name is percent-encoded, like the rest of the url path.
+    """
+
+    POOL_SIZE = 32
+    TIMEOUT = 60
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+    _ZIP_ENTRY_PATTERN = re.compile(r'\.zip@', re.IGNORECASE)
+
+    def __init__(self):
+        super().__init__()
+        self.zip_files = {}
+
+    def open(self, name: str, mode='r', encoding=None):
+        zip_url, entry_name = self._split_zip_entry_url(name)
+        if entry_name is not None:
+            zip_file = self.zip_files.get(zip_url)
+            if zip_file is None:
+                with self._lock:
+                    zip_file = self.zip_files.get(zip_url)
+                    if zip_file is None:
+                        zip_file = self.zip_files[zip_url] = RemoteZipFile(self._encode_non_ascii(zip_url), self.get_session, self.TIMEOUT)
+            return zip_file.open(entry_name)
+
+        response = self.get_session().get(self._encode_non_ascii(name), stream=True, timeout=self.TIMEOUT)
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        # the connection goes back to the pool once the content is fully read, reading at the end returns b'' instead of failing on a closed stream
+        response.raw.auto_close = False
+        return io.BufferedReader(response.raw)
+
+    def close(self):
+        self.zip_files = {}
+
+    @classmethod
+    def set_pool_size(cls, pool_size: int):
+        """
+        Set the max number of pooled connections per host, e.g., to match the number of threads reading concurrently
+        """
+        if pool_size < 1:
+            raise ValueError('pool_size must be greater than 0.')
+
+        with cls._sessions_lock:
+            cls.POOL_SIZE = pool_size
+            cls._sessions = {}
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        # connections cannot be shared with forked processes
+        pid = os.getpid()
+        session = cls._sessions.get(pid)
+        if session is None:
+            with cls._sessions_lock:
+                session = cls._sessions.get(pid)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=cls.POOL_SIZE, pool_maxsize=cls.POOL_SIZE)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    cls._sessions = {pid: session}
+        return session
+
+    @classmethod
+    def get_version_tag(cls, url: str) -> typing.Optional[str]:
+        """
+        Tag identifying the version of the file at url without downloading it, from the ETag or Content-MD5 of a HEAD request, e.g., of a blob. The tag of the zip for a file in a
+        remote zip.
+
+        Returns:
+            '<header>:<value>', None if the request fails or the response has no such header
+        """
+
+        url = cls._split_zip_entry_url(url)[0]
+        try:
+            with cls.get_session().head(cls._encode_non_ascii(url), allow_redirects=True, timeout=cls.TIMEOUT) as response:
+                response.raise_for_status()
+                headers = response.headers
+        except requests.RequestException as e:
+            logger.info(f'Failed to get the metadata of {url}: {e}')
+            return None
+
+        for header in ['ETag', 'Content-MD5', 'x-ms-blob-content-md5']:
+            if headers.get(header):
+                return f'{header}:{headers[header]}'
+        return None
+
+    @classmethod
+    def _split_zip_entry_url(cls, url: str):
+        parts = urlparse(url)
+        match = cls._ZIP_ENTRY_PATTERN.search(parts.path)
+        if match is None:
+            return url, None
+        return urlunparse(parts._replace(path=parts.path[:match.start() + 4])), unquote(parts.path[match.end():])
+
+    @staticmethod
+    def _encode_non_ascii(s):
+        return ''.join([c if ord(c) < 128 else quote(c) for c in s])
+
+
+class _NonSeekableReader(io.RawIOBase):
+    def __init__(self, f):
+        self._f = f
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._f.readinto(b)
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+@StorageBackendFactory.register(schemes=['localstore'])
+class LocalObjectStoreBackend(StorageBackend):
+    """
+    Emulator of an object store on local disk, for tests: localstore://<container>/<blob_path>[?<sas>] is read from ROOT_DIR/<container>/<blob_path>, as a non-seekable stream
+    like url streams, after LATENCY seconds emulating the round trip of a request.
+    """
+
+    ROOT_DIR = pathlib.Path(tempfile.gettempdir()) / 'vision_datasets_local_object_store'
+    LATENCY = 0
+
+    def open(self, name: str, mode='r', encoding=None):
+        if self.LATENCY:
+            time.sleep(self.LATENCY)
+        return io.BufferedReader(_NonSeekableReader(open(self.get_local_path(name), 'rb')))
+
+    @classmethod
+    def get_local_path(cls, name: str) -> pathlib.Path:
+        url = urlparse(name)
+        return pathlib.Path(cls.ROOT_DIR) / url.netloc / url.path.lstrip('/')
+
+    @classmethod
+    def put(cls, name: str, data: bytes):
+        path = cls.get_local_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import struct
+import tempfile
+import typing
+import zipfile
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ZipEntry(typing.NamedTuple):
+    data_offset: int
+    compress_size: int
+    file_size: int
+    compress_type: int
+    flag_bits: int
+    crc: int
+
+
+class ZipEntryIndex:
+    """
+    Index of the entries of a zip file, mapping entry names to the location and size of their data, persisted in a compact memory-mappable file.
+
+    Parsing the central directory of a zip with millions of entries takes seconds and creates a python object per entry. The index is built once, saved next to the zip file (or
+    in index_dir), and loaded by memory-mapping it, so that looking up an entry costs a binary search over name hashes, and the index pages are shared by all processes.
+    The index is rebuilt if the size or modification time of the zip file changes. If the index cannot be saved next to the zip file, e.g., the dir is read-only, it is saved
+    in FALLBACK_INDEX_DIR.
+    """
+
+    VERSION = 1
+    FALLBACK_INDEX_DIR = pathlib.Path(tempfile.gettempdir()) / 'vision_datasets_zip_index'
+    _MAGIC = b'VDZIDX'
+    _LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+    _RECORD_DTYPE = np.dtype([('hash', '<u8'), ('data_offset', '<i8'), ('compress_size', '<i8'), ('file_size', '<i8'), ('name_offset', '<i8'), ('name_size', '<i4'),
+                              ('crc', '<u4'), ('compress_type', '<u2'), ('flag_bits', '<u2')])
+
+    def __init__(self, records: np.ndarray, names: np.ndarray):
+        """
+        Args:
+            records (np.ndarray): records of entries sorted by name hash, of dtype _RECORD_DTYPE
+            names (np.ndarray): uint8 array of utf-8 encoded entry names concatenated
+        """
+        self._records = records
+        self._names = names
+        self._hashes = records['hash']
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, name: str) -> typing.Optional[ZipEntry]:
+        encoded = name.encode('utf-8')
+        name_hash = self._hash(encoded)
+        i = int(np.searchsorted(self._hashes, name_hash))
+        while i < len(self._records) and self._hashes[i] == name_hash:
+            record = self._records[i]
+            name_offset = int(record['name_offset'])
+            if self._names[name_offset:name_offset + int(record['name_size'])].tobytes() == encoded:
+                return ZipEntry(int(record['data_offset']), int(record['compress_size']), int(record['file_size']), int(record['compress_type']), int(record['flag_bits']),
+                                int(record['crc']))
+            i += 1
+
+        return None
+
+    @classmethod
+    def build(cls, zip_path) -> 'ZipEntryIndex':
+        with zipfile.ZipFile(zip_path) as zf, open(zip_path, 'rb') as f:
+            # for duplicated names, the last entry wins, as in ZipFile
+            infos = {x.filename: x for x in zf.infolist()}
+            encoded_names = [x.encode('utf-8') for x in infos]
+            records = np.zeros(len(infos), dtype=cls._RECORD_DTYPE)
+            name_offset = 0
+            for i, (info, encoded) in enumerate(zip(infos.values(), encoded_names)):
+                f.seek(info.header_offset)
+                header = cls._LOCAL_HEADER.unpack(f.read(cls._LOCAL_HEADER.size))
+                if header[0] != b'PK\x03\x04':
+                    raise zipfile.BadZipFile(f'Bad local file header for {info.filename} in {zip_path}.')
+                data_offset = info.header_offset + cls._LOCAL_HEADER.size + header[10] + header[11]
+                records[i] = (cls._hash(encoded), data_offset, info.compress_size, info.file_size, name_offset, len(encoded), info.CRC, info.compress_type, info.flag_bits)
+                name_offset += len(encoded)
+
+        order = np.argsort(records['hash'], kind='stable')
+        names = np.frombuffer(b''.join(encoded_names), dtype=np.uint8)
+        return cls(records[order], names)
+
+    @classmethod
+    def load_or_build(cls, zip_path, index_dir=None) -> 'ZipEntryIndex':
+        """
+        Load the persisted index of the zip file if it is up to date, otherwise build and try persisting it. Failing to persist is not an error.
+
+        Args:
+            zip_path (str or pathlib.Path): path to the zip file
+            index_dir (str or pathlib.Path): dir for the index file, next to the zip file if not provided
+        """
+
+        zip_path = pathlib.Path(zip_path)
+        stat = zip_path.stat()
+        zip_state = {'version': cls.VERSION, 'zip_size': stat.st_size, 'zip_mtime_ns': stat.st_mtime_ns}
+        index_paths = [cls.get_index_path(zip_path, index_dir)] if index_dir else [cls.get_index_path(zip_path), cls.get_index_path(zip_path, cls.FALLBACK_INDEX_DIR)]
+        for index_path in index_paths:
+            index = cls._load(index_path, zip_state)
+            if index is not None:
+                return index
+
+        logger.info(f'Building entry index of {zip_path}.')
+        index = cls.build(zip_path)
+        for index_path in index_paths:
+            if index._save(index_path, zip_state):
+                break
+        else:
+            logger.warning(f'Failed to save entry index of {zip_path}, index will be rebuilt next time.')
+        return index
+
+    @staticmethod
+    def get_index_path(zip_path, index_dir=None) -> pathlib.Path:
+        zip_path = pathlib.Path(zip_path)
+        if index_dir is None:
+            return zip_path.with_name(zip_path.name + '.index')
+
+        path_hash = hashlib.sha1(str(zip_path.absolute()).encode('utf-8')).hexdigest()[:16]
+        return pathlib.Path(index_dir) / f'{zip_path.name}.{path_hash}.index'
+
+    @classmethod
+    def _load(cls, index_path: pathlib.Path, zip_state: dict):
+        try:
+            with open(index_path, 'rb') as f:
+                if f.read(len(cls._MAGIC)) != cls._MAGIC:
+                    return None
+                header_size = struct.unpack('<I', f.read(4))[0]
+                header = json.loads(f.read(header_size).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f'Failed to load zip entry index {index_path}: {e}')
+            return None
+
+        if header.get('zip_state') != zip_state:
+            return None
+
+        n_entries, records_offset, names_offset, names_size = header['n_entries'], header['records_offset'], header['names_offset'], header['names_size']
+        records = np.memmap(index_path, dtype=cls._RECORD_DTYPE, mode='r', offset=records_offset, shape=(n_entries,)) if n_entries else np.zeros(0, dtype=cls._RECORD_DTYPE)
+        names = np.memmap(index_path, dtype=np.uint8, mode='r', offset=names_offset, shape=(names_size,)) if names_size else np.zeros(0, dtype=np.uint8)
+        return cls(records, names)
+
+    def _save(self, index_path: pathlib.Path, zip_state: dict):
+        header_size = 4096
+        records_offset = len(self._MAGIC) + 4 + header_size
+        names_offset = records_offset + self._records.nbytes
+        header = json.dumps({'zip_state': zip_state, 'n_entries': len(self._records), 'records_offset': records_offset, 'names_offset': names_offset,
+                             'names_size': len(self._names)}).encode('utf-8')
+        temp_path = None
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=index_path.parent, prefix=f'.{index_path.name}.')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._MAGIC)
+                f.write(struct.pack('<I', header_size))
+                f.write(header.ljust(header_size, b' '))
+                f.write(np.ascontiguousarray(self._records).tobytes())
+                f.write(np.ascontiguousarray(self._names).tobytes())
+            os.replace(temp_path, index_path)
+            temp_path = None
+            return True
+        except OSError as e:
+            logger.info(f'Failed to save zip entry index to {index_path}: {e}')
+            return False
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+
+    @staticmethod
+    def _hash(encoded_name: bytes) -> int:
+        return (zlib.crc32(encoded_name) << 32) | zlib.adler32(encoded_name)
@@ -0,0 +1,195 @@
+import io
+import mmap
+import os
+import threading
+import zipfile
+import zlib
+
+from .zip_entry_index import ZipEntryIndex
+
+
+def _decompress_entry_data(data: bytes, compress_type: int, file_size: int, crc: int, file: str) -> bytes:
+    """Decompress the raw data of a stored or deflated entry and check its CRC"""
+    if compress_type == zipfile.ZIP_DEFLATED:
+        data = zlib.decompressobj(-15).decompress(data)
+    if len(data) != file_size or zlib.crc32(data) != crc:
+        raise zipfile.BadZipFile(f'Bad CRC-32 for file {file!r}')
+    return data
+
+
+class _MemoryViewReader(io.BufferedIOBase):
+    """Read-only binary stream over a memoryview, e.g., of a memory-mapped file, without copying the underlying buffer"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        self._checkClosed()
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos += len(data)
+        return data
+
+    read1 = read
+
+    def readinto(self, b):
+        self._checkClosed()
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+        if pos < 0:
+            raise ValueError(f'Negative seek position {pos}')
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        self._checkClosed()
+        return self._pos
+
+    def getbuffer(self) -> memoryview:
+        """Read-only view of the whole content, for consumers taking buffers, e.g., np.frombuffer, without any copy"""
+        self._checkClosed()
+        return self._view
+
+    def close(self):
+        super().close()
+        self._view = None
+
+
+class MultiProcessZipFile:
+    """ZipFile which is readable from multi processes
+
+    Entries are located with a persisted ZipEntryIndex instead of parsing the central directory in each process, and stored or deflated entries are read with os.pread on a
+    file descriptor shared by the threads of a process. Other entries, e.g., encrypted ones or ones larger than MAX_DIRECT_READ_SIZE, are read through a ZipFile per process.
+
+    With use_mmap, the zip file is memory-mapped once per process, and stored entries are returned as read-only streams over the mapped bytes, so that they are read from the
+    page cache with no intermediate copy, and only the pages actually read are loaded, e.g., when reading image headers only. CRCs of such entries are not checked.
+    """
+
+    MAX_DIRECT_READ_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, filename, index_dir=None, use_mmap=False):
+        """
+        Args:
+            filename (str or pathlib.Path): path to the zip file
+            index_dir (str or pathlib.Path): dir for the entry index, next to the zip file if not provided
+            use_mmap (bool): read stored entries from a memory map of the zip file
+        """
+        self.filename = filename
+        self.index_dir = index_dir
+        self.use_mmap = use_mmap
+        self._init_state()
+
+    def _init_state(self):
+        self.zipfiles = {}
+        self._fds = {}
+        self._mmaps = {}
+        self._index = None
+        self._lock = threading.Lock()
+
+    def open(self, file):
+        entry = self._get_entry(file) if self.use_mmap or hasattr(os, 'pread') else None
+        if entry is not None and self.use_mmap and entry.compress_type == zipfile.ZIP_STORED and not entry.flag_bits & 0x1:
+            return _MemoryViewReader(self._get_mmap_view(entry, file))
+
+        if entry is not None and hasattr(os, 'pread') and self._can_read_directly(entry):
+            return io.BytesIO(self._read_entry(entry, file))
+
+        pid = os.getpid()
+        if pid not in self.zipfiles:
+            with self._lock:
+                if pid not in self.zipfiles:
+                    self.zipfiles[pid] = zipfile.ZipFile(self.filename)
+        return self.zipfiles[pid].open(file)
+
+    def close(self):
+        for z in self.zipfiles.values():
+            z.close()
+        self.zipfiles = {}
+        pid = os.getpid()
+        fd = self._fds.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+        mm = self._mmaps.pop(pid, None)
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                # still referred to by open streams, unmapped once they are gone
+                pass
+        # fds and maps inherited from the parent process are left to it
+        self._fds = {}
+        self._mmaps = {}
+        self._index = None
+
+    def _get_entry(self, file):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = ZipEntryIndex.load_or_build(self.filename, self.index_dir)
+        entry = self._index.get(file)
+        if entry is None:
+            raise KeyError(f'There is no item named {file!r} in the archive')
+        return entry
+
+    def _can_read_directly(self, entry):
+        return entry.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) and not entry.flag_bits & 0x1 and entry.compress_size <= self.MAX_DIRECT_READ_SIZE
+
+    def _get_fd(self):
+        pid = os.getpid()
+        fd = self._fds.get(pid)
+        if fd is None:
+            with self._lock:
+                fd = self._fds.get(pid)
+                if fd is None:
+                    fd = os.open(self.filename, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+                    self._fds[pid] = fd
+        return fd
+
+    def _get_mmap_view(self, entry, file):
+        pid = os.getpid()
+        mm = self._mmaps.get(pid)
+        if mm is None:
+            with self._lock:
+                mm = self._mmaps.get(pid)
+                if mm is None:
+                    with open(self.filename, 'rb') as f:
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._mmaps[pid] = mm
+        if entry.data_offset + entry.compress_size > len(mm):
+            raise zipfile.BadZipFile(f'Truncated entry {file} in {self.filename}.')
+        return memoryview(mm)[entry.data_offset:entry.data_offset + entry.compress_size]
+
+    def _read_entry(self, entry, file):
+        data = os.pread(self._get_fd(), entry.compress_size, entry.data_offset)
+        if len(data) != entry.compress_size:
+            raise zipfile.BadZipFile(f'Truncated entry {file} in {self.filename}.')
+        return _decompress_entry_data(data, entry.compress_type, entry.file_size, entry.crc, file)
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'index_dir': self.index_dir, 'use_mmap': self.use_mmap}
+
+    def __setstate__(self, state):
+        self.filename = state['filename']
+        self.index_dir = state.get('index_dir')
+        self.use_mmap = state.get('use_mmap', False)
+        self._init_state()
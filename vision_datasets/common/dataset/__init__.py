@@ -1,3 +1,7 @@
 from .vision_dataset import VisionDataset
+from .prefetching_iterator import PrefetchingIterator
+from .packed_dataset import PackedDataset, PackedDatasetWriter
+from .tsv_dataset import TsvDataset
+from .jsonl_dataset import JsonlDataset
 
-__all__ = ['VisionDataset']
+__all__ = ['VisionDataset', 'PrefetchingIterator', 'PackedDataset', 'PackedDatasetWriter', 'TsvDataset', 'JsonlDataset']
@@ -1,3 +1,5 @@
+import concurrent.futures
+import typing
 from abc import ABC, abstractmethod
 
 from ..dataset_info import BaseDatasetInfo
@@ -26,6 +28,28 @@ class BaseDataset(ABC):
         stop = min(self.__len__(), idx.stop)
         return [self.__getitem__(i) for i in range(idx.start, stop, idx.step)] if idx.step else [self.__getitem__(i) for i in range(idx.start, stop)]
 
+    def get_many(self, indices: typing.Iterable[int], max_workers: int = 8) -> list:
+        """ fetch samples on a pool of threads, as reading files and decoding images release the GIL, so that one process can use multiple cores without the memory cost
+        of more processes
+
+        Args:
+            indices (iterable): indices of the samples
+            max_workers (int): max number of samples being fetched at the same time, dataset[i] must be safe to call from multiple threads if greater than 1
+
+        Returns:
+            samples, in the order of indices
+        """
+
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
+
+        indices = [int(x) for x in indices]
+        if max_workers == 1 or len(indices) <= 1:
+            return [self[x] for x in indices]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(indices))) as executor:
+            return list(executor.map(self.__getitem__, indices))
+
     @property
     @abstractmethod
     def categories(self):
@@ -0,0 +1,164 @@
+import json
+import logging
+import pathlib
+import typing
+
+import numpy as np
+
+from ..base64_utils import Base64Utils
+from ..constants import DatasetTypes
+from ..data_manifest import CategoryManifest
+from ..data_reader.line_indexed_file import LineIndexedFile
+from ..dataset_info import BaseDatasetInfo
+from .base_dataset import BaseDataset
+
+logger = logging.getLogger(__name__)
+
+
+class _JsonlImageScanner:
+    """Group rows by image when a JSONL file is indexed: rows of the flattened layout by image_id, in the order of first appearances, and each row of the other layout by itself"""
+
+    def __init__(self):
+        self._flattened = None
+        self._rows_by_image_id = {}
+        self._n_rows = 0
+
+    def scan(self, line: bytes):
+        row = json.loads(line)
+        flattened = not ('labels' in row and 'id' in row)
+        if self._flattened is None:
+            self._flattened = flattened
+        elif flattened != self._flattened:
+            raise ValueError('Rows of flattened and non-flattened layouts are mixed in a JSONL file.')
+
+        if flattened:
+            self._rows_by_image_id.setdefault(str(row['image_id']), []).append(self._n_rows)
+        self._n_rows += 1
+
+    def result(self):
+        if not self._flattened:
+            return {'flattened': False}
+        return {'flattened': True, 'rows_by_image': list(self._rows_by_image_id.values())}
+
+
+class JsonlDataset(BaseDataset):
+    """
+    Dataset reading image-oriented JSONL files written by GenerateStandAloneImageListBase (e.g., through convert_to_jsonl), with base64-encoded images embedded in the rows.
+
+    Rows are located with a line index built on first open (see LineIndexedFile), so that only the rows of the requested image are read and parsed, and images are decoded only when
+    samples are requested, not for get_targets. Both layouts are supported, a sample being (image, labels, image id) for each image:
+        non-flattened, one row per image: {"id": ..., "labels": [label, ...], "image": ...}
+        flattened, one row per label: {"image_id": ..., <label fields or "label">, "image": ...}, rows being grouped by image_id within each file when indexed. Images without labels
+            have no rows in this layout, hence are not in the dataset
+    Labels in the rows, as generated by the StandAloneImageListGenerator of the data type, are converted back to the label manifests of the data type, e.g., class names to category
+    ids with the categories. Boxes are absolute [left, top, right, bottom], as they are in the rows.
+    """
+
+    SUPPORTED_TYPES = [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_OBJECT_DETECTION, DatasetTypes.IMAGE_CAPTION,
+                       DatasetTypes.IMAGE_REGRESSION, DatasetTypes.IMAGE_TEXT_MATCHING, DatasetTypes.IMAGE_MATTING, DatasetTypes.TEXT_2_IMAGE_RETRIEVAL,
+                       DatasetTypes.VISUAL_QUESTION_ANSWERING, DatasetTypes.VISUAL_OBJECT_GROUNDING]
+    _TYPES_WITH_CATEGORIES = [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_OBJECT_DETECTION]
+
+    def __init__(self, dataset_info: BaseDatasetInfo, jsonl_paths: typing.List[typing.Union[str, pathlib.Path]], categories: typing.List[CategoryManifest] = None,
+                 index_dir: typing.Union[str, pathlib.Path] = None):
+        """
+        Args:
+            dataset_info (BaseDatasetInfo): dataset info, whose type is one of SUPPORTED_TYPES
+            jsonl_paths (list): local paths to the JSONL files, whose images are concatenated
+            categories (list): categories of the dataset, required for classification and detection, as rows have class names while the JSONL files do not store the categories
+            index_dir (str or pathlib.Path): dir for the line indices, next to the JSONL files if not provided
+        """
+
+        if dataset_info.type not in self.SUPPORTED_TYPES:
+            raise ValueError(f'Unsupported data type for JSONL: {dataset_info.type}')
+
+        if not jsonl_paths:
+            raise ValueError('jsonl_paths must not be empty.')
+
+        if dataset_info.type in self._TYPES_WITH_CATEGORIES and categories is None:
+            raise ValueError(f'categories are required for {dataset_info.type}.')
+
+        super().__init__(dataset_info)
+
+        self._categories = categories
+        self._category_name_to_id = {x.name: x.id for x in categories} if categories is not None else None
+        self._jsonl_files = [LineIndexedFile(x, index_dir, _JsonlImageScanner()) for x in jsonl_paths]
+        self._first_indices = np.cumsum([0] + [self._get_n_images(x) for x in self._jsonl_files])
+
+    @property
+    def categories(self):
+        return self._categories
+
+    def __len__(self):
+        return int(self._first_indices[-1])
+
+    def get_targets(self, index):
+        """
+        Labels of a sample, without decoding the image
+        """
+        _, labels, _ = self._parse_rows(self._read_rows(index))
+        return labels
+
+    def _get_single_item(self, index):
+        img_b64, labels, img_id = self._parse_rows(self._read_rows(index))
+        return Base64Utils.b64_str_to_pil(img_b64), labels, img_id
+
+    def close(self):
+        for jsonl_file in self._jsonl_files:
+            jsonl_file.close()
+
+    @staticmethod
+    def _get_n_images(jsonl_file: LineIndexedFile):
+        return len(jsonl_file.metadata['rows_by_image']) if jsonl_file.metadata['flattened'] else len(jsonl_file)
+
+    def _read_rows(self, index):
+        if index < 0 or index >= len(self):
+            raise IndexError
+        file_idx = int(np.searchsorted(self._first_indices, index, side='right')) - 1
+        jsonl_file = self._jsonl_files[file_idx]
+        index_in_file = index - int(self._first_indices[file_idx])
+        row_indices = jsonl_file.metadata['rows_by_image'][index_in_file] if jsonl_file.metadata['flattened'] else [index_in_file]
+        return [json.loads(jsonl_file[x]) for x in row_indices]
+
+    def _parse_rows(self, rows: typing.List[dict]):
+        img_b64 = rows[0].pop('image')
+        if 'labels' in rows[0] and 'id' in rows[0]:
+            return img_b64, self._create_label_manifests(rows[0]['labels']), str(rows[0]['id'])
+
+        img_id = str(rows[0]['image_id'])
+        labels = []
+        for row in rows:
+            row.pop('image', None)
+            row.pop('image_id')
+            labels.append(row['label'] if set(row) == {'label'} else row)
+        return img_b64, self._create_label_manifests(labels), img_id
+
+    def _create_label_manifests(self, labels: typing.List[dict]):
+        from ...image_caption import ImageCaptionLabelManifest
+        from ...image_classification import ImageClassificationLabelManifest
+        from ...image_matting import ImageMattingLabelManifest
+        from ...image_object_detection import ImageObjectDetectionLabelManifest
+        from ...image_regression import ImageRegressionLabelManifest
+        from ...image_text_matching import ImageTextMatchingLabelManifest
+        from ...text_2_image_retrieval import Text2ImageRetrievalLabelManifest
+        from ...visual_object_grounding import VisualObjectGroundingLabelManifest
+        from ...visual_question_answering import VisualQuestionAnsweringLabelManifest
+
+        data_type = self.dataset_info.type
+        if data_type in [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL]:
+            return [ImageClassificationLabelManifest(self._category_name_to_id[x['category_name']]) for x in labels]
+        if data_type == DatasetTypes.IMAGE_OBJECT_DETECTION:
+            return [ImageObjectDetectionLabelManifest([self._category_name_to_id[x['category_name']]] + list(x['bbox'])) for x in labels]
+        if data_type == DatasetTypes.IMAGE_CAPTION:
+            return [ImageCaptionLabelManifest(x['caption']) for x in labels]
+        if data_type == DatasetTypes.IMAGE_REGRESSION:
+            return [ImageRegressionLabelManifest(x['target']) for x in labels]
+        if data_type == DatasetTypes.IMAGE_TEXT_MATCHING:
+            return [ImageTextMatchingLabelManifest([x['text'], x['match']]) for x in labels]
+        if data_type == DatasetTypes.IMAGE_MATTING:
+            return [ImageMattingLabelManifest(np.asarray(Base64Utils.b64_str_to_pil(x['matting_image']))) for x in labels]
+        if data_type == DatasetTypes.TEXT_2_IMAGE_RETRIEVAL:
+            return [Text2ImageRetrievalLabelManifest(x['query']) for x in labels]
+        if data_type == DatasetTypes.VISUAL_QUESTION_ANSWERING:
+            return [VisualQuestionAnsweringLabelManifest({'question': x['question'], 'answer': x['answer']}) for x in labels]
+        return [VisualObjectGroundingLabelManifest({'question': x['question'], 'answer': x['answer'], 'groundings': x['groundings']}) for x in labels]
@@ -0,0 +1,356 @@
+import io
+import json
+import logging
+import os
+import pathlib
+import struct
+import threading
+import typing
+
+import numpy as np
+from tqdm import tqdm
+
+from ..constants import DatasetTypes
+from ..data_manifest import CategoryManifest, MultiImageLabelManifest
+from ..data_reader import PILImageLoader
+from ..dataset_info import DatasetInfoFactory, MultiTaskDatasetInfo
+from .base_dataset import BaseDataset
+from .prefetching_iterator import PrefetchingIterator
+from .vision_dataset import LocalFolderCacheDecorator
+
+logger = logging.getLogger(__name__)
+
+
+class PackedDatasetFormat:
+    """
+    Layout of a packed dataset dir:
+        shard-00000.pack, shard-00001.pack, ...: records of samples, one after another
+        index.npy: (shard, offset, size) of the record of each sample
+        meta.json: dataset info, categories and number of shards
+
+    A record is a header (magic, size of the labels, number of images, whether images are a list), followed by the sizes of the images, the labels as json and the encoded images, so that shards can be
+    read sequentially without the index, e.g., streamed from a url. Labels are stored as label_data and additional_info with the dataset type, and label manifests are rebuilt on read, so reading
+    a shard never runs code from it, and the format does not depend on the layout of label manifest classes.
+    """
+
+    VERSION = 2
+    RECORD_MAGIC = b'VDPK'
+    RECORD_HEADER = struct.Struct('<4sIH?')
+    IMAGE_SIZE = struct.Struct('<Q')
+    INDEX_DTYPE = np.dtype([('shard', '<u4'), ('offset', '<u8'), ('size', '<u8')])
+    INDEX_FILENAME = 'index.npy'
+    META_FILENAME = 'meta.json'
+    _NDARRAY_KEY = '__ndarray__'
+
+    @staticmethod
+    def shard_filename(shard_idx):
+        return f'shard-{shard_idx:05d}.pack'
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=PackedDatasetFormat._to_json).encode('utf-8')
+
+    @staticmethod
+    def loads(data: bytes):
+        return json.loads(data.decode('utf-8'), object_hook=PackedDatasetFormat._from_json)
+
+    @staticmethod
+    def _to_json(obj):
+        # boxes_as_array targets and matting labels are arrays
+        if isinstance(obj, np.ndarray):
+            return {PackedDatasetFormat._NDARRAY_KEY: obj.tolist(), 'dtype': obj.dtype.str}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError(f'Object of type {type(obj).__name__} cannot be stored in a packed dataset.')
+
+    @staticmethod
+    def _from_json(obj: dict):
+        if PackedDatasetFormat._NDARRAY_KEY in obj:
+            return np.array(obj[PackedDatasetFormat._NDARRAY_KEY], dtype=np.dtype(obj['dtype']))
+        return obj
+
+    @staticmethod
+    def labels_to_json(labels, dataset_info):
+        if isinstance(labels, dict):
+            return {'tasks': {name: PackedDatasetFormat.labels_to_json(x, dataset_info.sub_task_infos[name]) for name, x in labels.items()}}
+        if isinstance(labels, np.ndarray):
+            return labels
+        if isinstance(labels, MultiImageLabelManifest):
+            return {'type': dataset_info.type.name, 'annotation': {'id': labels.id, 'img_ids': labels.img_ids, 'label_data': labels.label_data, 'additional_info': labels.additional_info}}
+        return {'type': dataset_info.type.name, 'labels': [{'label_data': x.label_data, 'additional_info': x.additional_info} for x in labels]}
+
+    @staticmethod
+    def labels_from_json(data):
+        if isinstance(data, np.ndarray):
+            return data
+        if 'tasks' in data:
+            return {name: PackedDatasetFormat.labels_from_json(x) for name, x in data['tasks'].items()}
+
+        label_manifest_class = PackedDatasetFormat._get_label_manifest_class(DatasetTypes[data['type']])
+        if 'annotation' in data:
+            annotation = data['annotation']
+            return label_manifest_class(annotation['id'], annotation['img_ids'], annotation['label_data'], annotation['additional_info'])
+        return [label_manifest_class(x['label_data'], additional_info=x['additional_info']) for x in data['labels']]
+
+    @staticmethod
+    def _get_label_manifest_class(data_type: DatasetTypes):
+        from ...image_caption import ImageCaptionLabelManifest
+        from ...image_classification import ImageClassificationLabelManifest
+        from ...image_matting import ImageMattingLabelManifest
+        from ...image_object_detection import ImageObjectDetectionLabelManifest
+        from ...image_regression import ImageRegressionLabelManifest
+        from ...image_text_matching import ImageTextMatchingLabelManifest
+        from ...key_value_pair import KeyValuePairLabelManifest
+        from ...text_2_image_retrieval import Text2ImageRetrievalLabelManifest
+        from ...visual_object_grounding import VisualObjectGroundingLabelManifest
+        from ...visual_question_answering import VisualQuestionAnsweringLabelManifest
+
+        mapping = {
+            DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL: ImageClassificationLabelManifest,
+            DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS: ImageClassificationLabelManifest,
+            DatasetTypes.IMAGE_OBJECT_DETECTION: ImageObjectDetectionLabelManifest,
+            DatasetTypes.IMAGE_TEXT_MATCHING: ImageTextMatchingLabelManifest,
+            DatasetTypes.IMAGE_MATTING: ImageMattingLabelManifest,
+            DatasetTypes.IMAGE_REGRESSION: ImageRegressionLabelManifest,
+            DatasetTypes.IMAGE_CAPTION: ImageCaptionLabelManifest,
+            DatasetTypes.TEXT_2_IMAGE_RETRIEVAL: Text2ImageRetrievalLabelManifest,
+            DatasetTypes.VISUAL_QUESTION_ANSWERING: VisualQuestionAnsweringLabelManifest,
+            DatasetTypes.VISUAL_OBJECT_GROUNDING: VisualObjectGroundingLabelManifest,
+            DatasetTypes.KEY_VALUE_PAIR: KeyValuePairLabelManifest,
+        }
+        if data_type not in mapping:
+            raise ValueError(f'Unsupported dataset type {data_type} in packed dataset.')
+        return mapping[data_type]
+
+    @staticmethod
+    def dataset_info_to_json(dataset_info) -> dict:
+        info = {'name': dataset_info.name, 'version': dataset_info.version, 'type': dataset_info.type.name.lower(), 'root_folder': dataset_info.root_folder,
+                'description': dataset_info.description, 'format': dataset_info.data_format.name.lower()}
+        if isinstance(dataset_info, MultiTaskDatasetInfo):
+            info['tasks'] = {name: PackedDatasetFormat.dataset_info_to_json(x) for name, x in dataset_info.sub_task_infos.items()}
+            return info
+
+        for usage, index_path in dataset_info.index_files.items():
+            info[usage.name.lower()] = {'index_path': str(index_path), 'files_for_local_usage': [str(x) for x in dataset_info.files_for_local_usage.get(usage, [])]}
+        for key in ['labelmap', 'image_metadata_path', 'schema']:
+            if getattr(dataset_info, key, None) is not None:
+                info[key] = getattr(dataset_info, key)
+        return info
+
+    @staticmethod
+    def categories_to_json(categories):
+        if categories is None:
+            return None
+        if isinstance(categories, dict):
+            return {name: PackedDatasetFormat.categories_to_json(x) for name, x in categories.items()}
+        return [{'id': x.id, 'name': x.name, 'super_category': x.super_category, 'additional_info': x.additional_info} for x in categories]
+
+    @staticmethod
+    def categories_from_json(data):
+        if data is None:
+            return None
+        if isinstance(data, dict):
+            return {name: PackedDatasetFormat.categories_from_json(x) for name, x in data.items()}
+        return [CategoryManifest(x['id'], x['name'], x['super_category'], x['additional_info']) for x in data]
+
+
+class PackedDatasetWriter:
+    """
+    Pack a dataset into a few large shard files, each holding images and labels of many samples, instead of one file per sample as LocalFolderCacheDecorator does, which is
+    slow on network file systems and object storages. Images are re-encoded in the same way as by LocalFolderCacheDecorator.
+    """
+
+    def __init__(self, dataset: BaseDataset, images_per_shard: int = 10000, max_concurrency: int = 8):
+        """
+        Args:
+            dataset (BaseDataset): dataset to pack, samples are stored as they are returned by the dataset, i.e., (image(s), labels, id)
+            images_per_shard (int): max number of samples in each shard
+            max_concurrency (int): number of samples being fetched concurrently, see PrefetchingIterator
+        """
+        if dataset is None:
+            raise ValueError
+
+        if images_per_shard < 1:
+            raise ValueError('images_per_shard must be greater than 0.')
+
+        self.dataset = dataset
+        self.images_per_shard = images_per_shard
+        self.max_concurrency = max_concurrency
+
+    def write(self, output_dir: typing.Union[str, pathlib.Path]):
+        output_dir = pathlib.Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        index = np.zeros(len(self.dataset), dtype=PackedDatasetFormat.INDEX_DTYPE)
+        shard_file = None
+        n_shards = 0
+        try:
+            samples = PrefetchingIterator(self.dataset, max_concurrency=self.max_concurrency)
+            for i, (images, labels, _) in enumerate(tqdm(samples, desc=f'Packing dataset into {output_dir}...')):
+                if i % self.images_per_shard == 0:
+                    if shard_file:
+                        shard_file.close()
+                    shard_file = open(output_dir / PackedDatasetFormat.shard_filename(n_shards), 'wb')
+                    n_shards += 1
+
+                record = self._encode_record(images, labels, self.dataset.dataset_info)
+                index[i] = (n_shards - 1, shard_file.tell(), len(record))
+                shard_file.write(record)
+        finally:
+            if shard_file:
+                shard_file.close()
+
+        # index and meta are written last, so that a partially written dir is never loaded
+        np.save(output_dir / PackedDatasetFormat.INDEX_FILENAME, index)
+        meta = {'version': PackedDatasetFormat.VERSION, 'dataset_info': PackedDatasetFormat.dataset_info_to_json(self.dataset.dataset_info),
+                'categories': PackedDatasetFormat.categories_to_json(self.dataset.categories), 'n_shards': n_shards}
+        with open(output_dir / PackedDatasetFormat.META_FILENAME, 'wb') as f:
+            f.write(PackedDatasetFormat.dumps(meta))
+
+        logger.info(f'Packed {len(index)} samples into {n_shards} shards in {output_dir}.')
+
+    @staticmethod
+    def _encode_record(images, labels, dataset_info):
+        is_list = isinstance(images, list)
+        encoded_images = [PackedDatasetWriter._encode_image(x) for x in (images if is_list else [images])]
+        encoded_labels = PackedDatasetFormat.dumps(PackedDatasetFormat.labels_to_json(labels, dataset_info))
+        header = PackedDatasetFormat.RECORD_HEADER.pack(PackedDatasetFormat.RECORD_MAGIC, len(encoded_labels), len(encoded_images), is_list)
+        image_sizes = b''.join(PackedDatasetFormat.IMAGE_SIZE.pack(len(x)) for x in encoded_images)
+        return b''.join([header, image_sizes, encoded_labels, *encoded_images])
+
+    @staticmethod
+    def _encode_image(image):
+        with io.BytesIO() as f:
+            if image.format:
+                LocalFolderCacheDecorator._save_image_matching_quality(image, f)
+            else:
+                image.save(f, format='PNG')
+            return f.getvalue()
+
+
+class PackedDataset(BaseDataset):
+    """
+    Dataset reading samples packed by PackedDatasetWriter, with O(1) random access: the location of a sample is looked up in the memory-mapped index, and its record is read
+    with a single positional read from the shard file.
+    """
+
+    def __init__(self, pack_dir: typing.Union[str, pathlib.Path]):
+        """
+        Args:
+            pack_dir (str or pathlib.Path): local dir written by PackedDatasetWriter
+        """
+        self.pack_dir = pathlib.Path(pack_dir)
+        meta_path = self.pack_dir / PackedDatasetFormat.META_FILENAME
+        if not meta_path.exists():
+            raise ValueError(f'{pack_dir} is not a packed dataset of version {PackedDatasetFormat.VERSION}, please pack the dataset again.')
+        meta = PackedDatasetFormat.loads(meta_path.read_bytes())
+        if meta['version'] != PackedDatasetFormat.VERSION:
+            raise ValueError(f'Unsupported packed dataset version {meta["version"]} in {pack_dir}.')
+
+        super().__init__(DatasetInfoFactory.create(meta['dataset_info']))
+        self._categories = PackedDatasetFormat.categories_from_json(meta['categories'])
+        self.n_shards = meta['n_shards']
+        self._init_state()
+
+    def _init_state(self):
+        self._index = np.load(self.pack_dir / PackedDatasetFormat.INDEX_FILENAME, mmap_mode='r')
+        self._shard_files = {}
+        self._lock = threading.Lock()
+
+    @property
+    def categories(self):
+        return self._categories
+
+    def __len__(self):
+        return len(self._index)
+
+    def _get_single_item(self, index):
+        entry = self._index[index]
+        record = self._read(int(entry['shard']), int(entry['offset']), int(entry['size']))
+        images, labels = PackedDataset._decode_record(io.BytesIO(record))
+        return images, labels, str(index)
+
+    @staticmethod
+    def iter_stream(f) -> typing.Iterator[tuple]:
+        """
+        Read samples of a shard sequentially, without the index.
+
+        Args:
+            f: binary stream of a shard file, which does not need to be seekable, e.g., opened from a url by FileReader
+
+        Returns:
+            iterator of (image(s), labels, index in the shard)
+        """
+
+        i = 0
+        while True:
+            sample = PackedDataset._decode_record(f)
+            if sample is None:
+                return
+            yield (*sample, str(i))
+            i += 1
+
+    def close(self):
+        pid = os.getpid()
+        for key, shard_file in list(self._shard_files.items()):
+            if key[0] == pid:
+                shard_file.close()
+        self._shard_files = {}
+
+    def _read(self, shard_idx, offset, size):
+        # positional reads are safe across threads sharing a file, files are opened per process
+        key = (os.getpid(), shard_idx)
+        shard_file = self._shard_files.get(key)
+        if shard_file is None:
+            with self._lock:
+                shard_file = self._shard_files.get(key)
+                if shard_file is None:
+                    shard_file = open(self.pack_dir / PackedDatasetFormat.shard_filename(shard_idx), 'rb')
+                    self._shard_files[key] = shard_file
+
+        if hasattr(os, 'pread'):
+            data = os.pread(shard_file.fileno(), size, offset)
+        else:
+            with self._lock:
+                shard_file.seek(offset)
+                data = shard_file.read(size)
+        if len(data) != size:
+            raise IOError(f'Truncated record in shard {shard_idx} of {self.pack_dir}.')
+        return data
+
+    @staticmethod
+    def _decode_record(f):
+        header = PackedDataset._read_exactly(f, PackedDatasetFormat.RECORD_HEADER.size, allow_eof=True)
+        if header is None:
+            return None
+        magic, labels_size, n_images, is_list = PackedDatasetFormat.RECORD_HEADER.unpack(header)
+        if magic != PackedDatasetFormat.RECORD_MAGIC:
+            raise IOError('Invalid record in packed dataset shard.')
+
+        image_sizes = [PackedDatasetFormat.IMAGE_SIZE.unpack(PackedDataset._read_exactly(f, PackedDatasetFormat.IMAGE_SIZE.size))[0] for _ in range(n_images)]
+        labels = PackedDatasetFormat.labels_from_json(PackedDatasetFormat.loads(PackedDataset._read_exactly(f, labels_size)))
+        images = [PILImageLoader.load_from_stream(io.BytesIO(PackedDataset._read_exactly(f, x))) for x in image_sizes]
+        return images if is_list else images[0], labels
+
+    @staticmethod
+    def _read_exactly(f, size, allow_eof=False):
+        data = b''
+        while len(data) < size:
+            chunk = f.read(size - len(data))
+            if not chunk:
+                if allow_eof and not data:
+                    return None
+                raise IOError('Unexpected end of packed dataset shard.')
+            data += chunk
+        return data
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the index is memory-mapped again instead of being copied to other processes
+        for key in ['_index', '_shard_files', '_lock']:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
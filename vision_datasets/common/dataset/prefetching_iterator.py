@@ -0,0 +1,69 @@
+import collections
+import concurrent.futures
+import typing
+
+from .base_dataset import BaseDataset
+
+
+class PrefetchingIterator:
+    """
+    Iterate through samples of a dataset, with up to max_concurrency samples being fetched concurrently by a pool of threads.
+
+    Fetching a sample, i.e., dataset[i], mostly waits for I/O (e.g., reading images from urls) or runs in PIL's decoders, both of which release the GIL, so the throughput of
+    datasets with high-latency storage scales with max_concurrency instead of being bounded by the round-trip time.
+    """
+
+    def __init__(self, dataset: BaseDataset, indices: typing.Iterable[int] = None, max_concurrency: int = 16, ordered: bool = True):
+        """
+        Args:
+            dataset (BaseDataset): dataset to iterate through, dataset[i] must be safe to call from multiple threads
+            indices (iterable): indices of the samples, all samples in order if not provided
+            max_concurrency (int): max number of samples being fetched at the same time
+            ordered (bool): yield samples in the order of indices if True, otherwise in the order their fetching completes
+        """
+        if dataset is None:
+            raise ValueError
+
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be greater than 0.')
+
+        self.dataset = dataset
+        self.indices = indices
+        self.max_concurrency = max_concurrency
+        self.ordered = ordered
+
+    def __len__(self):
+        return len(self.dataset) if self.indices is None else len(self.indices)
+
+    def __iter__(self):
+        indices = iter(range(len(self.dataset)) if self.indices is None else self.indices)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency)
+        in_flight = collections.deque()
+
+        def submit_next():
+            index = next(indices, None)
+            if index is None:
+                return False
+            in_flight.append(executor.submit(self.dataset.__getitem__, index))
+            return True
+
+        try:
+            while len(in_flight) < self.max_concurrency and submit_next():
+                pass
+
+            while in_flight:
+                if self.ordered:
+                    future = in_flight.popleft()
+                else:
+                    done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    future = next(x for x in in_flight if x in done)
+                    in_flight.remove(future)
+
+                sample = future.result()
+                submit_next()
+                yield sample
+        finally:
+            # stop pending fetches, e.g., when the iteration stops early
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
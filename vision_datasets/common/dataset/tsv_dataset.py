@@ -0,0 +1,135 @@
+import json
+import logging
+import pathlib
+import typing
+
+import numpy as np
+
+from ..base64_utils import Base64Utils
+from ..constants import DatasetTypes
+from ..data_manifest import CategoryManifest
+from ..data_reader.line_indexed_file import LineIndexedFile
+from ..dataset_info import BaseDatasetInfo
+from ..utils import TSV_FORMAT_LTRB, TSV_FORMAT_LTWH_NORM, verify_and_correct_box_or_none
+from .base_dataset import BaseDataset
+from .vision_dataset import VisionDataset
+
+logger = logging.getLogger(__name__)
+
+
+class _TsvClassNameScanner:
+    """Collect class names in the order of their first appearances, when a TSV file is indexed"""
+
+    def __init__(self):
+        self._class_names = {}
+
+    def scan(self, line: bytes):
+        columns = line.split(b'\t', 2)
+        if len(columns) != 3:
+            raise ValueError(f'Invalid TSV row, expecting 3 columns: {line[:100]}')
+        for label in json.loads(columns[1]):
+            if 'class' in label:
+                self._class_names.setdefault(label['class'], None)
+
+    def result(self):
+        return {'class_names': list(self._class_names)}
+
+
+class TsvDataset(BaseDataset):
+    """
+    Dataset reading TSV files (see TSV_FORMAT.md) directly, i.e., rows of image id, labels in json and base64-encoded image, for classification, detection and caption.
+
+    Rows are located with a line index built on first open (see LineIndexedFile), so that only the requested row is read and decoded. The TSV files do not need to be converted.
+    """
+
+    SUPPORTED_TYPES = [DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS, DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL, DatasetTypes.IMAGE_OBJECT_DETECTION, DatasetTypes.IMAGE_CAPTION]
+
+    def __init__(self, dataset_info: BaseDatasetInfo, tsv_paths: typing.List[typing.Union[str, pathlib.Path]], labelmap: typing.List[str] = None, coordinates='relative',
+                 index_dir: typing.Union[str, pathlib.Path] = None, box_format: str = TSV_FORMAT_LTRB, include_difficult: bool = False):
+        """
+        Args:
+            dataset_info (BaseDatasetInfo): dataset info, whose type is one of SUPPORTED_TYPES
+            tsv_paths (list): local paths to the TSV files, whose rows are concatenated
+            labelmap (list): class names, with class ids being their indices. If not provided, classes are ordered by their first appearances in the TSV files
+            coordinates (str): 'relative' or 'absolute', indicating the desired format of the bboxes returned
+            index_dir (str or pathlib.Path): dir for the line indices, next to the TSV files if not provided
+            box_format (str): format of the boxes ('rect') in the TSV files, TSV_FORMAT_LTRB for absolute [left, top, right, bottom], or TSV_FORMAT_LTWH_NORM for
+                [left, top, width, height] relative to the image size. Boxes are checked and corrected as by the converter_tsv_to_coco command, invalid ones being skipped
+            include_difficult (bool): whether boxes marked as difficult ('diff' > 0) are included, as --difficulty of the converter_tsv_to_coco command
+        """
+
+        if dataset_info.type not in self.SUPPORTED_TYPES:
+            raise ValueError(f'Unsupported data type for TSV: {dataset_info.type}')
+
+        if not tsv_paths:
+            raise ValueError('tsv_paths must not be empty.')
+
+        if coordinates not in ['relative', 'absolute']:
+            raise ValueError
+
+        if box_format not in [TSV_FORMAT_LTRB, TSV_FORMAT_LTWH_NORM]:
+            raise ValueError(f'Unsupported box format: {box_format}')
+
+        super().__init__(dataset_info)
+
+        self.coordinates = coordinates
+        self.box_format = box_format
+        self.include_difficult = include_difficult
+        self._tsv_files = [LineIndexedFile(x, index_dir, _TsvClassNameScanner()) for x in tsv_paths]
+        self._first_indices = np.cumsum([0] + [len(x) for x in self._tsv_files])
+
+        if dataset_info.type == DatasetTypes.IMAGE_CAPTION:
+            self._categories = None
+            self._class_name_to_id = None
+        else:
+            if labelmap is None:
+                labelmap = list(dict.fromkeys(name for x in self._tsv_files for name in x.metadata['class_names']))
+            self._categories = [CategoryManifest(i, x) for i, x in enumerate(labelmap)]
+            self._class_name_to_id = {x: i for i, x in enumerate(labelmap)}
+
+    @property
+    def categories(self):
+        return self._categories
+
+    def __len__(self):
+        return int(self._first_indices[-1])
+
+    def _get_single_item(self, index):
+        file_idx = int(np.searchsorted(self._first_indices, index, side='right')) - 1
+        img_id, labels, img_b64 = self._tsv_files[file_idx][index - int(self._first_indices[file_idx])].split(b'\t', 2)
+        image = Base64Utils.b64_str_to_pil(img_b64)
+        target = self._create_label_manifests(json.loads(labels), *image.size, f'File: {self._tsv_files[file_idx].file_path}, row {index - int(self._first_indices[file_idx])}: ')
+        if self.coordinates == 'relative':
+            target = VisionDataset._convert_box_to_relative_if_od(target, *image.size, None, self.dataset_info)
+
+        return image, target, img_id.decode('utf-8')
+
+    def close(self):
+        for tsv_file in self._tsv_files:
+            tsv_file.close()
+
+    def _create_label_manifests(self, labels: typing.List[dict], img_w: int, img_h: int, log_prefix: str):
+        from ...image_caption import ImageCaptionLabelManifest
+        from ...image_classification import ImageClassificationLabelManifest
+        from ...image_object_detection import ImageObjectDetectionLabelManifest
+
+        if self.dataset_info.type == DatasetTypes.IMAGE_CAPTION:
+            return [ImageCaptionLabelManifest(x['caption']) for x in labels]
+
+        if self.dataset_info.type == DatasetTypes.IMAGE_OBJECT_DETECTION:
+            target = []
+            for x in labels:
+                if x.get('diff', 0) > 0 and not self.include_difficult:
+                    continue
+                box = verify_and_correct_box_or_none(log_prefix, list(x['rect']), self.box_format, img_w, img_h)
+                if box is not None:
+                    target.append(ImageObjectDetectionLabelManifest([self._get_class_id(x['class'])] + box))
+            return target
+
+        return [ImageClassificationLabelManifest(self._get_class_id(x['class'])) for x in labels]
+
+    def _get_class_id(self, class_name):
+        class_id = self._class_name_to_id.get(class_name)
+        if class_id is None:
+            raise ValueError(f'Illegal class {class_name}, not in labelmap.')
+        return class_id
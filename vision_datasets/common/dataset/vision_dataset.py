@@ -4,13 +4,14 @@ import os.path
 import pathlib
 import typing
 
+import numpy as np
 from PIL import Image, JpegImagePlugin
 from tqdm import tqdm
 
 from ..constants import DatasetTypes
-from ..data_reader import FileReader, PILImageLoader
+from ..data_reader import FileReader, ImageCache, ImageSizeProber, PILImageLoader
 from ..dataset_info import BaseDatasetInfo
-from ..data_manifest import DatasetManifest, ImageDataManifest, DatasetManifestWithMultiImageLabel, MultiImageLabelManifest
+from ..data_manifest import ColumnarDatasetManifest, DatasetManifest, ImageDataManifest, DatasetManifestWithMultiImageLabel, MultiImageLabelManifest
 from .base_dataset import BaseDataset
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,8 @@ class VisionDataset(BaseDataset):
 
     """
 
-    def __init__(self, dataset_info: BaseDatasetInfo, dataset_manifest: DatasetManifest, coordinates='relative', dataset_resources=None):
+    def __init__(self, dataset_info: BaseDatasetInfo, dataset_manifest: DatasetManifest, coordinates='relative', dataset_resources=None, boxes_as_array=False, image_cache: ImageCache = None,
+                 target_size: typing.Union[int, typing.Tuple[int, int]] = None):
         """
 
         Args:
@@ -30,6 +32,11 @@ class VisionDataset(BaseDataset):
             coordinates (str): 'relative' or 'absolute', indicating the desired format of the bboxes returned. Works for detection dataset only.
                     This params will be refactored out later as it is OD-specific.
             dataset_resources (str): disposable resources associated with this dataset
+            boxes_as_array (bool): for detection dataset, return the targets of an image as a float32 np.ndarray of shape (N, 5), with each row being [c_id, left, top, right, bottom],
+                instead of a list of label manifests. For multitask dataset, applies to detection tasks.
+            image_cache (ImageCache): if provided, decoded images are cached, which saves reading and decoding images repeatedly across epochs
+            target_size (int or tuple): longest edge, or (width, height), that images are going to be resized to, e.g., by the training transform. If provided, images are decoded
+                at a reduced size not smaller than it (see PILImageLoader.load_from_stream), and absolute boxes are scaled to the reduced images accordingly
         """
 
         if dataset_manifest is None:
@@ -44,6 +51,9 @@ class VisionDataset(BaseDataset):
         self.coordinates = coordinates
         self._file_reader = FileReader()
         self.dataset_resources = dataset_resources
+        self.boxes_as_array = boxes_as_array
+        self.image_cache = image_cache
+        self.target_size = target_size
 
     @property
     def categories(self):
@@ -53,14 +63,20 @@ class VisionDataset(BaseDataset):
         if isinstance(self.dataset_manifest, DatasetManifestWithMultiImageLabel):
             return self.dataset_manifest.annotations[index]
 
-        image_manifest: ImageDataManifest = self.dataset_manifest.images[index]
+        if self._can_read_box_columns():
+            w, h = self.dataset_manifest.get_image_size(index)
+            if not w or not h:
+                w, h = self._probe_image_size(self.dataset_manifest.img_paths[index])
+            return self._get_box_array_from_columns(index, w, h, relative=True)
+
+        image_manifest: ImageDataManifest = self.dataset_manifest.peek_image(index)
         targets = image_manifest.labels
         w, h = image_manifest.width, image_manifest.height
 
-        def load_image():
-            return self._load_image(image_manifest.img_path)
+        def get_image_size():
+            return self._probe_image_size(image_manifest.img_path)
 
-        targets = VisionDataset._convert_box_to_relative_if_od(image_manifest.labels, w, h, load_image, self.dataset_info)
+        targets = VisionDataset._convert_box_to_relative_if_od(image_manifest.labels, w, h, get_image_size, self.dataset_info, self.boxes_as_array)
 
         return targets
 
@@ -73,13 +89,23 @@ class VisionDataset(BaseDataset):
             image_manifests = [self.dataset_manifest.images[id] for id in multi_image_label_manifest.img_ids]
             image = [self._load_image(image_manifest.img_path) for image_manifest in image_manifests]
             target = multi_image_label_manifest
+        elif self._can_read_box_columns():
+            # boxes are read from the columns directly, without creating the image and label manifests
+            image = self._load_image(self.dataset_manifest.img_paths[index])
+            target = self._get_box_array_from_columns(index, *PILImageLoader.get_original_size(image), relative=self.coordinates == 'relative')
+            if self.coordinates == 'absolute' and image.size != PILImageLoader.get_original_size(image):
+                target[:, 1:] *= self._get_box_scale(image)
         else:
-            image_manifest: ImageDataManifest = self.dataset_manifest.images[index]
+            image_manifest: ImageDataManifest = self.dataset_manifest.peek_image(index)
             image = self._load_image(image_manifest.img_path)
             target = image_manifest.labels
+            original_w, original_h = PILImageLoader.get_original_size(image)
             if self.coordinates == 'relative':
-                w, h = image.size
-                target = VisionDataset._convert_box_to_relative_if_od(image_manifest.labels, w, h, None, self.dataset_info)
+                target = VisionDataset._convert_box_to_relative_if_od(image_manifest.labels, original_w, original_h, None, self.dataset_info, self.boxes_as_array)
+            elif image.size != (original_w, original_h):
+                target = VisionDataset._scale_box_if_od(image_manifest.labels, self._get_box_scale(image), self.dataset_info, self.boxes_as_array)
+            elif self.boxes_as_array:
+                target = VisionDataset._convert_box_to_array_if_od(target, self.dataset_info)
 
         return image, target, str(index)
 
@@ -87,9 +113,17 @@ class VisionDataset(BaseDataset):
         self._file_reader.close()
 
     def _load_image(self, filepath):
+        if self.image_cache is not None:
+            # images decoded at a reduced size are cached apart from the ones at other sizes, as datasets can share a disk tier
+            key = str(filepath) if self.target_size is None else f'{filepath}@target_size={self.target_size}'
+            return self.image_cache.get_or_load(key, lambda: self._read_image(filepath))
+
+        return self._read_image(filepath)
+
+    def _read_image(self, filepath):
         try:
             with self._file_reader.open(filepath, 'rb') as f:
-                img = PILImageLoader.load_from_stream(f)
+                img = PILImageLoader.load_from_stream(f, self.target_size)
                 logger.debug(f'Loaded image from path: {filepath}')
                 return img
         except Exception:
@@ -97,24 +131,90 @@ class VisionDataset(BaseDataset):
             raise
 
     @staticmethod
-    def _convert_box_to_relative_if_od(target: typing.Union[typing.List, dict], img_w, img_h, load_image, dataset_info):
+    def _get_box_scale(image):
+        original_w, original_h = PILImageLoader.get_original_size(image)
+        w, h = image.size
+        return np.array([w / original_w, h / original_h, w / original_w, h / original_h])
+
+    def _probe_image_size(self, filepath):
+        try:
+            with self._file_reader.open(filepath, 'rb') as f:
+                return ImageSizeProber.probe_from_stream(f)
+        except Exception:
+            logger.exception(f'Failed to probe the size of an image with path: {filepath}')
+            raise
+
+    def _can_read_box_columns(self):
+        return self.boxes_as_array and isinstance(self.dataset_manifest, ColumnarDatasetManifest) and self.dataset_info.type == DatasetTypes.IMAGE_OBJECT_DETECTION
+
+    def _get_box_array_from_columns(self, index, img_w, img_h, relative):
+        boxes = np.empty((self.dataset_manifest.n_labels(index), 5), dtype=np.float32)
+        boxes[:, 0] = self.dataset_manifest.get_category_ids(index)
+        if relative:
+            boxes[:, 1:] = self.dataset_manifest.get_boxes(index) / [img_w, img_h, img_w, img_h]
+        else:
+            boxes[:, 1:] = self.dataset_manifest.get_boxes(index)
+        return boxes
+
+    @staticmethod
+    def _convert_box_to_relative_if_od(target: typing.Union[typing.List, dict], img_w, img_h, get_image_size, dataset_info, as_array=False):
         # Convert absolute coordinates to relative coordinates.
         # Example: for image with size (200, 200), (1, 100, 100, 200, 200) => (1, 0.5, 0.5, 1.0, 1.0)
         if dataset_info.type == DatasetTypes.MULTITASK:
-            return {task_name: VisionDataset._convert_box_to_relative_if_od(task_target, img_w, img_h, load_image, dataset_info.sub_task_infos[task_name]) for task_name, task_target in target.items()}
+            return {task_name: VisionDataset._convert_box_to_relative_if_od(task_target, img_w, img_h, get_image_size, dataset_info.sub_task_infos[task_name], as_array)
+                    for task_name, task_target in target.items()}
 
         if dataset_info.type == DatasetTypes.IMAGE_OBJECT_DETECTION:
-            relative_target = copy.deepcopy(target)
             if not img_w or not img_h:
-                img_w, img_h = load_image().size
+                img_w, img_h = get_image_size()
+
+            if as_array:
+                boxes = np.array([t.label_data for t in target], dtype=np.float64).reshape(-1, 5)
+                boxes[:, 1:] /= [img_w, img_h, img_w, img_h]
+                return boxes.astype(np.float32)
 
-            for t in relative_target:
+            # shallow copies sharing everything but the box with the manifest, as in absolute coordinates
+            relative_target = []
+            for t in target:
                 label = t.label_data
-                t.label_data = [label[0], label[1] / img_w, label[2] / img_h, label[3] / img_w, label[4] / img_h]
+                relative_t = copy.copy(t)
+                relative_t.label_data = [label[0], label[1] / img_w, label[2] / img_h, label[3] / img_w, label[4] / img_h]
+                relative_target.append(relative_t)
             return relative_target
 
         return target
 
+    @staticmethod
+    def _scale_box_if_od(target: typing.Union[typing.List, dict], scale: np.ndarray, dataset_info, as_array=False):
+        # Scale absolute coordinates to an image decoded at a reduced size, scale being [x_scale, y_scale, x_scale, y_scale]
+        if dataset_info.type == DatasetTypes.MULTITASK:
+            return {task_name: VisionDataset._scale_box_if_od(task_target, scale, dataset_info.sub_task_infos[task_name], as_array) for task_name, task_target in target.items()}
+
+        if dataset_info.type == DatasetTypes.IMAGE_OBJECT_DETECTION:
+            boxes = np.array([t.label_data for t in target], dtype=np.float64).reshape(-1, 5)
+            boxes[:, 1:] *= scale
+            if as_array:
+                return boxes.astype(np.float32)
+
+            scaled_target = []
+            for t, box in zip(target, boxes.tolist()):
+                scaled_t = copy.copy(t)
+                scaled_t.label_data = [t.label_data[0]] + box[1:]
+                scaled_target.append(scaled_t)
+            return scaled_target
+
+        return target
+
+    @staticmethod
+    def _convert_box_to_array_if_od(target: typing.Union[typing.List, dict], dataset_info):
+        if dataset_info.type == DatasetTypes.MULTITASK:
+            return {task_name: VisionDataset._convert_box_to_array_if_od(task_target, dataset_info.sub_task_infos[task_name]) for task_name, task_target in target.items()}
+
+        if dataset_info.type == DatasetTypes.IMAGE_OBJECT_DETECTION:
+            return np.array([t.label_data for t in target], dtype=np.float32).reshape(-1, 5)
+
+        return target
+
 
 class LocalFolderCacheDecorator(BaseDataset):
     """
@@ -176,7 +276,8 @@ class LocalFolderCacheDecorator(BaseDataset):
     def _construct_local_image_path(self, img_idx, img_format):
         return self._local_dir / f'{img_idx}.{img_format}'
 
-    def _save_image_matching_quality(self, img, fp):
+    @staticmethod
+    def _save_image_matching_quality(img, fp):
         """
         Save the image with mathcing qulaity, try not to compress
         https://stackoverflow.com/a/56675440/2612496
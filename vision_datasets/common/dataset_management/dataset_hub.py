@@ -18,7 +18,7 @@ class DatasetHub(object):
     This hub class works with both resources on local disk or on azure blob.
     """
 
-    def __init__(self, dataset_json_str: Union[str, list], container_url: str, local_dir: str):
+    def __init__(self, dataset_json_str: Union[str, list], container_url: str, local_dir: str, manifest_cache_dir: str = None, columnar_manifests: bool = False):
         """
             If local_dir is provided, manifest_dataset consumes data from local disk. If data not present on local disk, it will be automatically downloaded.
             if container_url is provided but local_dir not provided, manifest_dataset consumes data directly from container_url.
@@ -29,6 +29,8 @@ class DatasetHub(object):
                 retrievable by their names, versions and usages.
             container_url (str): sas url to the container where datasets can be found/downloaded from
             local_dir (str): local directory where datasets can be found/downloaded to
+            manifest_cache_dir (str): local directory for caching parsed manifests, see ManifestCache. Processes sharing the dir parse each index file only once.
+            columnar_manifests (bool): with manifest_cache_dir, datasets are created on read-only memory-mapped ColumnarDatasetManifest, see DataManifestFactory.create
         """
         if not dataset_json_str:
             raise ValueError
@@ -37,6 +39,8 @@ class DatasetHub(object):
         self.dataset_registry = DatasetRegistry(dataset_json_str)
         self.container_url = container_url
         self.local_dir = local_dir
+        self.manifest_cache_dir = manifest_cache_dir
+        self.columnar_manifests = columnar_manifests
 
     def create_vision_dataset(self, name: str, version: int = None, usage: Union[str, List] = Usages.TRAIN, coordinates: str = 'relative') -> VisionDataset:
         """Create manifest dataset.
@@ -96,7 +100,7 @@ class DatasetHub(object):
 
         manifest = None
         for usage in usages:
-            manifest_usage = DataManifestFactory.create(dataset_info, usage, self.local_dir or self.container_url)
+            manifest_usage = DataManifestFactory.create(dataset_info, usage, self.local_dir or self.container_url, cache_dir=self.manifest_cache_dir, columnar=self.columnar_manifests)
             if manifest_usage is not None:
                 merger = ManifestMerger(ManifestMergeStrategyFactory.create(dataset_info.type))
                 manifest = merger.run(manifest, manifest_usage) if manifest else manifest_usage
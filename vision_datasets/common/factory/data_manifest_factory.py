@@ -1,13 +1,33 @@
 from ..constants import AnnotationFormats, DatasetTypes, Usages
 from ..data_manifest.iris_data_manifest_adaptor import IrisManifestAdaptor
-from ..dataset_info import BaseDatasetInfo
+from ..data_manifest.manifest_cache import ManifestCache
+from ..dataset_info import BaseDatasetInfo, MultiTaskDatasetInfo
 from ..factory import CocoManifestAdaptorFactory
-from ..utils import construct_full_url_or_path_func
+from ..utils import can_be_url, construct_full_url_or_path_func
 
 
 class DataManifestFactory:
     @staticmethod
-    def create(dataset_info: BaseDatasetInfo, usage: Usages, container_sas_or_root_dir: str = None):
+    def create(dataset_info: BaseDatasetInfo, usage: Usages, container_sas_or_root_dir: str = None, streaming: bool = False, cache_dir: str = None, columnar: bool = False):
+        """
+        Args:
+            dataset_info (BaseDatasetInfo): dataset info
+            usage (Usages): which usage of data to construct
+            container_sas_or_root_dir (str): sas url if the data is store in a azure blob container, or a local root dir
+            streaming (bool): parse coco files incrementally, see CocoManifestAdaptorBase.create_dataset_manifest
+            cache_dir (str): if provided, parsed manifests are cached in this local dir with ManifestCache, keyed on the metadata of the index files (see ManifestCache.compute_key) and the data type
+            columnar (bool): with cache_dir, return manifests cached in columns as read-only memory-mapped ColumnarDatasetManifest, shared by processes, instead of DatasetManifest
+        """
+        if cache_dir:
+            index_files = DataManifestFactory._get_index_files(dataset_info, usage, container_sas_or_root_dir)
+            if not index_files:
+                return None
+
+            schema = getattr(dataset_info, 'schema', None)
+            data_types = {k: v.type for k, v in dataset_info.sub_task_infos.items()} if isinstance(dataset_info, MultiTaskDatasetInfo) else dataset_info.type
+            key = ManifestCache.compute_key(index_files, dataset_info.data_format, data_types, schema, container_sas_or_root_dir, dataset_info.root_folder)
+            return ManifestCache(cache_dir).get_or_create(key, lambda: DataManifestFactory.create(dataset_info, usage, container_sas_or_root_dir, streaming), columnar)
+
         if dataset_info.data_format == AnnotationFormats.IRIS:
             return IrisManifestAdaptor.create_dataset_manifest(dataset_info, usage, container_sas_or_root_dir)
 
@@ -17,9 +37,31 @@ class DataManifestFactory:
                 coco_file_by_task = {k: sub_taskinfo.index_files.get(usage) for k, sub_taskinfo in dataset_info.sub_task_infos.items()}
                 data_type_by_task = {k: sub_taskinfo.type for k, sub_taskinfo in dataset_info.sub_task_infos.items()}
                 adaptor = CocoManifestAdaptorFactory.create(DatasetTypes.MULTITASK, data_type_by_task)
-                return adaptor.create_dataset_manifest(coco_file_by_task, container_sas_or_root_dir)
+                return adaptor.create_dataset_manifest(coco_file_by_task, container_sas_or_root_dir, streaming)
             if dataset_info.type == DatasetTypes.KEY_VALUE_PAIR:
                 adaptor = CocoManifestAdaptorFactory.create(DatasetTypes.KEY_VALUE_PAIR, dataset_info.schema)
             else:
                 adaptor = CocoManifestAdaptorFactory.create(dataset_info.type)
-            return adaptor.create_dataset_manifest(dataset_info.index_files.get(usage), container_sas_or_root_dir)
+            return adaptor.create_dataset_manifest(dataset_info.index_files.get(usage), container_sas_or_root_dir, streaming)
+
+    @staticmethod
+    def _get_index_files(dataset_info: BaseDatasetInfo, usage: Usages, container_sas_or_root_dir: str = None):
+        """
+        Full paths or urls to all files parsed for creating the manifest of the usage, empty if the usage does not exist
+        """
+
+        task_infos = dataset_info.sub_task_infos.values() if isinstance(dataset_info, MultiTaskDatasetInfo) else [dataset_info]
+        index_files = []
+        if dataset_info.data_format == AnnotationFormats.COCO:
+            get_full_url_or_path = construct_full_url_or_path_func(construct_full_url_or_path_func(container_sas_or_root_dir, dataset_info.root_folder)(''))
+            for task_info in task_infos:
+                index_file = task_info.index_files.get(usage)
+                index_files.append(None if not index_file else index_file if can_be_url(index_file) else get_full_url_or_path(index_file))
+        else:
+            for task_info in task_infos:
+                if usage not in task_info.index_files:
+                    continue
+                get_full_url_or_path = construct_full_url_or_path_func(container_sas_or_root_dir, task_info.root_folder)
+                index_files += [get_full_url_or_path(x) if x else None for x in (task_info.index_files[usage], task_info.labelmap, task_info.image_metadata_path)]
+
+        return index_files if any(index_files) else []
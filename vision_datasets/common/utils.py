@@ -1,8 +1,14 @@
 from typing import Union, List
 from urllib import parse as urlparse
+import logging
 import os
 import pathlib
 
+logger = logging.getLogger(__name__)
+
+TSV_FORMAT_LTRB = 'ltrb'
+TSV_FORMAT_LTWH_NORM = 'ltwh-normalized'
+
 
 def deep_merge(*dicts):
     merged = {}
@@ -104,3 +110,27 @@ def construct_full_url_or_path_func(url_or_root_dir: Union[str, pathlib.Path], p
         return lambda path: _construct_full_url_generator(url_or_root_dir)(_construct_full_path_generator([prefix_dir])(path))
     else:
         return lambda path: _construct_full_path_generator([url_or_root_dir, prefix_dir])(path)
+
+
+def verify_and_correct_box_or_none(lp, box, data_format, img_w, img_h):
+    error_msg = f'{lp} Illegal box [{", ".join([str(x) for x in box])}], img wxh: {img_w}, {img_h}'
+    if len([x for x in box if x < 0]) > 0:
+        logger.error(f'{error_msg}. Skip this box.')
+        return None
+
+    if data_format == TSV_FORMAT_LTWH_NORM:
+        box[2] = int((box[0] + box[2]) * img_w)
+        box[3] = int((box[1] + box[3]) * img_h)
+        box[0] = int(box[0] * img_w)
+        box[1] = int(box[1] * img_h)
+
+    boundary_ratio_limit = 1.02
+    if box[0] >= img_w or box[1] >= img_h or box[2] / img_w > boundary_ratio_limit \
+            or box[3] / img_h > boundary_ratio_limit or box[0] >= box[2] or box[1] >= box[3]:
+        logger.error(f'{error_msg}. Skip this box.')
+        return None
+
+    box[2] = min(box[2], img_w)
+    box[3] = min(box[3], img_h)
+
+    return box
@@ -34,7 +34,9 @@ class ClassificationAsKeyValuePairDatasetBase(VisionDataset, ABC):
         dataset_info_dict["type"] = DatasetTypes.KEY_VALUE_PAIR.name.lower()
         self.class_names = [c.name for c in classification_dataset.dataset_manifest.categories]
         self.class_id_to_names = {c.id: c.name for c in classification_dataset.dataset_manifest.categories}
-        self.img_id_to_pos = {x.id: i for i, x in enumerate(classification_dataset.dataset_manifest.images)}
+        # labels of the images are cleared below, so the images have to be objects owned by the new manifest, e.g., not created on access by ColumnarDatasetManifest
+        images = list(classification_dataset.dataset_manifest.images)
+        self.img_id_to_pos = {x.id: i for i, x in enumerate(images)}
 
         schema = self.create_schema_with_class_names(self.class_names)
         # Update dataset_info with schema
@@ -42,7 +44,7 @@ class ClassificationAsKeyValuePairDatasetBase(VisionDataset, ABC):
 
         # Construct KeyValuePairDatasetManifest
         annotations = []
-        for id, img in enumerate(classification_dataset.dataset_manifest.images, 1):
+        for id, img in enumerate(images, 1):
             label_ids = [label.label_data for label in img.labels]
             label_names = [self.class_id_to_names[id] for id in label_ids]
 
@@ -54,7 +56,7 @@ class ClassificationAsKeyValuePairDatasetBase(VisionDataset, ABC):
             img.labels = []
             annotations.append(kvp_annotation)
 
-        dataset_manifest = KeyValuePairDatasetManifest(classification_dataset.dataset_manifest.images, annotations, schema, additional_info=classification_dataset.dataset_manifest.additional_info)
+        dataset_manifest = KeyValuePairDatasetManifest(images, annotations, schema, additional_info=classification_dataset.dataset_manifest.additional_info)
         super().__init__(dataset_info, dataset_manifest, dataset_resources=classification_dataset.dataset_resources)
 
     @abstractmethod
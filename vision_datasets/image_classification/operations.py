@@ -36,4 +36,4 @@ SplitFactory.direct_register(SplitWithCategories, DatasetTypes.IMAGE_CLASSIFICAT
 @StandAloneImageListGeneratorFactory.register(DatasetTypes.IMAGE_CLASSIFICATION_MULTILABEL)
 class ImageClassificationStandAloneImageListGenerator(GenerateStandAloneImageListBase):
     def _generate_label(self, label: ImageClassificationLabelManifest, image: ImageDataManifest, manifest: DatasetManifest):
-        return {'category_name': manifest.categories[label.category_id]}
+        return {'category_name': manifest.categories[label.category_id].name}
@@ -1,10 +1,22 @@
+import collections
+import io
 import logging
+import multiprocessing
+import os
+import pathlib
 import random
+import struct
+import threading
+import zipfile
 import typing
+import zlib
 from abc import ABC, abstractmethod
 from copy import deepcopy
 
-from ..common import DatasetManifest, DatasetTypes, ImageDataManifest
+import numpy as np
+from tqdm import tqdm
+
+from ..common import ColumnarDatasetManifest, DatasetManifest, DatasetTypes, ImageDataManifest, ImageSizeProber
 from ..common.dataset.base_dataset import BaseDataset
 from ..common.dataset.vision_dataset import LocalFolderCacheDecorator, VisionDataset
 from ..image_classification.manifest import ImageClassificationLabelManifest
@@ -70,7 +82,7 @@ class DetectionAsClassificationIgnoreBoxesDataset(DetectionAsClassificationBaseD
         """
 
         images = []
-        for img in self._dataset.dataset_manifest.images:
+        for img in self._dataset.dataset_manifest.peek_images():
             labels = DetectionAsClassificationIgnoreBoxesDataset._od_to_ic_labels(img.labels)
             ic_img = ImageDataManifest(len(images) + 1, img.img_path, img.width, img.height, labels)
             images.append(ic_img)
@@ -87,9 +99,12 @@ class DetectionAsClassificationByCroppingDataset(DetectionAsClassificationBaseDa
     Consume detection dataset as a classification dataset, i.e., sample from this dataset is a crop wrt a bbox in the detection dataset.
 
     When box_aug_params is provided, different crops with randomness will be generated for the same bbox
+
+    Boxes of an image are consecutive samples. The last n_cached_images decoded images are cached, so that iterating through the boxes of an image decodes it once, and
+    get_crops_of_image crops all boxes of an image from a single decode.
     """
 
-    def __init__(self, detection_dataset: VisionDataset, box_aug_params: dict = None):
+    def __init__(self, detection_dataset: VisionDataset, box_aug_params: dict = None, n_cached_images: int = 4):
         """
         Args:
             detection_dataset: the detection dataset where images are cropped as classification samples
@@ -97,35 +112,106 @@ class DetectionAsClassificationByCroppingDataset(DetectionAsClassificationBaseDa
                 'zoom_ratio_bounds': the lower/upper bound of box zoom ratio wrt box width and height, e.g., (0.3, 1.5)
                 'shift_relative_bounds': lower/upper bounds of relative ratio wrt box width and height that a box can shift, e.g., (-0.3, 0.1)
                 'rnd_seed' [optional]: rnd seed used for box crop zoom and shift, default being 0
+            n_cached_images (int): number of decoded images cached, 0 to disable caching
         """
         super().__init__(detection_dataset, DatasetTypes.IMAGE_CLASSIFICATION_MULTICLASS)
 
-        self._n_booxes = 0
-        self._box_abs_id_to_img_rel_id = {}
-        for img_id, x in enumerate(self._dataset.dataset_manifest.images):
-            for i in range(len(x.labels)):
-                self._box_abs_id_to_img_rel_id[self._n_booxes] = (img_id, i)
-                self._n_booxes += 1
+        if n_cached_images < 0:
+            raise ValueError('n_cached_images must be non-negative.')
+
+        # boxes of image i are samples box_offsets[i]: box_offsets[i + 1]
+        manifest = self._dataset.dataset_manifest
+        if isinstance(manifest, ColumnarDatasetManifest):
+            self._box_offsets = np.asarray(manifest.label_offsets, dtype=np.int64)
+        else:
+            self._box_offsets = np.zeros(len(manifest.images) + 1, dtype=np.int64)
+            np.cumsum([len(x.labels) for x in manifest.peek_images()], out=self._box_offsets[1:])
+        self._n_boxes = int(self._box_offsets[-1])
         self._box_aug_params = box_aug_params
+        self.n_cached_images = n_cached_images
 
         self._box_aug_rnd = random.Random(self._box_aug_params.get('rnd_seed', 0)) if box_aug_params else None
         self._box_pick_rnd = random.Random(0)
+        self._init_cache()
+
+    def _init_cache(self):
+        self._image_cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def __len__(self):
-        return self._n_booxes
+        return self._n_boxes
 
     def _get_single_item(self, index):
-        img_idx, box_rel_idx = self._box_abs_id_to_img_rel_id[index]
+        img_idx = self.get_image_index(index)
+        img, boxes = self._load_image_and_boxes(img_idx)
+        return self._crop_box(img, boxes, index - int(self._box_offsets[img_idx]), index)
 
-        img, boxes, _ = self._dataset[img_idx]
-        c_id, left, t, r, b = boxes[box_rel_idx].label_data
+    def get_image_index(self, index) -> int:
+        """Index of the image in the detection dataset, of the box sample"""
+        if index < 0 or index >= self._n_boxes:
+            raise IndexError
+        return int(np.searchsorted(self._box_offsets, index, side='right')) - 1
+
+    def get_crops_of_image(self, img_idx) -> list:
+        """
+        Samples of all boxes of an image, cropped from a single decode of the image
+
+        Args:
+            img_idx (int): index of the image in the detection dataset
+
+        Returns:
+            samples of the boxes in order, i.e., self[i] for i in range(box_offsets[img_idx], box_offsets[img_idx + 1])
+        """
+
+        start, end = int(self._box_offsets[img_idx]), int(self._box_offsets[img_idx + 1])
+        if start == end:
+            return []
+        img, boxes = self._load_image_and_boxes(img_idx)
+        return [self._crop_box(img, boxes, i - start, i) for i in range(start, end)]
+
+    def _crop_box(self, img, boxes, box_rel_idx, index, rnd: random.Random = None):
+        if isinstance(boxes, np.ndarray):
+            # boxes_as_array of the detection dataset
+            c_id, left, t, r, b = int(boxes[box_rel_idx, 0]), *boxes[box_rel_idx, 1:].tolist()
+        else:
+            c_id, left, t, r, b = boxes[box_rel_idx].label_data
         if self._dataset.coordinates == 'relative':
             w, h = img.size
             left, t, r, b = left * w, t * h, r * w, b * h
 
-        box_img = DetectionAsClassificationByCroppingDataset.crop(img, left, t, r, b, self._box_aug_params, self._box_aug_rnd)
+        box_img = DetectionAsClassificationByCroppingDataset.crop(img, left, t, r, b, self._box_aug_params, rnd or self._box_aug_rnd)
         return box_img, [ImageClassificationLabelManifest(c_id)], str(index)
 
+    def _load_image_and_boxes(self, img_idx):
+        if not self.n_cached_images:
+            img, boxes, _ = self._dataset[img_idx]
+            return img, boxes
+
+        with self._cache_lock:
+            cached = self._image_cache.get(img_idx)
+            if cached is not None:
+                self._image_cache.move_to_end(img_idx)
+                return cached
+
+        img, boxes, _ = self._dataset[img_idx]
+        with self._cache_lock:
+            self._image_cache[img_idx] = (img, boxes)
+            self._image_cache.move_to_end(img_idx)
+            while len(self._image_cache) > self.n_cached_images:
+                self._image_cache.popitem(last=False)
+        return img, boxes
+
+    def __getstate__(self):
+        # decoded images are not copied to other processes
+        state = self.__dict__.copy()
+        del state['_image_cache']
+        del state['_cache_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_cache()
+
     @staticmethod
     def crop(img, left, t, r, b, aug_params=None, rnd: random.Random = None):
         if aug_params:
@@ -147,15 +233,209 @@ class DetectionAsClassificationByCroppingDataset(DetectionAsClassificationBaseDa
     def generate_manifest(self, **kwargs):
         """
         Generate dataset manifest for the multiclass classification dataset converted from detection dataset by cropping bboxes as classification samples.
-        Crops will be saved into 'dir' for generating the manifest
+        Crops will be saved into 'dir' for generating the manifest, as <dir>/<sample index>.<format>, with sample index being copy index * len(self) + box index.
+
+        Images are partitioned across 'n_workers' processes, each cropping all boxes of an image from a single decode. Crops already saved, e.g., by an interrupted run, are
+        not generated again. With box_aug_params, the crops of an image are augmented with a random state seeded by rnd_seed, the copy index and the image index, so that
+        results do not depend on the number of workers or on resuming.
+
         Args:
-            'dir'(str): directory where cropped images will be saved
+            'dir'(str): directory where cropped images will be saved, or a zip file (ending with .zip) where they are stored
             'n_copies'(int): number of image copies generated for each bbox
+            'n_workers'(int): number of processes cropping and encoding images, default being 1, i.e., in the current process
         """
 
-        local_cache_params = {'dir': kwargs.get('dir', f'{self.dataset_info.name}-cropped-ic'), 'n_copies': kwargs.get('n_copies')}
-        cache_decor = LocalFolderCacheDecorator(self, local_cache_params)
-        return cache_decor.generate_manifest()
+        output = pathlib.Path(kwargs.get('dir') or f'{self.dataset_info.name}-cropped-ic')
+        n_copies = kwargs.get('n_copies') or 1
+        n_workers = kwargs.get('n_workers') or 1
+        if n_copies < 1:
+            raise ValueError('n_copies must be equal or greater than 1.')
+        if n_workers < 1:
+            raise ValueError('n_workers must be greater than 0.')
+
+        writer = _ZipCropWriter(output) if output.suffix.lower() == '.zip' else _FolderCropWriter(output)
+        crops = {}
+        try:
+            existing = writer.list_existing()
+            # one task per image, with the copies not saved yet
+            tasks = []
+            for img_idx in range(len(self._box_offsets) - 1):
+                copy_indices = []
+                for copy_idx in range(n_copies):
+                    indices = range(copy_idx * len(self) + int(self._box_offsets[img_idx]), copy_idx * len(self) + int(self._box_offsets[img_idx + 1]))
+                    if all(x in existing for x in indices):
+                        crops.update({x: writer.get_existing_crop(existing[x]) for x in indices})
+                    else:
+                        copy_indices.append(copy_idx)
+                if copy_indices:
+                    tasks.append((img_idx, copy_indices))
+
+            if existing:
+                logger.info(f'{len(crops)} crops already in {output}, generating the crops of {len(tasks)} images.')
+
+            if n_workers == 1 or len(tasks) <= 1:
+                results = (self._encode_crops_of_image(*task) for task in tasks)
+                for encoded_crops in results:
+                    crops.update(writer.write(encoded_crops))
+            else:
+                with multiprocessing.get_context('spawn').Pool(n_workers, initializer=_init_crop_worker, initargs=(self,)) as pool:
+                    for encoded_crops in pool.imap_unordered(_encode_crops_of_image_in_worker, tasks, chunksize=max(1, min(64, len(tasks) // (n_workers * 16)))):
+                        crops.update(writer.write(encoded_crops))
+        finally:
+            writer.close()
+
+        images = []
+        for index in tqdm(sorted(crops), desc='Generating manifest...'):
+            path, width, height = crops[index]
+            c_id = self._get_category_id(self.get_image_index(index % len(self)), index % len(self))
+            images.append(ImageDataManifest(len(images) + 1, path, width, height, [ImageClassificationLabelManifest(c_id)]))
+        return DatasetManifest(images, self.categories, self.dataset_info.type, self._dataset.dataset_manifest.additional_info)
+
+    def _encode_crops_of_image(self, img_idx, copy_indices):
+        """Crops of all boxes of an image for the copies, from a single decode, encoded as (sample index, encoded bytes, format, width, height)"""
+        img, boxes, _ = self._dataset[img_idx]
+        start = int(self._box_offsets[img_idx])
+        encoded_crops = []
+        for copy_idx in copy_indices:
+            rnd = random.Random(f'{self._box_aug_params.get("rnd_seed", 0)}-{copy_idx}-{img_idx}') if self._box_aug_params else None
+            for box_rel_idx in range(int(self._box_offsets[img_idx + 1]) - start):
+                crop_img = self._crop_box(img, boxes, box_rel_idx, start + box_rel_idx, rnd)[0]
+                stream = io.BytesIO()
+                LocalFolderCacheDecorator._save_image_matching_quality(crop_img, stream)
+                encoded_crops.append((copy_idx * len(self) + start + box_rel_idx, stream.getvalue(), crop_img.format, *crop_img.size))
+        return encoded_crops
+
+    def _get_category_id(self, img_idx, index):
+        manifest = self._dataset.dataset_manifest
+        box_rel_idx = index - int(self._box_offsets[img_idx])
+        if isinstance(manifest, ColumnarDatasetManifest):
+            return int(manifest.get_category_ids(img_idx)[box_rel_idx])
+        return manifest.peek_image(img_idx).labels[box_rel_idx].category_id
+
+
+_crop_worker_dataset = None
+
+
+def _init_crop_worker(dataset):
+    global _crop_worker_dataset
+    _crop_worker_dataset = dataset
+
+
+def _encode_crops_of_image_in_worker(task):
+    return _crop_worker_dataset._encode_crops_of_image(*task)
+
+
+class _FolderCropWriter:
+    """Write crops as <dir>/<sample index>.<format>, each file being written to a temp file first, so that files present are complete"""
+
+    def __init__(self, folder: pathlib.Path):
+        self.folder = folder
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def list_existing(self):
+        return {int(x.stem): x for x in self.folder.iterdir() if x.stem.isdigit() and x.is_file()}
+
+    def get_existing_crop(self, path):
+        return str(path.as_posix()), *ImageSizeProber.probe_from_file(path)
+
+    def write(self, encoded_crops):
+        crops = {}
+        for index, data, img_format, width, height in encoded_crops:
+            path = self.folder / f'{index}.{img_format}'
+            temp_path = path.with_name(f'.{path.name}.tmp')
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+            crops[index] = (str(path.as_posix()), width, height)
+        return crops
+
+    def close(self):
+        pass
+
+
+class _ZipCropWriter:
+    """
+    Write crops as entries <sample index>.<format> of a zip, without compression. The zip is closed every CHECKPOINT_INTERVAL images, writing its central directory, so that an
+    interrupted run is resumed from the last checkpoint.
+
+    Appending to a zip writes the new entries over its central directory, so a run killed after a checkpoint leaves a zip without one. Such a zip is rebuilt from the local
+    headers of its complete entries (see _recover), so the crops written before the interruption are kept.
+    """
+
+    CHECKPOINT_INTERVAL = 1000
+    _LOCAL_HEADER = struct.Struct(zipfile.structFileHeader)
+    _LOCAL_HEADER_SIGNATURE = zipfile.stringFileHeader
+    _FLAG_DATA_DESCRIPTOR = 0x08
+
+    def __init__(self, zip_path: pathlib.Path):
+        self.zip_path = zip_path
+        self.zip_path.parent.mkdir(parents=True, exist_ok=True)
+        self._zip_file = None
+        self._n_written = 0
+        # entries in the zip before this run, by sample index
+        self._existing = {}
+
+    def list_existing(self):
+        if not self.zip_path.exists():
+            return {}
+        try:
+            with zipfile.ZipFile(self.zip_path) as zf:
+                names = zf.namelist()
+        except zipfile.BadZipFile:
+            logger.warning(f'{self.zip_path} is corrupted, e.g., interrupted after a checkpoint, recovering the crops written.')
+            names = self._recover()
+        self._existing = {int(x.split('.')[0]): x for x in names if x.split('.')[0].isdigit()}
+        return self._existing
+
+    def _recover(self):
+        """Rebuild the zip with its entries whose local header and data are complete and match their CRC, through a temp file replacing the zip once rebuilt"""
+        temp_path = self.zip_path.with_name(f'.{self.zip_path.name}.tmp')
+        names = []
+        with open(self.zip_path, 'rb') as f, zipfile.ZipFile(temp_path, 'w') as zf:
+            while True:
+                header = f.read(self._LOCAL_HEADER.size)
+                if len(header) < self._LOCAL_HEADER.size:
+                    break
+                signature, _, _, flags, compress_type, _, _, crc, compress_size, _, name_len, extra_len = self._LOCAL_HEADER.unpack(header)
+                if signature != self._LOCAL_HEADER_SIGNATURE or compress_type != zipfile.ZIP_STORED or flags & self._FLAG_DATA_DESCRIPTOR:
+                    break
+                name = f.read(name_len).decode('utf-8')
+                f.seek(extra_len, os.SEEK_CUR)
+                data = f.read(compress_size)
+                if len(data) < compress_size or zlib.crc32(data) != crc:
+                    break
+                zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+                names.append(name)
+
+        os.replace(temp_path, self.zip_path)
+        logger.info(f'{len(names)} crops recovered from {self.zip_path}.')
+        return names
+
+    def get_existing_crop(self, name):
+        if self._zip_file is None:
+            self._zip_file = zipfile.ZipFile(self.zip_path, 'a')
+        with self._zip_file.open(name) as f:
+            return f'{self.zip_path.as_posix()}@{name}', *ImageSizeProber.probe_from_stream(f)
+
+    def write(self, encoded_crops):
+        if self._zip_file is None:
+            self._zip_file = zipfile.ZipFile(self.zip_path, 'a')
+        crops = {}
+        for index, data, img_format, width, height in encoded_crops:
+            # crops of an image interrupted in the middle are partly in the zip, and are not written again, as a zip cannot hold an entry twice
+            name = self._existing.get(index) or f'{index}.{img_format}'
+            if index not in self._existing:
+                self._zip_file.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+            crops[index] = (f'{self.zip_path.as_posix()}@{name}', width, height)
+
+        self._n_written += 1
+        if self._n_written % self.CHECKPOINT_INTERVAL == 0:
+            self.close()
+        return crops
+
+    def close(self):
+        if self._zip_file is not None:
+            self._zip_file.close()
+            self._zip_file = None
 
 
 class BoxAlteration:
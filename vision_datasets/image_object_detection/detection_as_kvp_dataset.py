@@ -46,7 +46,9 @@ class DetectionAsKeyValuePairDatasetBase(VisionDataset, ABC):
         dataset_info_dict["type"] = DatasetTypes.KEY_VALUE_PAIR.name.lower()
         self.class_names = [c.name for c in detection_dataset.dataset_manifest.categories]
         self.class_id_to_names = {c.id: c.name for c in detection_dataset.dataset_manifest.categories}
-        self.img_id_to_pos = {x.id: i for i, x in enumerate(detection_dataset.dataset_manifest.images)}
+        # labels of the images are cleared below, so the images have to be objects owned by the new manifest, e.g., not created on access by ColumnarDatasetManifest
+        images = list(detection_dataset.dataset_manifest.images)
+        self.img_id_to_pos = {x.id: i for i, x in enumerate(images)}
 
         schema = self._create_schema_with_class_names(include_class_names)
         schema['description'] = custom_schema_description or schema['description']
@@ -56,7 +58,7 @@ class DetectionAsKeyValuePairDatasetBase(VisionDataset, ABC):
 
         # Construct KeyValuePairDatasetManifest
         annotations = []
-        for id, img in enumerate(detection_dataset.dataset_manifest.images, 1):
+        for id, img in enumerate(images, 1):
             bboxes = [box.label_data for box in img.labels]
 
             kvp_label_data = self.construct_kvp_label_data(bboxes)
@@ -70,7 +72,7 @@ class DetectionAsKeyValuePairDatasetBase(VisionDataset, ABC):
             annotations.append(kvp_annotation)
 
         dataset_manifest = KeyValuePairDatasetManifest(
-            detection_dataset.dataset_manifest.images,
+            images,
             annotations,
             schema,
             additional_info=detection_dataset.dataset_manifest.additional_info,
@@ -31,4 +31,4 @@ SplitFactory.direct_register(Split, _DATA_TYPE)
 @StandAloneImageListGeneratorFactory.register(_DATA_TYPE)
 class ImageObjectDetectionStandAloneImageListGenerator(GenerateStandAloneImageListBase):
     def _generate_label(self, label: ImageObjectDetectionLabelManifest, image: ImageDataManifest, manifest: DatasetManifest) -> dict:
-        return {'category_name': manifest.categories[label.category_id], 'bbox': label.label_data[1:]}
+        return {'category_name': manifest.categories[label.category_id].name, 'bbox': label.label_data[1:]}